@@ -6,17 +6,46 @@
 #   - Email Gate + bot active flags
 #   - إشعارات إلى حساب المالك OWNER_CHAT (Mohamad4992)
 #   - KuCoin helpers (meta / price / balance / orders)
+#   - KuCoin rate-limit governor (token bucket + أولويات) + async gateway
 #   - Blacklist + Terminal notices
 #   - Debug funds toggles
 # ============================================
 
+import io
 import os
+import copy
+import gzip
 import json
 import time
+import uuid
+import hmac
+import base64
+import hashlib
+import asyncio
+import sqlite3
+import contextlib
+import collections
+import functools
+import threading
+import contextvars
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass, asdict
 from datetime import datetime, timezone, date
 from typing import Any, Dict, List, Optional, Tuple, Set
 
+try:
+    import numpy as np  # اختياري: تحليلات أمر stats (TradeColumns)
+except ImportError:
+    np = None
+
+try:
+    from zoneinfo import ZoneInfo
+    _BERLIN_TZ: Any = ZoneInfo("Europe/Berlin")
+except Exception:  # pragma: no cover
+    _BERLIN_TZ = timezone.utc
+
 # --------- Console echo (قادم من القسم الأول، مع fallback) ---------
 try:
     console_echo  # type: ignore[name-defined]
@@ -36,6 +65,7 @@ SUMMARY_FILE = globals().get("SUMMARY_FILE", "summary.json")
 TERMINAL_LOG_FILE = globals().get("TERMINAL_LOG_FILE", "terminal_notices.json")
 EMAIL_STATE_FILE = globals().get("EMAIL_STATE_FILE", "email_gate_state.json")
 BLACKLIST_FILE = globals().get("BLACKLIST_FILE", "blacklist.json")
+DEBUG_FUNDS_FILE = globals().get("DEBUG_FUNDS_FILE", "debug_funds_state.json")
 STRUCTURE_FILE = globals().get("STRUCTURE_FILE", "trade_structure.json")
 
 OWNER_CHAT = globals().get("OWNER_CHAT", "me")
@@ -75,6 +105,20 @@ def utc_now() -> datetime:
 def utc_ts() -> float:
     return utc_now().timestamp()
 
+def _utc_day(ts: Any) -> Optional[str]:
+    """epoch → 'YYYY-MM-DD' (UTC) أو None."""
+    try:
+        return datetime.fromtimestamp(float(ts), tz=timezone.utc).strftime("%Y-%m-%d") if ts else None
+    except Exception:
+        return None
+
+def _berlin_day(ts: Any) -> Optional[str]:
+    """epoch → 'YYYY-MM-DD' (Europe/Berlin) أو None."""
+    try:
+        return datetime.fromtimestamp(float(ts), tz=_BERLIN_TZ).strftime("%Y-%m-%d") if ts else None
+    except Exception:
+        return None
+
 def normalize_symbol(sym: str) -> str:
     """تحويل الرمز لصيغة موحّدة: بدون شرطة أو سلاش وبأحرف كبيرة."""
     return (sym or "").upper().replace("-", "").replace("/", "")
@@ -121,11 +165,300 @@ def quantize_down(value: float, step: float) -> float:
     except Exception:
         return float(value)
 
+# --------- Persistence worker (كتابة ملفات الحالة خارج الـ event loop) ---------
+# كل ملفات الحالة (summary / terminal notices / blacklist / email gate ...) تُرسل إلى
+# thread واحد عبر persist_json(path, obj):
+#   - طابور مُجمّع (coalescing) لكل ملف: إرسالان قبل الكتابة → تُكتب آخر نسخة فقط.
+#   - json.dumps + fsync + os.replace كلها داخل الـ thread (كتابة ذرّية).
+#   - persist_read_json(path) يرجّع النسخة المعلّقة إن وُجدت (read-your-writes).
+#   - add_persist_metrics_hook(fn) → fn(path, latency_ms, queue_depth) بعد كل كتابة.
+PERSIST_ASYNC = os.getenv("PERSIST_ASYNC", "1") == "1"
+
+def _atomic_write_text(path: str, text: str) -> None:
+    """كتابة ذرّية: tmp + fsync + os.replace."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class PersistenceWorker:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Tuple[Any, int, float]] = {}   # path → (obj, indent, أول إرسال)
+        self._depth: Dict[str, int] = {}                          # إرسالات منذ آخر كتابة
+        self._writing: Optional[str] = None
+        self._inflight: Dict[str, Any] = {}                       # path → نسخة قيد الكتابة
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._hooks: List[Any] = []
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _file_metrics(self, path: str) -> Dict[str, Any]:
+        m = self._metrics.get(path)
+        if m is None:
+            m = self._metrics[path] = {
+                "submits": 0, "writes": 0, "coalesced": 0, "errors": 0,
+                "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0, "queue_depth": 0,
+            }
+        return m
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="persist-writer", daemon=True)
+            self._thread.start()
+
+    def submit_json(self, path: str, obj: Any, indent: int = 2) -> None:
+        """
+        جدولة كتابة obj إلى path. الـ obj يصبح ملكاً للـ worker (لا تعدّله بعد الإرسال).
+        """
+        if not PERSIST_ASYNC:
+            self._write(path, obj, indent, time.perf_counter())
+            return
+        with self._cond:
+            m = self._file_metrics(path)
+            m["submits"] += 1
+            prev = self._pending.get(path)
+            if prev is not None:
+                m["coalesced"] += 1
+            first_ts = prev[2] if prev is not None else time.perf_counter()
+            self._pending[path] = (obj, indent, first_ts)
+            self._depth[path] = self._depth.get(path, 0) + 1
+            m["queue_depth"] = self._depth[path]
+            self._ensure_thread()
+            self._cond.notify()
+
+    def read_json(self, path: str, default: Any = None) -> Any:
+        """آخر نسخة (المعلّقة في الطابور، ثم قيد الكتابة، ثم الملف)."""
+        with self._cond:
+            prev = self._pending.get(path)
+            if prev is not None:
+                return copy.deepcopy(prev[0])
+            if path in self._inflight:
+                return copy.deepcopy(self._inflight[path])
+        try:
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    data = json.load(f)
+                return default if data is None else data
+        except Exception as e:
+            console_echo(f"[PERSIST] read error {path}: {e}")
+        return default
+
+    def is_pending(self, path: str) -> bool:
+        """هل توجد كتابة معلّقة أو قيد التنفيذ لهذا الملف؟"""
+        with self._cond:
+            return path in self._pending or path in self._inflight
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if not self._pending and self._stop:
+                    return
+                path = next(iter(self._pending))
+                obj, indent, first_ts = self._pending.pop(path)
+                self._depth[path] = 0
+                self._writing = path
+                self._inflight[path] = obj
+            try:
+                self._write(path, obj, indent, first_ts)
+            finally:
+                with self._cond:
+                    self._writing = None
+                    self._inflight.pop(path, None)
+                    self._cond.notify_all()
+
+    def _write(self, path: str, obj: Any, indent: int, first_ts: float) -> None:
+        t0 = time.perf_counter()
+        try:
+            _atomic_write_text(path, json.dumps(obj, indent=indent))
+        except Exception as e:
+            with self._cond:
+                self._file_metrics(path)["errors"] += 1
+            console_echo(f"[PERSIST] write error {path}: {e}")
+            return
+        write_ms = (time.perf_counter() - t0) * 1000.0
+        latency_ms = (time.perf_counter() - first_ts) * 1000.0  # من أول إرسال حتى الكتابة
+        with self._cond:
+            m = self._file_metrics(path)
+            m["writes"] += 1
+            m["last_ms"] = round(write_ms, 3)
+            m["max_ms"] = round(max(m["max_ms"], write_ms), 3)
+            m["total_ms"] += write_ms
+            depth = self._depth.get(path, 0)
+            m["queue_depth"] = depth
+            hooks = list(self._hooks)
+        for fn in hooks:
+            try:
+                fn(path, latency_ms, depth)
+            except Exception:
+                pass
+
+    def add_metrics_hook(self, fn: Any) -> None:
+        with self._cond:
+            self._hooks.append(fn)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """انتظار تفريغ الطابور (للاختبارات وعند الإيقاف)."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self._pending or self._writing is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            out = {}
+            for path, m in self._metrics.items():
+                row = dict(m)
+                row["avg_ms"] = round(m["total_ms"] / m["writes"], 3) if m["writes"] else 0.0
+                row["total_ms"] = round(m["total_ms"], 3)
+                out[path] = row
+            return out
+
+_PERSIST_WORKER = PersistenceWorker()
+
+def get_persistence_worker() -> PersistenceWorker:
+    return _PERSIST_WORKER
+
+def persist_json(path: str, obj: Any, indent: int = 2) -> None:
+    _PERSIST_WORKER.submit_json(path, obj, indent)
+
+def persist_read_json(path: str, default: Any = None) -> Any:
+    return _PERSIST_WORKER.read_json(path, default)
+
+def add_persist_metrics_hook(fn: Any) -> None:
+    _PERSIST_WORKER.add_metrics_hook(fn)
+
+# --------- Cached control-state (blacklist / email gate / debug funds) ---------
+# ملفات التحكم الصغيرة تُقرأ في كل توصية (should_accept_recommendations / blacklist)،
+# لذلك نخدمها من الذاكرة:
+#   - get(): بدون I/O؛ stat للملف (mtime_ns + size) مرة كل STATE_CACHE_CHECK_SEC على الأكثر
+#     لالتقاط التعديل اليدوي للملف من الخارج.
+#   - set()/update(): تحديث الذاكرة فوراً + إرسال الكتابة إلى PersistenceWorker.
+#   - لا نعيد التحميل طالما توجد كتابة معلّقة لنفس الملف (لا نرجع لنسخة أقدم).
+STATE_CACHE_CHECK_SEC = float(os.getenv("STATE_CACHE_CHECK_SEC", "2"))
+
+class CachedStateFile:
+    def __init__(self, path: str, default: Any, decode: Any = None, encode: Any = None,
+                 check_interval: Optional[float] = None) -> None:
+        self.path = path
+        self._default = default                     # callable → قيمة افتراضية جديدة
+        self._decode = decode or (lambda raw: raw)  # JSON → قيمة في الذاكرة
+        self._encode = encode or (lambda v: v)      # قيمة في الذاكرة → JSON
+        self._interval = STATE_CACHE_CHECK_SEC if check_interval is None else float(check_interval)
+        self._lock = threading.RLock()
+        self._value: Any = None
+        self._sig: Optional[Tuple[int, int]] = None
+        self._loaded = False
+        self._next_check = 0.0
+        self._reloads = 0
+        self._writes = 0
+
+    def _stat_sig(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _reload_locked(self, sig: Optional[Tuple[int, int]]) -> None:
+        raw = persist_read_json(self.path, None)
+        if raw is None and sig is not None and self._loaded:
+            value = self._value  # ملف موجود لكن غير صالح (كتابة خارجية جزئية) → نبقي القديم
+        elif raw is None:
+            value = self._default()
+        else:
+            try:
+                value = self._decode(raw)
+            except Exception as e:
+                console_echo(f"[STATE] decode error {self.path}: {e}")
+                value = self._value if self._loaded else self._default()
+        self._value = value
+        self._sig = sig
+        self._loaded = True
+        self._reloads += 1
+
+    def _refresh_locked(self, now: float) -> None:
+        if self._loaded and now < self._next_check:
+            return
+        self._next_check = now + self._interval
+        sig = self._stat_sig()
+        if not self._loaded:
+            self._reload_locked(sig)
+        elif sig != self._sig and not _PERSIST_WORKER.is_pending(self.path):
+            self._reload_locked(sig)
+
+    def get(self) -> Any:
+        """القيمة الحالية (لا تعدّلها مباشرة؛ استخدم set/update)."""
+        if self._loaded and time.monotonic() < self._next_check:
+            return self._value
+        with self._lock:
+            self._refresh_locked(time.monotonic())
+            return self._value
+
+    def set(self, value: Any) -> None:
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self._writes += 1
+            persist_json(self.path, self._encode(value))
+
+    def update(self, fn: Any) -> Any:
+        """
+        read-modify-write ذرّي: fn(current) → (new_value, result).
+        إذا رجعت fn نفس الكائن لا تتم أي كتابة. يرجّع result.
+        """
+        with self._lock:
+            self._refresh_locked(time.monotonic())
+            new_value, result = fn(self._value)
+            if new_value is not self._value:
+                self.set(new_value)
+            return result
+
+    def invalidate(self) -> None:
+        """فرض فحص الملف في القراءة التالية."""
+        with self._lock:
+            self._next_check = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "reloads": self._reloads, "writes": self._writes}
+
+_STATE_CACHES: List[CachedStateFile] = []
+
+def _cached_state(path: str, default: Any, decode: Any = None, encode: Any = None) -> CachedStateFile:
+    cache = CachedStateFile(path, default, decode, encode)
+    _STATE_CACHES.append(cache)
+    return cache
+
+def get_state_cache_stats() -> List[Dict[str, Any]]:
+    return [c.stats() for c in _STATE_CACHES]
+
 # --------- Debug FUNDS toggles ---------
-_DEBUG_FUNDS_STATE: Dict[str, Any] = {
-    "enabled": False,
-    "expires_at": 0.0,
-}
+def _decode_debug_funds(raw: Any) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise ValueError("expected object")
+    return {"enabled": bool(raw.get("enabled")), "expires_at": float(raw.get("expires_at") or 0.0)}
+
+_DEBUG_FUNDS_STATE = _cached_state(
+    DEBUG_FUNDS_FILE,
+    lambda: {"enabled": False, "expires_at": 0.0},
+    decode=_decode_debug_funds,
+)
 
 def enable_debug_funds(minutes: int = 0) -> None:
     """
@@ -134,28 +467,22 @@ def enable_debug_funds(minutes: int = 0) -> None:
       minutes > 0  → ينتهي بعد N دقيقة.
     """
     try:
-        global _DEBUG_FUNDS_STATE
-        _DEBUG_FUNDS_STATE["enabled"] = True
-        if minutes and minutes > 0:
-            _DEBUG_FUNDS_STATE["expires_at"] = time.time() + (minutes * 60.0)
-        else:
-            _DEBUG_FUNDS_STATE["expires_at"] = 0.0
+        expires_at = time.time() + (minutes * 60.0) if minutes and minutes > 0 else 0.0
+        _DEBUG_FUNDS_STATE.set({"enabled": True, "expires_at": expires_at})
         console_echo(f"[DEBUG_FUNDS] enabled for {minutes} minute(s)" if minutes else "[DEBUG_FUNDS] enabled (no expiry)")
     except Exception as e:
         console_echo(f"[DEBUG_FUNDS] enable error: {e}")
 
 def disable_debug_funds() -> None:
     try:
-        global _DEBUG_FUNDS_STATE
-        _DEBUG_FUNDS_STATE["enabled"] = False
-        _DEBUG_FUNDS_STATE["expires_at"] = 0.0
+        _DEBUG_FUNDS_STATE.set({"enabled": False, "expires_at": 0.0})
         console_echo("[DEBUG_FUNDS] disabled")
     except Exception as e:
         console_echo(f"[DEBUG_FUNDS] disable error: {e}")
 
 def is_debug_funds() -> bool:
     try:
-        st = _DEBUG_FUNDS_STATE
+        st = _DEBUG_FUNDS_STATE.get()
         if not st.get("enabled"):
             return False
         exp = float(st.get("expires_at") or 0.0)
@@ -180,37 +507,41 @@ def set_bot_active(value: bool) -> None:
     _BOT_ACTIVE = bool(value)
     console_echo(f"[BOT] active = {value}")
 
+def _decode_email_state(raw: Any) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise ValueError("expected object")
+    return raw
+
+_EMAIL_STATE = _cached_state(EMAIL_STATE_FILE, lambda: {"gate_open": True}, decode=_decode_email_state)
+
 def _load_email_state() -> Dict[str, Any]:
     try:
-        if os.path.exists(EMAIL_STATE_FILE):
-            with open(EMAIL_STATE_FILE, "r") as f:
-                data = json.load(f) or {}
-            return data
+        return dict(_EMAIL_STATE.get())
     except Exception as e:
         console_echo(f"[GATE] load state error: {e}")
     return {"gate_open": True}
 
 def _save_email_state(data: Dict[str, Any]) -> None:
     try:
-        with open(EMAIL_STATE_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        _EMAIL_STATE.set(dict(data))
     except Exception as e:
         console_echo(f"[GATE] save state error: {e}")
 
 def is_email_gate_open() -> bool:
-    """قراءة حالة بوابة الإيميل من ملف الحالة (افتراضي: مفتوحة)."""
+    """حالة بوابة الإيميل من الذاكرة (افتراضي: مفتوحة)."""
     try:
-        data = _load_email_state()
-        return bool(data.get("gate_open", True))
+        return bool(_EMAIL_STATE.get().get("gate_open", True))
     except Exception:
         return True
 
 def set_email_gate(open_flag: bool) -> None:
     """تغيير حالة بوابة الإيميل وتخزينها في EMAIL_STATE_FILE."""
     try:
-        data = _load_email_state()
-        data["gate_open"] = bool(open_flag)
-        _save_email_state(data)
+        def _apply(cur: Dict[str, Any]):
+            data = dict(cur)
+            data["gate_open"] = bool(open_flag)
+            return data, None
+        _EMAIL_STATE.update(_apply)
         console_echo(f"[GATE] email gate → {'OPEN' if open_flag else 'CLOSED'}")
     except Exception as e:
         console_echo(f"[GATE] set_email_gate error: {e}")
@@ -261,22 +592,10 @@ def _new_empty_structure() -> Dict[str, Any]:
         "daily_successful_trades": {},
     }
 
-def get_trade_structure() -> Dict[str, Any]:
+def _normalize_structure(data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    تحميل بنية التداول من STRUCTURE_FILE أو إنشاؤها لأول مرة.
-    يتأكد أن عدد المسارات = DEFAULT_TRACK_COUNT على الأقل.
+    يتأكد أن عدد المسارات = DEFAULT_TRACK_COUNT على الأقل وأن الحقول الأساسية موجودة.
     """
-    data: Dict[str, Any]
-    if os.path.exists(STRUCTURE_FILE):
-        try:
-            with open(STRUCTURE_FILE, "r") as f:
-                data = json.load(f) or {}
-        except Exception as e:
-            console_echo(f"[STRUCTURE] read error: {e}")
-            data = _new_empty_structure()
-    else:
-        data = _new_empty_structure()
-
     # تأكد من وجود الحقول الأساسية
     if "tracks" not in data or not isinstance(data["tracks"], dict):
         data = _new_empty_structure()
@@ -313,10 +632,215 @@ def get_trade_structure() -> Dict[str, Any]:
 
     return data
 
+# --------- StructureManager ---------
+# البنية تُحمّل من STRUCTURE_FILE مرة واحدة وتبقى في الذاكرة:
+#   - view()      → النسخة الحيّة (للقراءة فقط: حراس المراقبة / العدّ).
+#   - snapshot()  → نسخة مستقلة (get_trade_structure يرجّعها كما كان سابقاً).
+#   - update()    → async with: معاملة تحت asyncio.Lock (تُعتمد عند الخروج بلا استثناء).
+#   - set_slot()  → تعديل خانة واحدة مع تحديث العدّادات O(1).
+# الحفظ: مجمّع (coalesced) خلال STRUCTURE_WRITE_DELAY_SEC ثم عبر PersistenceWorker (كتابة ذرّية).
+STRUCTURE_WRITE_DELAY_SEC = float(os.getenv("STRUCTURE_WRITE_DELAY_SEC", "0.25"))
+_ACTIVE_SLOT_STATES = ("open", "reserved", "buy")
+
+class StructureManager:
+    def __init__(self, path: str = STRUCTURE_FILE, write_delay: float = STRUCTURE_WRITE_DELAY_SEC) -> None:
+        self.path = path
+        self.write_delay = max(0.0, float(write_delay))
+        self._lock = threading.RLock()
+        self._alock = asyncio.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._counts: Dict[str, int] = {st: 0 for st in _ACTIVE_SLOT_STATES}
+        self._sym_slots: Dict[str, Set[str]] = {}   # symbol → slot ids الفعّالة
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self.writes = 0
+        self.coalesced = 0
+        self.version = 0   # يزيد مع كل تعديل (replace / set_slot) — للـ caches المشتقة
+
+    # ----- التحميل / القراءة -----
+    def _ensure_loaded(self) -> Dict[str, Any]:
+        if self._data is not None:
+            return self._data
+        with self._lock:
+            if self._data is None:
+                data: Dict[str, Any]
+                if os.path.exists(self.path):
+                    try:
+                        with open(self.path, "r") as f:
+                            data = json.load(f) or {}
+                    except Exception as e:
+                        console_echo(f"[STRUCTURE] read error: {e}")
+                        data = _new_empty_structure()
+                else:
+                    data = _new_empty_structure()
+                self._data = _normalize_structure(data)
+                self._recount()
+            return self._data
+
+    def view(self) -> Dict[str, Any]:
+        """النسخة الحيّة — لا تعدّلها مباشرة (استخدم update / set_slot / replace)."""
+        return self._ensure_loaded()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = self._ensure_loaded()
+        with self._lock:
+            return copy.deepcopy(data)
+
+    def counts(self) -> Dict[str, int]:
+        """عدّادات الخانات الفعّالة {open, reserved, buy, active} — O(1)."""
+        self._ensure_loaded()
+        out = dict(self._counts)
+        out["active"] = sum(self._counts.values())
+        return out
+
+    def active_slots(self, symbol: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """[(slot_id, cell)] للخانات الفعّالة (open/reserved/buy) لهذا الرمز — O(خانات الرمز)."""
+        data = self._ensure_loaded()
+        with self._lock:
+            slots = data.get("slots") or {}
+            sids = sorted(self._sym_slots.get(normalize_symbol(symbol), ()), key=lambda s: (len(s), s))
+            return [(sid, slots[sid]) for sid in sids if slots.get(sid)]
+
+    def _recount(self) -> None:
+        self._counts = {st: 0 for st in _ACTIVE_SLOT_STATES}
+        self._sym_slots = {}
+        for sid, cell in ((self._data or {}).get("slots") or {}).items():
+            self._count_delta(str(sid), cell, +1)
+
+    def _count_delta(self, slot_id: str, cell: Any, sign: int) -> None:
+        st = (cell.get("status") or "").lower() if isinstance(cell, dict) else ""
+        if st not in self._counts:
+            return
+        self._counts[st] += sign
+        sym = normalize_symbol(cell.get("symbol", ""))
+        if sign > 0:
+            self._sym_slots.setdefault(sym, set()).add(slot_id)
+        else:
+            self._sym_slots.get(sym, set()).discard(slot_id)
+
+    # ----- الكتابة -----
+    def replace(self, structure: Dict[str, Any]) -> None:
+        """اعتماد بنية كاملة (save_trade_structure) + إعادة العدّ + حفظ مجمّع."""
+        with self._lock:
+            self._data = _normalize_structure(structure)
+            self._recount()
+            self.version += 1
+            self._schedule_write()
+
+    def set_slot(self, slot_id: str, cell: Optional[Dict[str, Any]]) -> None:
+        """تعديل/تفريغ خانة واحدة مع تحديث العدّادات بالفرق فقط."""
+        data = self._ensure_loaded()
+        with self._lock:
+            slots = data.setdefault("slots", {})
+            self._count_delta(str(slot_id), slots.get(str(slot_id)), -1)
+            slots[str(slot_id)] = cell
+            self._count_delta(str(slot_id), cell, +1)
+            self.version += 1
+            self._schedule_write()
+
+    @asynccontextmanager
+    async def update(self):
+        """
+        async with manager.update() as s:
+            ... تعديل s ...
+        يُعتمد التعديل عند الخروج بنجاح؛ أي استثناء يتجاهل النسخة المعدّلة.
+        الاعتماد يطبّق الفرق فقط (_commit): الخانات المتغيّرة عبر _count_delta بدون
+        normalize / recount، فتعديلات set_slot / replace على خانات أخرى أثناء الكتلة
+        (بعد أي await داخلها) لا تضيع. الكتابات المتزامنة والاعتماد تحت نفس _lock.
+        """
+        async with self._alock:
+            data = self._ensure_loaded()
+            with self._lock:
+                base_slots = dict(data.get("slots") or {})   # مراجع الخلايا (set_slot يستبدلها ولا يعدّلها)
+                base_rest = copy.deepcopy({k: v for k, v in data.items() if k != "slots"})
+                work = copy.deepcopy(data)
+            yield work
+            self._commit(base_slots, base_rest, work)
+
+    def _commit(self, base_slots: Dict[str, Any], base_rest: Dict[str, Any], work: Dict[str, Any]) -> None:
+        data = self._ensure_loaded()
+        with self._lock:
+            slots = data.setdefault("slots", {})
+            new_slots = work.get("slots") or {}
+            changed = 0
+            for sid in set(base_slots) | set(new_slots):
+                if sid in new_slots and sid in base_slots and new_slots[sid] == base_slots[sid]:
+                    continue
+                self._count_delta(str(sid), slots.get(sid), -1)
+                if sid in new_slots:
+                    slots[sid] = new_slots[sid]
+                    self._count_delta(str(sid), new_slots[sid], +1)
+                else:
+                    slots.pop(sid, None)
+                changed += 1
+            for key in (set(base_rest) | set(work)) - {"slots"}:
+                if key in work and key in base_rest and work[key] == base_rest[key]:
+                    continue
+                if key in work:
+                    data[key] = work[key]
+                else:
+                    data.pop(key, None)
+                changed += 1
+            if changed:
+                self.version += 1
+                self._schedule_write()
+
+    def _schedule_write(self) -> None:
+        if self._dirty:
+            self.coalesced += 1
+        self._dirty = True
+        if self.write_delay <= 0:
+            self.flush()
+            return
+        if self._timer is None:
+            self._timer = threading.Timer(self.write_delay, self._timer_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timer_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            console_echo(f"[STRUCTURE] save error: {e}")
+
+    def flush(self) -> bool:
+        """تسليم نسخة من البنية لـ PersistenceWorker إن وُجدت تعديلات معلّقة."""
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return False
+            payload = copy.deepcopy(self._data)
+            self._dirty = False
+        persist_json(self.path, payload)
+        self.writes += 1
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
+        _PERSIST_WORKER.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"writes": self.writes, "coalesced": self.coalesced, "dirty": self._dirty, **self.counts()}
+
+_STRUCTURE_MANAGER = StructureManager()
+
+def get_structure_manager() -> StructureManager:
+    return _STRUCTURE_MANAGER
+
+def get_trade_structure() -> Dict[str, Any]:
+    """
+    بنية التداول الحالية (نسخة مستقلة من StructureManager، بدون قراءة الملف).
+    """
+    return _STRUCTURE_MANAGER.snapshot()
+
 def save_trade_structure(structure: Dict[str, Any]) -> None:
     try:
-        with open(STRUCTURE_FILE, "w") as f:
-            json.dump(structure, f, indent=2)
+        _STRUCTURE_MANAGER.replace(structure)
     except Exception as e:
         console_echo(f"[STRUCTURE] save error: {e}")
 
@@ -326,7 +850,7 @@ def get_effective_max_open(structure: Optional[Dict[str, Any]] = None) -> int:
     (مع سقف عدد المسارات المتاحة فعلياً).
     """
     if structure is None:
-        structure = get_trade_structure()
+        structure = _STRUCTURE_MANAGER.view()
     try:
         max_slots = int(structure.get("cycle_slots", DEFAULT_CYCLE_SLOTS))
     except Exception:
@@ -339,7 +863,7 @@ def count_open_positions(structure: Optional[Dict[str, Any]] = None) -> int:
     حساب عدد الصفقات المفتوحة فعلياً (status in open/buy/reserved).
     """
     if structure is None:
-        structure = get_trade_structure()
+        structure = _STRUCTURE_MANAGER.view()
     tracks = structure.get("tracks", {}) or {}
     cnt = 0
     for tdata in tracks.values():
@@ -357,7 +881,7 @@ def find_available_track(structure: Optional[Dict[str, Any]] = None) -> Optional
     لا يتحقق من الحد الأقصى cycle_slots هنا.
     """
     if structure is None:
-        structure = get_trade_structure()
+        structure = _STRUCTURE_MANAGER.view()
     tracks = structure.get("tracks", {}) or {}
     for tkey in sorted(tracks.keys(), key=lambda x: int(x)):
         cell = tracks[tkey].get("slot")
@@ -380,256 +904,2834 @@ def update_slot(structure: Dict[str, Any], track_num: str, cell: Optional[Dict[s
     structure["tracks"][tkey]["slot"] = cell
 
 # --------- TRADES_FILE helpers ---------
-def _ensure_trades_file() -> Dict[str, Any]:
-    """تحميل TRADES_FILE (مع ضمان الشكل الأساسي)."""
-    data: Dict[str, Any] = {"trades": []}
-    try:
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, "r") as f:
-                loaded = json.load(f) or {}
-            if isinstance(loaded.get("trades"), list):
-                data = loaded
-    except Exception as e:
-        console_echo(f"[TRADES] read error: {e}")
-    return data
+# سجل الصفقات = snapshot (TRADES_FILE) + journal إلحاقي (JSONL):
+#   - كل تعديل (opened / bought / finalized / status / exec) = سطر واحد يُلحق بالـ journal
+#     بدل إعادة كتابة trades.json كاملاً.
+#   - الحالة الحالية (materialized view) في الذاكرة: snapshot + replay للأحداث بعده.
+#   - compaction في الخلفية: snapshot جديد (tmp + os.replace) مع journal_seq،
+#     ثم قصّ الـ journal إلى الأحداث الأحدث منه.
+#   - replay آمن بعد انهيار: سطر أخير مقطوع يُتجاهل، والأحداث ≤ journal_seq لا تُطبّق مرتين.
+TRADES_JOURNAL_FILE = globals().get(
+    "TRADES_JOURNAL_FILE", os.path.splitext(TRADES_FILE)[0] + ".journal.jsonl"
+)
+TRADES_JOURNAL_COMPACT_EVENTS = int(os.getenv("TRADES_JOURNAL_COMPACT_EVENTS", "500"))
+TRADES_JOURNAL_FSYNC = os.getenv("TRADES_JOURNAL_FSYNC", "0") == "1"
 
-def _save_trades_file(data: Dict[str, Any]) -> None:
-    try:
-        with open(TRADES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        console_echo(f"[TRADES] save error: {e}")
+class _TradeScanQueries:
+    """استعلامات الصفقات بمسح خطّي فوق self.trades() (للمخازن غير المفهرسة)."""
 
-def append_trade_record(record: Dict[str, Any]) -> None:
-    """
-    إضافة سجل صفقة جديد إلى TRADES_FILE.
-    يُفترض أن يحتوي على:
-      symbol / entry / sl / targets / track_num / amount / status / opened_at ...
-    """
-    data = _ensure_trades_file()
-    trades = data.get("trades", [])
-    trades.append(record)
-    data["trades"] = trades
-    _save_trades_file(data)
+    indexed = False
 
-def update_trade_status(symbol: str, status: str, track_num: Optional[str] = None) -> None:
-    """
-    تحديث حالة صفقة في TRADES_FILE (آخر صفقة لهذا الرمز/المسار).
-    """
-    try:
-        data = _ensure_trades_file()
-        trades = data.get("trades", [])
+    def latest_for_slot(self, symbol: str, track_num: int, slot_id: str) -> Optional[Dict[str, Any]]:
         sym_norm = normalize_symbol(symbol)
-        last_idx = None
-        for i, tr in enumerate(trades):
-            if normalize_symbol(tr.get("symbol", "")) != sym_norm:
+        latest, latest_ts = None, -1.0
+        for tr in self.trades():
+            try:
+                if normalize_symbol(tr.get("symbol")) != sym_norm:
+                    continue
+                if int(tr.get("track_num", 0) or 0) != int(track_num) or str(tr.get("slot_id")) != str(slot_id):
+                    continue
+                ts = float(tr.get("opened_at", 0) or 0.0)
+                if ts >= latest_ts:
+                    latest, latest_ts = tr, ts
+            except Exception:
                 continue
-            if track_num is not None and str(tr.get("track_num")) != str(track_num):
+        return latest
+
+    def latest_for_symbol(
+        self,
+        symbol: str,
+        track_num: Optional[Any] = None,
+        cycle_num: Optional[Any] = None,
+    ) -> Optional[Dict[str, Any]]:
+        sym_norm = normalize_symbol(symbol)
+        latest, latest_ts = None, -1.0
+        for tr in self.trades():
+            try:
+                if normalize_symbol(tr.get("symbol", "")) != sym_norm:
+                    continue
+                if track_num is not None and str(tr.get("track_num")) != str(track_num):
+                    continue
+                if cycle_num is not None and str(tr.get("cycle_num")) != str(cycle_num):
+                    continue
+                ts = float(tr.get("opened_at", 0) or 0.0)
+                if ts >= latest_ts:
+                    latest, latest_ts = tr, ts
+            except Exception:
                 continue
-            last_idx = i
-        if last_idx is None:
-            return
-        trades[last_idx]["status"] = status
-        if status in ("closed", "stopped", "failed", "drwn"):
-            trades[last_idx]["closed_at"] = utc_ts()
-        data["trades"] = trades
-        _save_trades_file(data)
-    except Exception as e:
-        console_echo(f"[TRADES] update_trade_status error: {e}")
+        return latest
 
-def _update_trade_exec_fields(
-    symbol: str,
-    track_num: str,
-    bought_price: Optional[float] = None,
-    sell_price: Optional[float] = None,
-    sell_qty: Optional[float] = None,
-) -> None:
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        st = (status or "").lower()
+        return [tr for tr in self.trades() if (tr.get("status") or "").lower() == st]
+
+    def status_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for tr in self.trades():
+            st = (tr.get("status") or "").lower()
+            counts[st] = counts.get(st, 0) + 1
+        return counts
+
+    def closed_on_day(self, day: str) -> List[Dict[str, Any]]:
+        """day = 'YYYY-MM-DD' (UTC)."""
+        return [tr for tr in self.trades() if _utc_day(tr.get("closed_at")) == day]
+
+class TradeJournal(_TradeScanQueries):
     """
-    تحديث حقول التنفيذ (سعر الشراء/البيع والكمية) في TRADES_FILE.
+    trades()            → قائمة السجلات الحالية (من الذاكرة).
+    open_trade(rec)     → إضافة صفقة (id تلقائي إن لم يوجد) → trade_id.
+    patch(id, fields)   → تعديل حقول صفقة موجودة (حدث واحد في الـ journal).
+    compact()           → snapshot + قصّ الـ journal (يُستدعى تلقائياً في thread خلفي).
+    latest_for_slot / latest_for_symbol / by_status / closed_on_day → نفس استعلامات
+    SqliteTradeStore لكن بمسح خطّي (_TradeScanQueries).
     """
-    try:
-        data = _ensure_trades_file()
-        trades = data.get("trades", [])
-        sym_norm = normalize_symbol(symbol)
-        last_idx = None
-        for i, tr in enumerate(trades):
-            if normalize_symbol(tr.get("symbol", "")) != sym_norm:
+
+    def __init__(self, snapshot_path: str = TRADES_FILE, journal_path: str = TRADES_JOURNAL_FILE) -> None:
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.archive: Any = None   # TradeArchive: ids المؤرشفة لا يُعاد استخدامها
+        self.version = 0           # يزيد مع كل كتابة — للـ caches المشتقة بدون patch hooks
+        self._lock = threading.RLock()
+        self._trades: List[Dict[str, Any]] = []
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._max_id = 0
+        self._seq = 0
+        self._snap_seq = 0
+        self._pending_events = 0      # أحداث في الـ journal بعد آخر snapshot
+        self._fh: Any = None
+        self._loaded = False
+        self._compacting = False
+        self.appends = 0
+        self.compactions = 0
+        self.skipped_lines = 0
+
+    # ----- التحميل / replay -----
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self) -> None:
+        trades: List[Dict[str, Any]] = []
+        snap_seq = 0
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r") as f:
+                    loaded = json.load(f) or {}
+                if isinstance(loaded.get("trades"), list):
+                    trades = loaded["trades"]
+                snap_seq = int(loaded.get("journal_seq", 0) or 0)
+        except Exception as e:
+            console_echo(f"[TRADES] snapshot read error: {e}")
+        self._trades = trades
+        self._by_id = {}
+        # سجلات قديمة بدون id تأخذ id تسلسلي حتى يمكن تعديلها بأحداث
+        cold_max = self.archive.max_id() if self.archive is not None else 0
+        next_id = max([int(t.get("id", 0) or 0) for t in trades] + [cold_max]) + 1
+        for tr in trades:
+            if tr.get("id") is None:
+                tr["id"] = next_id
+                next_id += 1
+            self._by_id[int(tr["id"])] = tr
+        self._max_id = max(max(self._by_id.keys(), default=0), cold_max)
+        self._snap_seq = self._seq = snap_seq
+        self._pending_events = 0
+
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as f:
+            raw = f.read()
+        if raw and not raw.endswith(b"\n"):
+            # ذيل مقطوع بدون سطر جديد: نقصّه حتى لا يلتصق به أول إلحاق
+            cut = raw.rfind(b"\n") + 1
+            raw = raw[:cut]
+            os.truncate(self.journal_path, cut)
+            self.skipped_lines += 1
+        for line in raw.decode("utf-8", errors="replace").splitlines():
+            line = line.strip()
+            if not line:
                 continue
-            if str(tr.get("track_num")) != str(track_num):
+            try:
+                ev = json.loads(line)
+            except Exception:
+                self.skipped_lines += 1  # سطر مقطوع (انهيار أثناء الكتابة)
                 continue
-            last_idx = i
-        if last_idx is None:
+            seq = int(ev.get("seq", 0) or 0)
+            if seq <= snap_seq:
+                continue  # مُضمَّن في الـ snapshot
+            self._apply(ev)
+            self._seq = max(self._seq, seq)
+            self._pending_events += 1
+        if self.skipped_lines:
+            console_echo(f"[TRADES] journal replay skipped {self.skipped_lines} torn line(s)")
+
+    def _apply(self, ev: Dict[str, Any]) -> None:
+        op = ev.get("op")
+        if op == "opened":
+            rec = dict(ev.get("rec") or {})
+            tid = int(rec.get("id", 0) or 0)
+            if tid in self._by_id:
+                self._by_id[tid].update(rec)
+                return
+            self._trades.append(rec)
+            self._by_id[tid] = rec
+            self._max_id = max(self._max_id, tid)
             return
-        tr = trades[last_idx]
-        if bought_price is not None:
-            tr["bought_price"] = float(bought_price)
-            tr.setdefault("bought_at", utc_ts())
-        if sell_price is not None:
-            tr["sell_price"] = float(sell_price)
-            tr.setdefault("sold_at", utc_ts())
-        if sell_qty is not None:
-            tr["sell_qty"] = float(sell_qty)
-        trades[last_idx] = tr
-        data["trades"] = trades
-        _save_trades_file(data)
-    except Exception as e:
-        console_echo(f"[TRADES] _update_trade_exec_fields error: {e}")
+        if op == "archived":
+            gone = {int(x) for x in (ev.get("ids") or [])}
+            for tid in gone:
+                self._by_id.pop(tid, None)
+            self._trades = [tr for tr in self._trades if int(tr.get("id", 0) or 0) not in gone]
+            return
+        tr = self._by_id.get(int(ev.get("id", 0) or 0))
+        if tr is not None:
+            tr.update(ev.get("fields") or {})
 
-# --------- Summary (PnL) ---------
-def accumulate_summary(profit_delta: float = 0.0, loss_delta: float = 0.0) -> None:
-    """
-    تحديث SUMMARY_FILE بمجموع الربح/الخسارة المحققة.
-    """
-    try:
-        data = {"total_profit": 0.0, "total_loss": 0.0, "net": 0.0}
-        if os.path.exists(SUMMARY_FILE):
+    # ----- الكتابة -----
+    def _write_event(self, ev: Dict[str, Any]) -> None:
+        self._seq += 1
+        ev["seq"] = self._seq
+        ev["ts"] = time.time()
+        line = json.dumps(ev, separators=(",", ":")) + "\n"
+        if self._fh is None:
+            self._fh = open(self.journal_path, "a")
+        self._fh.write(line)
+        self._fh.flush()
+        if TRADES_JOURNAL_FSYNC:
+            os.fsync(self._fh.fileno())
+        self._apply(ev)
+        self.appends += 1
+        self.version += 1
+        self._pending_events += 1
+        if self._pending_events >= TRADES_JOURNAL_COMPACT_EVENTS and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_bg, name="trades-compact", daemon=True).start()
+
+    def next_id(self) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return self._max_id + 1
+
+    def open_trade(self, rec: Dict[str, Any]) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            rec = dict(rec)
+            if rec.get("id") is None:
+                rec["id"] = self._max_id + 1
+            self._write_event({"op": "opened", "rec": rec})
+            return int(rec["id"])
+
+    def patch(self, trade_id: int, fields: Dict[str, Any], op: str = "patch") -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            if int(trade_id) not in self._by_id:
+                return False
+            self._write_event({"op": op, "id": int(trade_id), "fields": dict(fields)})
+            return True
+
+    def evict(self, trade_ids: List[int]) -> int:
+        """إزالة صفقات نُقلت للأرشيف (حدث archived واحد)."""
+        self._ensure_loaded()
+        with self._lock:
+            ids = [int(t) for t in trade_ids if int(t) in self._by_id]
+            if ids:
+                self._write_event({"op": "archived", "ids": ids})
+            return len(ids)
+
+    # ----- القراءة -----
+    def trades(self) -> List[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._trades)
+
+    def get(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._by_id.get(int(trade_id))
+
+    # ----- compaction -----
+    def _compact_bg(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            console_echo(f"[TRADES] compaction error: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self) -> None:
+        """snapshot ذري (tmp + replace) ثم قصّ الـ journal إلى ما بعد journal_seq."""
+        self._ensure_loaded()
+        with self._lock:
+            snap = [dict(tr) for tr in self._trades]
+            seq = self._seq
+        _atomic_write_text(self.snapshot_path, json.dumps({"trades": snap, "journal_seq": seq}, indent=2))
+
+        with self._lock:
+            # أحداث أُلحقت أثناء كتابة الـ snapshot تبقى في الـ journal
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            keep: List[str] = []
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r") as f:
+                    for line in f:
+                        try:
+                            if int(json.loads(line).get("seq", 0) or 0) > seq:
+                                keep.append(line if line.endswith("\n") else line + "\n")
+                        except Exception:
+                            continue
+            jtmp = f"{self.journal_path}.tmp"
+            with open(jtmp, "w") as f:
+                f.writelines(keep)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(jtmp, self.journal_path)
+            self._snap_seq = seq
+            self._pending_events = len(keep)
+            self.compactions += 1
+
+    def close(self) -> None:
+        """compaction نهائي عند الإيقاف."""
+        try:
+            self.compact()
+        finally:
+            with self._lock:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "trades": len(self._trades),
+            "seq": self._seq,
+            "journal_events": self._pending_events,
+            "appends": self.appends,
+            "compactions": self.compactions,
+            "skipped_lines": self.skipped_lines,
+        }
+
+_TRADE_JOURNAL = TradeJournal()
+
+def get_trade_journal() -> TradeJournal:
+    return _TRADE_JOURNAL
+
+# --------- SQLite trade store (اختياري) ---------
+# TRADES_BACKEND=sqlite → نفس واجهة TradeJournal لكن فوق SQLite (WAL) مع فهارس:
+#   id (PRIMARY KEY) / (symbol, track_num, slot_id, opened_at) / status / closed_day (UTC).
+# أول تشغيل بقاعدة فارغة يستورد TRADES_FILE (+ journal) تلقائياً (import_trades_json_to_sqlite).
+TRADES_BACKEND = os.getenv("TRADES_BACKEND", str(globals().get("TRADES_BACKEND", "journal"))).lower()
+TRADES_DB_FILE = globals().get("TRADES_DB_FILE", os.path.splitext(TRADES_FILE)[0] + ".sqlite3")
+
+class SqliteTradeStore:
+    """واجهة TradeJournal (trades / get / open_trade / patch / latest_for_*) فوق SQLite مفهرس."""
+
+    indexed = True
+
+    def __init__(self, db_path: str = TRADES_DB_FILE) -> None:
+        self.db_path = db_path
+        self.archive: Any = None   # TradeArchive: ids المؤرشفة لا يُعاد استخدامها
+        self.version = 0           # يزيد مع كل كتابة — للـ caches المشتقة بدون patch hooks
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.appends = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS trades (
+                    id         INTEGER PRIMARY KEY,
+                    symbol     TEXT NOT NULL,
+                    track_num  INTEGER,
+                    slot_id    TEXT,
+                    status     TEXT,
+                    opened_at  REAL,
+                    closed_at  REAL,
+                    closed_day TEXT,
+                    data       TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_trades_slot ON trades(symbol, track_num, slot_id, opened_at);
+                CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status);
+                CREATE INDEX IF NOT EXISTS idx_trades_closed_day ON trades(closed_day);
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(rec: Dict[str, Any]) -> Tuple[Any, ...]:
+        track = rec.get("track_num")
+        try:
+            track = int(track) if track is not None else None
+        except Exception:
+            pass
+        return (
+            rec.get("id"),
+            normalize_symbol(rec.get("symbol", "")),
+            track,
+            None if rec.get("slot_id") is None else str(rec.get("slot_id")),
+            (rec.get("status") or "").lower() or None,
+            rec.get("opened_at"),
+            rec.get("closed_at"),
+            _utc_day(rec.get("closed_at")),
+            json.dumps(rec, separators=(",", ":")),
+        )
+
+    def _insert_many(self, records: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
             try:
-                with open(SUMMARY_FILE, "r") as f:
-                    loaded = json.load(f)
-                data["total_profit"] = float(loaded.get("total_profit", 0.0) or 0.0)
-                data["total_loss"] = float(loaded.get("total_loss", 0.0) or 0.0)
+                db.executemany(
+                    "INSERT OR REPLACE INTO trades "
+                    "(id, symbol, track_num, slot_id, status, opened_at, closed_at, closed_day, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(r) for r in records],
+                )
+                db.execute("COMMIT")
             except Exception:
-                pass
-        if profit_delta and profit_delta > 0:
-            data["total_profit"] += float(profit_delta)
-        if loss_delta and loss_delta > 0:
-            data["total_loss"] += float(loss_delta)
-        data["net"] = data["total_profit"] - data["total_loss"]
-        with open(SUMMARY_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        console_echo(f"[SUMMARY] accumulate_summary error: {e}")
+                db.execute("ROLLBACK")
+                raise
+        return len(records)
 
-# --------- Terminal Notices ---------
-def log_terminal_notification(msg: str, tag: Optional[str] = None) -> None:
-    """
-    تسجيل إشعار بسيط في TERMINAL_LOG_FILE على شكل:
-      { "msg": {"count": N, "last_ts": ...}, ... }
-    """
-    try:
-        data: Dict[str, Any] = {}
-        if os.path.exists(TERMINAL_LOG_FILE):
-            with open(TERMINAL_LOG_FILE, "r") as f:
-                data = json.load(f) or {}
-        key = msg if tag is None else tag
-        if key not in data:
-            data[key] = {"count": 0, "last_ts": 0}
-        data[key]["count"] = int(data[key].get("count", 0)) + 1
-        data[key]["last_ts"] = utc_ts()
-        with open(TERMINAL_LOG_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        console_echo(f"[TERMINAL_LOG] error: {e}")
+    def count(self) -> int:
+        with self._lock:
+            return int(self._db().execute("SELECT COUNT(*) FROM trades").fetchone()[0])
 
-# --------- Blacklist ---------
-def _load_blacklist() -> Set[str]:
-    try:
-        if os.path.exists(BLACKLIST_FILE):
-            with open(BLACKLIST_FILE, "r") as f:
-                arr = json.load(f) or []
-            return set(normalize_symbol(s) for s in arr if s)
-    except Exception as e:
-        console_echo(f"[BLACKLIST] read error: {e}")
-    return set()
+    # ----- الكتابة -----
+    def next_id(self) -> int:
+        with self._lock:
+            hot_next = int(self._db().execute("SELECT COALESCE(MAX(id), 0) + 1 FROM trades").fetchone()[0])
+            cold_max = self.archive.max_id() if self.archive is not None else 0
+            return max(hot_next, cold_max + 1)
 
-def _save_blacklist(symbols: Set[str]) -> None:
-    try:
-        with open(BLACKLIST_FILE, "w") as f:
-            json.dump(sorted(list(symbols)), f, indent=2)
-    except Exception as e:
-        console_echo(f"[BLACKLIST] save error: {e}")
+    def open_trade(self, rec: Dict[str, Any]) -> int:
+        with self._lock:
+            rec = dict(rec)
+            if rec.get("id") is None:
+                rec["id"] = self.next_id()
+            self._insert_many([rec])
+            self.appends += 1
+            self.version += 1
+            return int(rec["id"])
 
-def add_to_blacklist(symbol: str) -> bool:
-    s_norm = normalize_symbol(symbol)
-    bl = _load_blacklist()
-    if s_norm in bl:
-        return False
-    bl.add(s_norm)
-    _save_blacklist(bl)
-    return True
+    def patch(self, trade_id: int, fields: Dict[str, Any], op: str = "patch") -> bool:
+        with self._lock:
+            rec = self.get(trade_id)
+            if rec is None:
+                return False
+            rec.update(fields)
+            self._insert_many([rec])
+            self.appends += 1
+            self.version += 1
+            return True
 
-def remove_from_blacklist(symbol: str) -> bool:
-    s_norm = normalize_symbol(symbol)
-    bl = _load_blacklist()
-    if s_norm not in bl:
-        return False
-    bl.remove(s_norm)
-    _save_blacklist(bl)
-    return True
+    # ----- القراءة -----
+    def _load_rows(self, sql: str, args: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db().execute(sql, args).fetchall()
+        return [json.loads(r[0]) for r in rows]
 
-def list_blacklist() -> List[str]:
-    return sorted(list(_load_blacklist()))
+    def trades(self) -> List[Dict[str, Any]]:
+        return self._load_rows("SELECT data FROM trades ORDER BY id")
 
-def _is_blocked_symbol(symbol: str) -> bool:
-    return normalize_symbol(symbol) in _load_blacklist()
+    def get(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._load_rows("SELECT data FROM trades WHERE id = ?", (int(trade_id),))
+        return rows[0] if rows else None
 
-# --------- KuCoin Meta / Price / Balance / Orders ---------
-_SYMBOL_META_CACHE: Dict[str, Dict[str, Any]] = {}
+    def latest_for_slot(self, symbol: str, track_num: int, slot_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._load_rows(
+            "SELECT data FROM trades WHERE symbol = ? AND track_num = ? AND slot_id = ? "
+            "ORDER BY opened_at DESC, id DESC LIMIT 1",
+            (normalize_symbol(symbol), int(track_num), str(slot_id)),
+        )
+        return rows[0] if rows else None
 
-def get_symbol_meta(pair: str) -> Optional[Dict[str, Any]]:
-    """
-    جلب معلومات الزوج من KuCoin (baseMinSize / baseIncrement / quoteIncrement).
-    يستخدم كاش داخلي لتجنب التكرار.
-    """
-    try:
-        global _SYMBOL_META_CACHE
-        if pair in _SYMBOL_META_CACHE:
-            return _SYMBOL_META_CACHE[pair]
+    def latest_for_symbol(
+        self,
+        symbol: str,
+        track_num: Optional[Any] = None,
+        cycle_num: Optional[Any] = None,
+    ) -> Optional[Dict[str, Any]]:
+        sql = "SELECT data FROM trades WHERE symbol = ?"
+        args: List[Any] = [normalize_symbol(symbol)]
+        if track_num is not None:
+            sql += " AND track_num = ?"
+            args.append(int(track_num))
+        sql += " ORDER BY opened_at DESC, id DESC"
+        with self._lock:
+            for (data,) in self._db().execute(sql, tuple(args)):
+                rec = json.loads(data)
+                # cycle_num ليس عموداً مفهرساً → فلترة على أحدث المرشّحين فقط
+                if cycle_num is None or str(rec.get("cycle_num")) == str(cycle_num):
+                    return rec
+        return None
 
-        if kucoin is None:
-            # fallback بسيط في وضع عدم توفر الكلينت
-            meta = {
-                "symbol": pair,
-                "baseMinSize": 0.0001,
-                "baseIncrement": 0.000001,
-                "quoteIncrement": 0.0001,
-            }
-            _SYMBOL_META_CACHE[pair] = meta
-            return meta
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        return self._load_rows("SELECT data FROM trades WHERE status = ? ORDER BY id", ((status or "").lower(),))
 
-        # بعض نسخ مكتبة KuCoin تستعمل get_symbol_list فقط
-        symbols = kucoin.get_symbol_list()
-        for s in symbols:
-            if (s.get("symbol") or "").upper() == pair.upper():
-                base_min = float(s.get("baseMinSize", 0) or 0.0)
-                base_inc = float(s.get("baseIncrement", base_min or 0) or 0.0)
-                quote_inc = float(s.get("quoteIncrement", 0) or 0.0)
-                meta = {
-                    "symbol": pair,
-                    "baseMinSize": base_min,
-                    "baseIncrement": base_inc if base_inc > 0 else base_min,
-                    "quoteIncrement": quote_inc if quote_inc > 0 else 0.0001,
-                }
-                _SYMBOL_META_CACHE[pair] = meta
-                return meta
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM trades GROUP BY status").fetchall()
+        return {str(st or ""): int(n) for st, n in rows}
 
-        return None
-    except Exception as e:
-        console_echo(f"[META] get_symbol_meta error for {pair}: {e}")
-        return None
+    def closed_on_day(self, day: str) -> List[Dict[str, Any]]:
+        """day = 'YYYY-MM-DD' (UTC)."""
+        return self._load_rows("SELECT data FROM trades WHERE closed_day = ? ORDER BY closed_at", (day,))
 
-async def fetch_current_price(symbol: str) -> Optional[float]:
+    def evict(self, trade_ids: List[int]) -> int:
+        """حذف صفقات نُقلت للأرشيف."""
+        ids = [(int(t),) for t in trade_ids]
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                db.executemany("DELETE FROM trades WHERE id = ?", ids)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self.version += 1
+        return len(ids)
+
+    def compact(self) -> None:
+        with self._lock:
+            self._db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                finally:
+                    self._conn.close()
+                    self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "trades": self.count(), "appends": self.appends}
+
+def import_trades_json_to_sqlite(
+    json_path: str = TRADES_FILE,
+    db_path: str = TRADES_DB_FILE,
+    force: bool = False,
+) -> int:
     """
-    جلب آخر سعر من KuCoin.
-    يسجل price_fetch_fail_<SYMBOL> في Terminal Notices عند الفشل.
+    استيراد لمرة واحدة: TRADES_FILE (+ الـ journal الخاص به) → SQLite.
+    لا يفعل شيئاً إذا كانت القاعدة فيها صفقات (إلا مع force). يرجّع عدد السجلات المستوردة.
     """
-    pair = format_symbol(symbol)
-    sym_norm = normalize_symbol(symbol)
+    store = SqliteTradeStore(db_path)
     try:
-        if kucoin is None:
-            return None
-        ticker = kucoin.get_ticker(symbol=pair)
-        price_str = (ticker or {}).get("price")
-        if price_str is None:
-            log_terminal_notification(f"price_fetch_fail_{sym_norm}", tag=f"price_fetch_fail_{sym_norm}")
-            return None
-        return float(price_str)
-    except Exception as e:
-        console_echo(f"[PRICE] fetch error for {pair}: {e}")
+        if store.count() and not force:
+            return 0
+        source = TradeJournal(json_path, os.path.splitext(json_path)[0] + ".journal.jsonl")
+        records = source.trades()
+        n = store._insert_many(records) if records else 0
+        console_echo(f"[TRADES] imported {n} trade(s) from {json_path} → {db_path}")
+        return n
+    finally:
+        store.close()
+
+
+# --------- Hot/Cold tiering (أرشيف شهري مضغوط) ---------
+# الطبقة الساخنة (TRADES_FILE + journal / SQLite) تحمل الصفقات الفعّالة والحديثة فقط.
+# archive_closed_trades() ينقل الصفقات النهائية (closed/stopped/drwn/failed) الأقدم من
+# TRADES_HOT_DAYS إلى مقاطع شهرية غير قابلة للتعديل:
+#   TRADES_ARCHIVE_DIR/trades-YYYY-MM.NNNN.jsonl.gz  (+ manifest.json)
+# كل تشغيل يضيف مقطعاً جديداً (NNNN+1) ولا يعيد كتابة مقطع موجود.
+# الترتيب آمن عند الانهيار: المقطع + manifest أولاً، ثم الحذف من الطبقة الساخنة
+# (تكرار مؤقت يُزال عند القراءة: النسخة الساخنة تفوز).
+# manifest["pending"] = ids كُتبت ولم يُؤكَّد حذفها من الطبقة الساخنة (confirm). إذا أُعيدت
+# أرشفة أحدها (عُدّل بعد الكتابة) يحمل المقطع الجديد "supersedes" فتُتجاهل النسخة الأقدم.
+TRADES_ARCHIVE_DIR = globals().get("TRADES_ARCHIVE_DIR", os.path.splitext(TRADES_FILE)[0] + "_archive")
+TRADES_HOT_DAYS = float(os.getenv("TRADES_HOT_DAYS", "30"))
+TRADES_ARCHIVE_INTERVAL_SEC = float(os.getenv("TRADES_ARCHIVE_INTERVAL_SEC", "21600"))
+_FINAL_TRADE_STATES = ("closed", "stopped", "drwn", "failed")
+
+class TradeArchive:
+    """الطبقة الباردة: مقاطع gzip JSONL شهرية + manifest (عدد / نطاق id لكل مقطع)."""
+
+    def __init__(self, root: str = TRADES_ARCHIVE_DIR) -> None:
+        self.root = root
+        self._lock = threading.RLock()
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._cache: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._manifest is None:
+                data: Dict[str, Any] = {}
+                try:
+                    if os.path.exists(self.manifest_path):
+                        with open(self.manifest_path, "r") as f:
+                            data = json.load(f) or {}
+                except Exception as e:
+                    console_echo(f"[ARCHIVE] manifest read error: {e}")
+                data.setdefault("segments", [])
+                data.setdefault("max_id", 0)
+                self._manifest = data
+            return self._manifest
+
+    def segments(self, month: Optional[str] = None) -> List[Dict[str, Any]]:
+        segs = list(self._load_manifest()["segments"])
+        return [s for s in segs if month is None or s.get("month") == month]
+
+    def months(self) -> List[str]:
+        return sorted({s["month"] for s in self.segments()})
+
+    def max_id(self) -> int:
+        return int(self._load_manifest().get("max_id", 0) or 0)
+
+    def count(self) -> int:
+        segs = self.segments()
+        return sum(int(s.get("count", 0) or 0) - len(s.get("supersedes") or ()) for s in segs)
+
+    def _latest_segment(self) -> Dict[int, int]:
+        """id → فهرس أحدث مقطع يحمله (فقط للـ ids المؤرشفة أكثر من مرة)."""
+        latest: Dict[int, int] = {}
+        for idx, seg in enumerate(self.segments()):
+            for tid in seg.get("supersedes") or ():
+                latest[int(tid)] = idx
+        return latest
+
+    def confirm(self, trade_ids: List[int]) -> None:
+        """الـ ids حُذفت من الطبقة الساخنة → لم تعد pending."""
+        if not trade_ids:
+            return
+        with self._lock:
+            manifest = self._load_manifest()
+            done = {int(t) for t in trade_ids}
+            pending = [t for t in manifest.get("pending") or [] if int(t) not in done]
+            if len(pending) == len(manifest.get("pending") or []):
+                return
+            updated = dict(manifest, pending=pending)
+            _atomic_write_text(self.manifest_path, json.dumps(updated, indent=2))
+            self._manifest = updated
+
+    def archive(self, records: List[Dict[str, Any]]) -> int:
+        """كتابة records كمقاطع جديدة (مجمّعة حسب شهر closed_at UTC). يرجّع العدد."""
+        if not records:
+            return 0
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for rec in records:
+            day = _utc_day(rec.get("closed_at") or rec.get("opened_at")) or "1970-01-01"
+            by_month.setdefault(day[:7], []).append(rec)
+        with self._lock:
+            manifest = self._load_manifest()
+            pending = {int(t) for t in manifest.get("pending") or []}
+            os.makedirs(self.root, exist_ok=True)
+            new_segments: List[Dict[str, Any]] = []
+            for month, recs in sorted(by_month.items()):
+                recs.sort(key=lambda r: (float(r.get("closed_at") or 0.0), int(r.get("id", 0) or 0)))
+                part = 1 + max([int(s.get("part", 0)) for s in manifest["segments"] if s.get("month") == month] + [0])
+                fname = f"trades-{month}.{part:04d}.jsonl.gz"
+                path = os.path.join(self.root, fname)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+                        for rec in recs:
+                            gz.write((json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8"))
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(tmp, path)
+                ids = [int(r.get("id", 0) or 0) for r in recs]
+                seg = {
+                    "file": fname, "month": month, "part": part, "count": len(recs),
+                    "min_id": min(ids), "max_id": max(ids), "created_at": utc_ts(),
+                }
+                again = sorted(pending.intersection(ids))
+                if again:
+                    seg["supersedes"] = again
+                new_segments.append(seg)
+            written = {int(r.get("id", 0) or 0) for r in records}
+            updated = {
+                "segments": manifest["segments"] + new_segments,
+                "max_id": max([int(manifest.get("max_id", 0) or 0)] + [s["max_id"] for s in new_segments]),
+                "pending": sorted(pending | written),
+            }
+            _atomic_write_text(self.manifest_path, json.dumps(updated, indent=2))
+            self._manifest = updated
+            self._cache = None
+        return len(records)
+
+    def iter_trades(self, months: Optional[List[str]] = None):
+        """قراءة متدفّقة (segment بعد segment) بدون تحميل الأرشيف كاملاً."""
+        wanted = set(months) if months else None
+        latest = self._latest_segment()
+        for idx, seg in enumerate(self.segments()):
+            if wanted is not None and seg.get("month") not in wanted:
+                continue
+            path = os.path.join(self.root, seg["file"])
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            rec = json.loads(line)
+                            if latest and latest.get(int(rec.get("id", 0) or 0), idx) > idx:
+                                continue  # نسخة أقدم أُعيدت أرشفتها لاحقاً
+                            yield rec
+            except Exception as e:
+                console_echo(f"[ARCHIVE] segment read error {seg['file']}: {e}")
+
+    def trades(self) -> List[Dict[str, Any]]:
+        """كل الصفقات المؤرشفة (cache في الذاكرة حتى الأرشفة التالية)."""
+        with self._lock:
+            if self._cache is None:
+                self._cache = list(self.iter_trades())
+            return list(self._cache)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"segments": len(self.segments()), "trades": self.count(), "max_id": self.max_id()}
+
+_TRADE_ARCHIVE = TradeArchive()
+
+def get_trade_archive() -> TradeArchive:
+    return _TRADE_ARCHIVE
+
+# --------- TradeRepository (in-memory + write-behind) ---------
+# كل القراءات (status / verlauf / track / sell / drawdown) من الذاكرة فقط:
+#   التاريخ يُحمّل مرة واحدة من المخزن الفعلي (journal أو SQLite) عند start() / أول استخدام.
+# الكتابات تُطبّق فوراً في الذاكرة وتُعلَّم dirty، ثم thread خلفي يدفعها للمخزن
+# كل TRADES_FLUSH_SEC ثانية (وعند الإيقاف عبر close()). flush() صريح للاختبارات.
+TRADES_WRITE_BEHIND = os.getenv("TRADES_WRITE_BEHIND", "1") == "1"
+TRADES_FLUSH_SEC = float(os.getenv("TRADES_FLUSH_SEC", "2.0"))
+
+def _trade_slot_key(rec: Dict[str, Any]) -> Optional[Tuple[str, int, str]]:
+    try:
+        return (normalize_symbol(rec.get("symbol", "")), int(rec.get("track_num", 0) or 0), str(rec.get("slot_id")))
+    except Exception:
+        return None
+
+class TradeRepository(_TradeScanQueries):
+    """
+    نفس واجهة TradeJournal / SqliteTradeStore لكن القراءة من الذاكرة والكتابة write-behind.
+    فهارس in-memory تُحدَّث مع كل open_trade / patch / evict:
+      id → record / (symbol, track_num, slot_id) → أحدث صفقة / symbol → صفقاته / status → ids
+    """
+
+    indexed = True
+
+    def __init__(self, backing: Any, flush_sec: float = TRADES_FLUSH_SEC, archive: Optional[TradeArchive] = None) -> None:
+        self.backing = backing
+        self.archive = archive
+        self.flush_sec = max(0.05, float(flush_sec))
+        self._lock = threading.RLock()
+        self._flush_lock = threading.RLock()   # reentrant: archive_closed_trades يمسكه حول evict → flush
+        self._trades: List[Dict[str, Any]] = []
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._slot_latest: Dict[Tuple[str, int, str], Dict[str, Any]] = {}
+        self._by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_status: Dict[str, Set[int]] = {}
+        self._max_id = 0
+        self._new: Set[int] = set()                     # لم تُكتب بعد في المخزن (opened)
+        self._dirty: Dict[int, Dict[str, Any]] = {}     # id → حقول معدّلة لم تُدفع بعد
+        self._dirty_op: Dict[int, str] = {}
+        self._loaded = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.flushed_records = 0
+        self.flush_errors = 0
+        self._patch_hooks: List[Tuple[Any, bool]] = []
+
+    def add_patch_hook(self, fn: Any, final_only: bool = True) -> None:
+        """
+        fn(before, after) بعد open_trade / patch. before = None لسجل جديد. تُستدعى خارج القفل.
+        final_only=True → فقط إذا كانت الصفقة نهائية قبل أو بعد التعديل.
+        """
+        with self._lock:
+            self._patch_hooks.append((fn, bool(final_only)))
+
+    def _fire_patch_hooks(self, before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> None:
+        def _final(rec: Optional[Dict[str, Any]]) -> bool:
+            return rec is not None and (rec.get("status") or "").lower() in _FINAL_TRADE_STATES
+        touches_final = _final(before) or _final(after)
+        for fn, final_only in list(self._patch_hooks):
+            if final_only and not touches_final:
+                continue
+            try:
+                fn(before, after)
+            except Exception as e:
+                console_echo(f"[TRADES] patch hook error: {e}")
+
+    # ----- التحميل -----
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            trades = [dict(tr) for tr in self.backing.trades()]
+            self._trades = trades
+            self._by_id = {int(tr["id"]): tr for tr in trades if tr.get("id") is not None}
+            # ids المؤرشفة لا يُعاد استخدامها
+            cold_max = self.archive.max_id() if self.archive is not None else 0
+            self._max_id = max(max(self._by_id.keys(), default=0), cold_max)
+            self._reindex()
+            self._loaded = True
+
+    # ----- الفهارس -----
+    def _reindex(self) -> None:
+        """إعادة بناء كاملة (التحميل / الأرشفة / تعديل حقل مفتاح — حالات نادرة)."""
+        self._slot_latest, self._by_symbol, self._by_status = {}, {}, {}
+        for rec in self._trades:
+            self._index_add(rec)
+
+    def _index_add(self, rec: Dict[str, Any]) -> None:
+        tid = rec.get("id")
+        self._by_status.setdefault((rec.get("status") or "").lower(), set()).add(tid)
+        key = _trade_slot_key(rec)
+        if key is None:
+            return
+        self._by_symbol.setdefault(key[0], []).append(rec)
+        cur = self._slot_latest.get(key)
+        try:
+            if cur is None or float(rec.get("opened_at", 0) or 0.0) >= float(cur.get("opened_at", 0) or 0.0):
+                self._slot_latest[key] = rec
+        except Exception:
+            pass
+
+    def _index_patch(self, rec: Dict[str, Any], fields: Dict[str, Any]) -> None:
+        """تحديث الفهارس بعد patch: تغيير status = O(1)، تغيير حقل مفتاح = إعادة بناء."""
+        if any(f in fields for f in ("symbol", "track_num", "slot_id", "opened_at")):
+            self._reindex()
+            return
+        if "status" in fields:
+            tid = rec.get("id")
+            for ids in self._by_status.values():
+                ids.discard(tid)
+            self._by_status.setdefault((rec.get("status") or "").lower(), set()).add(tid)
+
+    def start(self) -> None:
+        """تحميل التاريخ + تشغيل thread الـ flush (آمن للاستدعاء أكثر من مرة)."""
+        self._ensure_loaded()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="trades-flush", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_sec):
+            try:
+                self.flush()
+            except Exception as e:
+                console_echo(f"[TRADES] flush error: {e}")
+
+    # ----- الكتابة (ذاكرة + dirty) -----
+    def next_id(self) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return self._max_id + 1
+
+    def open_trade(self, rec: Dict[str, Any]) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            rec = dict(rec)
+            if rec.get("id") is None:
+                rec["id"] = self._max_id + 1
+            tid = int(rec["id"])
+            if tid in self._by_id:
+                before = dict(self._by_id[tid])
+                self._by_id[tid].update(rec)
+                self._index_patch(self._by_id[tid], rec)
+                self._mark_dirty(tid, rec, "patch")
+            else:
+                before = None
+                self._trades.append(rec)
+                self._by_id[tid] = rec
+                self._index_add(rec)
+                self._max_id = max(self._max_id, tid)
+                self._new.add(tid)
+            after = dict(self._by_id[tid])
+        self._fire_patch_hooks(before, after)
+        self.start()
+        return tid
+
+    def patch(self, trade_id: int, fields: Dict[str, Any], op: str = "patch") -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            tr = self._by_id.get(int(trade_id))
+            if tr is None:
+                return False
+            before = dict(tr)
+            tr.update(fields)
+            self._index_patch(tr, fields)
+            self._mark_dirty(int(trade_id), fields, op)
+            after = dict(tr)
+        self._fire_patch_hooks(before, after)
+        self.start()
+        return True
+
+    def _mark_dirty(self, tid: int, fields: Dict[str, Any], op: str) -> None:
+        if tid in self._new:
+            return  # السجل كاملاً سيُكتب كـ opened عند الـ flush
+        self._dirty.setdefault(tid, {}).update(fields)
+        self._dirty_op[tid] = op
+
+    def flush(self) -> int:
+        """دفع كل التعديلات المعلّقة للمخزن الفعلي. يرجّع عدد السجلات المكتوبة."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._new and not self._dirty:
+                    return 0
+                new_recs = [dict(self._by_id[tid]) for tid in sorted(self._new) if tid in self._by_id]
+                dirty = [(tid, fields, self._dirty_op.get(tid, "patch")) for tid, fields in self._dirty.items()]
+                self._new, self._dirty, self._dirty_op = set(), {}, {}
+            written = 0
+            try:
+                for rec in new_recs:
+                    self.backing.open_trade(rec)
+                    written += 1
+                for tid, fields, op in dirty:
+                    self.backing.patch(tid, fields, op=op)
+                    written += 1
+            except Exception:
+                # إعادة ما لم يُكتب إلى قائمة الـ dirty (يُعاد في الدورة التالية)
+                self.flush_errors += 1
+                with self._lock:
+                    for rec in new_recs[written:]:
+                        self._new.add(int(rec["id"]))
+                    for tid, fields, op in dirty[max(0, written - len(new_recs)):]:
+                        merged = dict(fields)
+                        merged.update(self._dirty.get(tid, {}))
+                        self._dirty[tid] = merged
+                        self._dirty_op.setdefault(tid, op)
+                raise
+            finally:
+                self.flushes += 1
+                self.flushed_records += written
+            return written
+
+    def evict(self, trade_ids: List[int]) -> int:
+        """إزالة صفقات (مؤرشفة) من الذاكرة ومن المخزن الفعلي بعد flush."""
+        self.flush()
+        with self._lock:
+            gone = {int(t) for t in trade_ids if int(t) in self._by_id}
+            if not gone:
+                return 0
+            for tid in gone:
+                self._by_id.pop(tid, None)
+            self._trades = [tr for tr in self._trades if int(tr.get("id", 0) or 0) not in gone]
+            self._reindex()
+        self.backing.evict(sorted(gone))
+        return len(gone)
+
+    # ----- القراءة (ذاكرة فقط) -----
+    def trades(self) -> List[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._trades)
+
+    def get(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        return self._by_id.get(int(trade_id))
+
+    def latest_for_slot(self, symbol: str, track_num: int, slot_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        try:
+            key = (normalize_symbol(symbol), int(track_num), str(slot_id))
+        except Exception:
+            return None
+        return self._slot_latest.get(key)
+
+    def latest_for_symbol(
+        self,
+        symbol: str,
+        track_num: Optional[Any] = None,
+        cycle_num: Optional[Any] = None,
+    ) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            candidates = list(self._by_symbol.get(normalize_symbol(symbol), ()))
+        latest, latest_ts = None, -1.0
+        for tr in candidates:
+            try:
+                if track_num is not None and str(tr.get("track_num")) != str(track_num):
+                    continue
+                if cycle_num is not None and str(tr.get("cycle_num")) != str(cycle_num):
+                    continue
+                ts = float(tr.get("opened_at", 0) or 0.0)
+                if ts >= latest_ts:
+                    latest, latest_ts = tr, ts
+            except Exception:
+                continue
+        return latest
+
+    def ids_by_status(self, status: str) -> Set[int]:
+        self._ensure_loaded()
+        with self._lock:
+            return set(self._by_status.get((status or "").lower(), ()))
+
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._by_id[t] for t in sorted(self.ids_by_status(status)) if t in self._by_id]
+
+    def status_counts(self) -> Dict[str, int]:
+        self._ensure_loaded()
+        with self._lock:
+            return {st: len(ids) for st, ids in self._by_status.items() if ids}
+
+    def compact(self) -> None:
+        self.flush()
+        self.backing.compact()
+
+    def close(self) -> None:
+        """إيقاف الـ flusher + flush نهائي + إغلاق المخزن الفعلي."""
+        self._stop.set()
+        t = self._thread
+        if t is not None and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout=self.flush_sec + 5.0)
+        self._thread = None
+        try:
+            self.flush()
+        finally:
+            self.backing.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._new) + len(self._dirty)
+        st = {
+            "trades": len(self._trades),
+            "pending": pending,
+            "flushes": self.flushes,
+            "flushed_records": self.flushed_records,
+            "flush_errors": self.flush_errors,
+        }
+        try:
+            st["backing"] = self.backing.stats()
+        except Exception:
+            pass
+        return st
+
+if TRADES_BACKEND == "sqlite":
+    try:
+        if not os.path.exists(TRADES_DB_FILE) and os.path.exists(TRADES_FILE):
+            import_trades_json_to_sqlite(TRADES_FILE, TRADES_DB_FILE)
+        _TRADE_BACKING: Any = SqliteTradeStore(TRADES_DB_FILE)
+    except Exception as e:
+        console_echo(f"[TRADES] sqlite backend unavailable ({e}); using journal")
+        _TRADE_BACKING = _TRADE_JOURNAL
+else:
+    _TRADE_BACKING = _TRADE_JOURNAL
+
+_TRADE_JOURNAL.archive = _TRADE_ARCHIVE
+_TRADE_BACKING.archive = _TRADE_ARCHIVE
+_TRADE_STORE: Any = TradeRepository(_TRADE_BACKING, archive=_TRADE_ARCHIVE) if TRADES_WRITE_BEHIND else _TRADE_BACKING
+
+def get_trade_store() -> Any:
+    """مخزن الصفقات الفعّال: TradeRepository فوق TradeJournal (افتراضي) أو SqliteTradeStore."""
+    return _TRADE_STORE
+
+def load_all_trades() -> List[Dict[str, Any]]:
+    """
+    كل الصفقات عبر الطبقتين (أرشيف بارد + ساخن) للتقارير (verlauf / status / analytics).
+    المسار الساخن للمحرّك يستخدم get_trade_store().trades() فقط.
+    """
+    hot = _TRADE_STORE.trades()
+    hot_ids = {tr.get("id") for tr in hot}
+    cold = [tr for tr in _TRADE_ARCHIVE.trades() if tr.get("id") not in hot_ids]
+    return cold + hot
+
+def iter_all_trades(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    symbol: Optional[str] = None,
+    track_num: Optional[Any] = None,
+    status: Optional[Any] = None,
+):
+    """
+    Generator على الطبقتين (الأرشيف مقطعاً بعد مقطع، ثم الساخنة) مع الفلاتر أثناء المرور:
+      since / until → opened_at ∈ [since, until)  (مقاطع الأرشيف الأقدم من شهر since تُتخطّى)
+      symbol        → BTC أو BTCUSDT أو BTC-USDT
+      track_num / status (نص أو مجموعة حالات).
+    لا يُبنى أي list للتاريخ كاملاً؛ المستدعي يأخذ ما يحتاجه فقط (islice / deque).
+    """
+    syms: Optional[Set[str]] = None
+    if symbol:
+        s = normalize_symbol(symbol)
+        syms = {s} if s.endswith("USDT") else {s, s + "USDT"}
+    track = str(track_num) if track_num is not None else None
+    if status is None:
+        statuses: Optional[Set[str]] = None
+    elif isinstance(status, str):
+        statuses = {status.lower()}
+    else:
+        statuses = {str(s).lower() for s in status}
+
+    def _match(tr: Dict[str, Any]) -> bool:
+        if syms is not None and normalize_symbol(tr.get("symbol")) not in syms:
+            return False
+        if track is not None and str(tr.get("track_num")) != track:
+            return False
+        if statuses is not None and (tr.get("status") or "").lower() not in statuses:
+            return False
+        if since is not None or until is not None:
+            try:
+                ts = float(tr.get("opened_at") or 0.0)
+            except Exception:
+                return False
+            if since is not None and ts < since:
+                return False
+            if until is not None and ts >= until:
+                return False
+        return True
+
+    hot = _TRADE_STORE.trades()
+    hot_ids = {tr.get("id") for tr in hot}
+    months: Optional[List[str]] = None
+    if since is not None:
+        since_month = (_utc_day(since) or "1970-01-01")[:7]
+        months = [m for m in _TRADE_ARCHIVE.months() if m >= since_month]
+    if months is None or months:
+        for tr in _TRADE_ARCHIVE.iter_trades(months):
+            if tr.get("id") not in hot_ids and _match(tr):
+                yield tr
+    for tr in hot:
+        if _match(tr):
+            yield tr
+
+def archive_closed_trades(older_than_days: Optional[float] = None) -> int:
+    """
+    نقل الصفقات النهائية الأقدم من older_than_days (افتراضي TRADES_HOT_DAYS) إلى الأرشيف.
+    يعمل في thread (I/O + gzip)؛ يرجّع عدد الصفقات المنقولة.
+    1) نسخ المرشّحين تحت _lock (النسخة نفسها = نسخة السجل).
+    2) كتابة المقاطع (gzip + fsync + manifest) بدون أي قفل للمخزن — patch / open_trade لا ينتظران.
+    3) تحت أقفال المخزن (ترتيب flush: _flush_lock ثم _lock): evict فقط للسجلات التي لم تتغيّر
+       منذ النسخ؛ المعدّلة تبقى ساخنة للتشغيل التالي (وإعادة أرشفتها تحلّ محل النسخة القديمة).
+    """
+    store = _TRADE_STORE
+    if not hasattr(store, "evict"):
+        return 0
+    days = TRADES_HOT_DAYS if older_than_days is None else float(older_than_days)
+    cutoff = utc_ts() - days * 86400.0
+
+    def _locked(names: Tuple[str, ...]) -> contextlib.ExitStack:
+        guard = contextlib.ExitStack()
+        for name in names:
+            lock = getattr(store, name, None)
+            if lock is not None:
+                guard.enter_context(lock)
+        return guard
+
+    old: List[Dict[str, Any]] = []
+    with _locked(("_lock",)):
+        for tr in store.trades():
+            try:
+                if (tr.get("status") or "").lower() not in _FINAL_TRADE_STATES:
+                    continue
+                closed_at = tr.get("closed_at")
+                if closed_at and float(closed_at) < cutoff:
+                    old.append(dict(tr))
+            except Exception:
+                continue
+    if not old:
+        return 0
+    _TRADE_ARCHIVE.archive(old)
+    with _locked(("_flush_lock", "_lock")):
+        unchanged = [int(tr["id"]) for tr in old if store.get(int(tr["id"])) == tr]
+        store.evict(unchanged)
+    _TRADE_ARCHIVE.confirm(unchanged)
+    n = len(unchanged)
+    if n < len(old):
+        console_echo(f"[ARCHIVE] {len(old) - n} trade(s) changed while archiving; kept hot for the next run")
+    try:
+        store.compact()
+    except Exception as e:
+        console_echo(f"[ARCHIVE] hot compaction error: {e}")
+    console_echo(f"[ARCHIVE] moved {n} trade(s) older than {days:g}d to {TRADES_ARCHIVE_DIR}")
+    return n
+
+def _ensure_trades_file() -> Dict[str, Any]:
+    """السجل الحالي بنفس شكل TRADES_FILE ({"trades": [...]}) من مخزن الصفقات."""
+    try:
+        return {"trades": _TRADE_STORE.trades()}
+    except Exception as e:
+        console_echo(f"[TRADES] read error: {e}")
+        return {"trades": []}
+
+def append_trade_record(record: Dict[str, Any]) -> None:
+    """
+    إضافة سجل صفقة جديد إلى TRADES_FILE.
+    يُفترض أن يحتوي على:
+      symbol / entry / sl / targets / track_num / amount / status / opened_at ...
+    """
+    try:
+        _TRADE_STORE.open_trade(record)
+    except Exception as e:
+        console_echo(f"[TRADES] save error: {e}")
+
+def update_trade_status(symbol: str, status: str, track_num: Optional[str] = None) -> None:
+    """
+    تحديث حالة صفقة في TRADES_FILE (آخر صفقة لهذا الرمز/المسار).
+    """
+    try:
+        tr = _TRADE_STORE.latest_for_symbol(symbol, track_num)
+        if tr is None:
+            return
+        fields: Dict[str, Any] = {"status": status}
+        if status in ("closed", "stopped", "failed", "drwn"):
+            fields["closed_at"] = utc_ts()
+        _TRADE_STORE.patch(tr["id"], fields, op="status")
+    except Exception as e:
+        console_echo(f"[TRADES] update_trade_status error: {e}")
+
+def _update_trade_exec_fields(
+    symbol: str,
+    track_num: str,
+    bought_price: Optional[float] = None,
+    sell_price: Optional[float] = None,
+    sell_qty: Optional[float] = None,
+) -> None:
+    """
+    تحديث حقول التنفيذ (سعر الشراء/البيع والكمية) في TRADES_FILE.
+    """
+    try:
+        tr = _TRADE_STORE.latest_for_symbol(symbol, track_num)
+        if tr is None:
+            return
+        fields: Dict[str, Any] = {}
+        if bought_price is not None:
+            fields["bought_price"] = float(bought_price)
+            if "bought_at" not in tr:
+                fields["bought_at"] = utc_ts()
+        if sell_price is not None:
+            fields["sell_price"] = float(sell_price)
+            if "sold_at" not in tr:
+                fields["sold_at"] = utc_ts()
+        if sell_qty is not None:
+            fields["sell_qty"] = float(sell_qty)
+        if fields:
+            _TRADE_STORE.patch(tr["id"], fields, op="exec")
+    except Exception as e:
+        console_echo(f"[TRADES] _update_trade_exec_fields error: {e}")
+
+# --------- Summary (PnL rollup) ---------
+# تجميع تزايدي يُحدَّث مع كل صفقة نهائية (patch hook على TradeRepository):
+#   total / day_utc / day_berlin / track / symbol → bucket:
+#     n (صفقات نهائية)، st (عدد لكل حالة)، profit / loss، wins / pnl_n (win rate)،
+#     hold_s / hold_n (متوسط مدة الاحتفاظ: bought_at أو opened_at → closed_at).
+# إعادة فتح صفقة نهائية أو تعديل الـ PnL: نطرح المساهمة القديمة ونضيف الجديدة.
+# يُحفظ في SUMMARY_FILE (مع total_profit / total_loss / net للتوافق) عبر PersistenceWorker.
+# إذا لم يكن الملف بصيغة الـ rollup → إعادة بناء مرة واحدة من load_all_trades().
+PNL_ROLLUP_VERSION = 1
+_ROLLUP_DIMS = ("day_utc", "day_berlin", "track", "symbol")
+
+def _rollup_bucket() -> Dict[str, Any]:
+    return {"n": 0, "st": {}, "profit": 0.0, "loss": 0.0, "wins": 0, "pnl_n": 0, "hold_s": 0.0, "hold_n": 0}
+
+def _rollup_view(b: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """bucket → قيم مشتقة للعرض (net / win_rate / avg_hold_sec)."""
+    b = b or _rollup_bucket()
+    profit, loss = float(b.get("profit", 0.0)), float(b.get("loss", 0.0))
+    pnl_n, hold_n = int(b.get("pnl_n", 0)), int(b.get("hold_n", 0))
+    return {
+        "count": int(b.get("n", 0)),
+        "status": {k: v for k, v in (b.get("st") or {}).items() if v},
+        "profit": profit,
+        "loss": loss,
+        "net": profit - loss,
+        "win_rate": (100.0 * int(b.get("wins", 0)) / pnl_n) if pnl_n else 0.0,
+        "avg_hold_sec": (float(b.get("hold_s", 0.0)) / hold_n) if hold_n else 0.0,
+    }
+
+class PnlRollup:
+    def __init__(self, path: str = SUMMARY_FILE) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._adj: Optional[Dict[str, Any]] = None   # مساهمات adjust() وحدها (تُدمج بعد أي إعادة بناء)
+        self._rebuilt = False
+        self._built_version: Any = None
+        self.live = True   # False → لا patch hooks → إعادة بناء فقط عند تغيّر version المخزن
+        self.rebuilds = 0
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        data: Dict[str, Any] = {"v": PNL_ROLLUP_VERSION, "total": _rollup_bucket()}
+        for dim in _ROLLUP_DIMS:
+            data[dim] = {}
+        return data
+
+    def _ensure_loaded(self) -> Dict[str, Any]:
+        if self._data is not None and self.live:
+            return self._data
+        with self._lock:
+            if self.live:
+                if self._data is None:
+                    loaded = persist_read_json(self.path, None)
+                    roll = loaded.get("rollup") if isinstance(loaded, dict) else None
+                    if isinstance(roll, dict) and roll.get("v") == PNL_ROLLUP_VERSION:
+                        self._data = roll
+                    else:
+                        self._rebuild_locked(load_all_trades())
+                return self._data
+            # بدون hooks: النتيجة صالحة حتى تتغيّر version المخزن (كتابة / أرشفة)
+            version = getattr(_TRADE_STORE, "version", None)
+            if self._data is None or version is None or version != self._built_version:
+                self._rebuild_locked(load_all_trades())
+                self._built_version = version
+            return self._data
+
+    def _load_adj(self) -> Dict[str, Any]:
+        if self._adj is None:
+            loaded = persist_read_json(self.path, None)
+            adj = loaded.get("adjustments") if isinstance(loaded, dict) else None
+            self._adj = adj if isinstance(adj, dict) and adj.get("v") == PNL_ROLLUP_VERSION else self._empty()
+        return self._adj
+
+    def _merge_adj_locked(self) -> None:
+        adj = self._load_adj()
+        pairs = [(self._data["total"], adj["total"])]
+        for dim in _ROLLUP_DIMS:
+            for key, b in adj.get(dim, {}).items():
+                pairs.append((self._data[dim].setdefault(key, _rollup_bucket()), b))
+        for dst, src in pairs:
+            dst["profit"] += float(src.get("profit", 0.0))
+            dst["loss"] += float(src.get("loss", 0.0))
+
+    def rebuild(self, trades: Optional[List[Dict[str, Any]]] = None) -> None:
+        with self._lock:
+            self._rebuild_locked(load_all_trades() if trades is None else trades)
+
+    def _rebuild_locked(self, trades: List[Dict[str, Any]]) -> None:
+        self._data = self._empty()
+        self._rebuilt = True
+        self.rebuilds += 1
+        for tr in trades:
+            if (tr.get("status") or "").lower() in _FINAL_TRADE_STATES:
+                self._apply(tr, 1)
+        self._merge_adj_locked()
+        if self.live:
+            self._save()
+            console_echo(f"[SUMMARY] rollup rebuilt from {len(trades)} trade(s)")
+
+    def _keys(self, rec: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+        ts = rec.get("closed_at")
+        track = rec.get("track_num")
+        return [
+            ("day_utc", _utc_day(ts)),
+            ("day_berlin", _berlin_day(ts)),
+            ("track", str(track) if track not in (None, "") else None),
+            ("symbol", normalize_symbol(rec.get("symbol")) or None),
+        ]
+
+    def _buckets(self, rec: Dict[str, Any], data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        data = self._data if data is None else data
+        out = [data["total"]]
+        for dim, key in self._keys(rec):
+            if key:
+                out.append(data[dim].setdefault(key, _rollup_bucket()))
+        return out
+
+    def _apply(self, rec: Dict[str, Any], sign: int) -> None:
+        st = (rec.get("status") or "").lower()
+        pnl = rec.get("pnl_usdt")
+        hold = None
+        try:
+            start = rec.get("bought_at") or rec.get("opened_at")
+            if start and rec.get("closed_at"):
+                hold = max(0.0, float(rec["closed_at"]) - float(start))
+        except Exception:
+            hold = None
+        for b in self._buckets(rec):
+            b["n"] += sign
+            b["st"][st] = b["st"].get(st, 0) + sign
+            if pnl is not None:
+                pnl_f = float(pnl)
+                if pnl_f >= 0:
+                    b["profit"] += sign * pnl_f
+                else:
+                    b["loss"] += sign * -pnl_f
+                b["pnl_n"] += sign
+                if pnl_f > 0:
+                    b["wins"] += sign
+            if hold is not None:
+                b["hold_s"] += sign * hold
+                b["hold_n"] += sign
+
+    def on_patch(self, before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> None:
+        """patch hook: إزالة مساهمة النسخة القديمة (إن كانت نهائية) + إضافة الجديدة."""
+        with self._lock:
+            if self._data is None:
+                self._rebuilt = False
+                self._ensure_loaded()
+                if self._rebuilt:
+                    return  # إعادة البناء قرأت النسخة الجديدة أصلاً
+            if before is not None and (before.get("status") or "").lower() in _FINAL_TRADE_STATES:
+                self._apply(before, -1)
+            if (after.get("status") or "").lower() in _FINAL_TRADE_STATES:
+                self._apply(after, 1)
+            self._save()
+
+    def adjust(self, pnl_usdt: float, track_num: Any = None, symbol: Optional[str] = None,
+               ts: Optional[float] = None) -> None:
+        """PnL بدون سجل صفقة (مسار احتياطي): يُضاف للمجاميع فقط بدون عدّ صفقة."""
+        with self._lock:
+            self._ensure_loaded()
+            rec = {"closed_at": ts or utc_ts(), "track_num": track_num, "symbol": symbol}
+            pnl_f = float(pnl_usdt or 0.0)
+            for data in (self._data, self._load_adj()):
+                for b in self._buckets(rec, data):
+                    if pnl_f >= 0:
+                        b["profit"] += pnl_f
+                    else:
+                        b["loss"] += -pnl_f
+            self._save(force=True)
+
+    def _save(self, force: bool = False) -> None:
+        """live → الـ rollup كاملاً؛ بدون hooks → التعديلات فقط (الباقي يُعاد بناؤه من الصفقات)."""
+        if not self.live and not force:
+            return
+        total = self._data["total"]
+        payload: Dict[str, Any] = {
+            "total_profit": round(total["profit"], 8),
+            "total_loss": round(total["loss"], 8),
+            "net": round(total["profit"] - total["loss"], 8),
+            "adjustments": copy.deepcopy(self._load_adj()),
+        }
+        if self.live:
+            payload["rollup"] = copy.deepcopy(self._data)
+        persist_json(self.path, payload, indent=None)
+
+    # ----- القراءة: O(1) لكل bucket -----
+    def total(self) -> Dict[str, Any]:
+        with self._lock:
+            return _rollup_view(self._ensure_loaded()["total"])
+
+    def day(self, day: Optional[str] = None, tz: str = "utc") -> Dict[str, Any]:
+        dim = "day_berlin" if tz == "berlin" else "day_utc"
+        if day is None:
+            day = (_berlin_day if tz == "berlin" else _utc_day)(utc_ts())
+        with self._lock:
+            return _rollup_view(self._ensure_loaded()[dim].get(day))
+
+    def track(self, track_num: Any) -> Dict[str, Any]:
+        with self._lock:
+            return _rollup_view(self._ensure_loaded()["track"].get(str(track_num)))
+
+    def symbol(self, symbol: str) -> Dict[str, Any]:
+        with self._lock:
+            return _rollup_view(self._ensure_loaded()["symbol"].get(normalize_symbol(symbol)))
+
+    def keys(self, dim: str) -> List[str]:
+        with self._lock:
+            return sorted(self._ensure_loaded().get(dim, {}).keys())
+
+_PNL_ROLLUP = PnlRollup(SUMMARY_FILE)
+if hasattr(_TRADE_STORE, "add_patch_hook"):
+    _TRADE_STORE.add_patch_hook(_PNL_ROLLUP.on_patch)
+else:
+    _PNL_ROLLUP.live = False
+
+def get_pnl_rollup() -> PnlRollup:
+    return _PNL_ROLLUP
+
+def accumulate_summary(profit_delta: float = 0.0, loss_delta: float = 0.0, track_num: Any = None,
+                       symbol: Optional[str] = None) -> None:
+    """
+    PnL محقق بدون سجل صفقة نهائي (الصفقات النهائية تدخل الـ rollup تلقائياً عبر patch hook،
+    لا تستدعِ هذه الدالة لها وإلا تُحسب مرتين).
+    """
+    try:
+        pnl = float(profit_delta or 0.0) if profit_delta and profit_delta > 0 else 0.0
+        if loss_delta and loss_delta > 0:
+            pnl -= float(loss_delta)
+        if pnl:
+            _PNL_ROLLUP.adjust(pnl, track_num=track_num, symbol=symbol)
+    except Exception as e:
+        console_echo(f"[SUMMARY] accumulate_summary error: {e}")
+
+# --------- Status snapshot (أمر status) ---------
+# يُحدَّث مع أحداث open / buy / finalize (patch hook على TradeRepository) بدل المرور على كل الصفقات:
+#   - اليوم (UTC): عدد الإشارات المفتوحة، الرموز المفتوحة اليوم، قوائم TP / SL / DRWDN / Failed.
+#   - خانات open / buy مرتّبة + خريطة الأرقام لـ sell <index>: تُعاد فقط عند تغيّر
+#     StructureManager.version أو صفقة فعّالة (O(خانات) مع latest_for_slot المفهرس).
+# تغيّر اليوم → مسح واحد للطبقة الساخنة. العدّادات الكلية من PnlRollup.
+class StatusSnapshot:
+    def __init__(self, store: Any = None, manager: Optional[StructureManager] = None) -> None:
+        self._store = store
+        self._manager = manager
+        self._lock = threading.RLock()
+        self._day: Optional[str] = None
+        self._day_bounds = (0.0, 0.0)   # [بداية, نهاية) اليوم كـ epoch — مقارنة أرقام بدل strftime
+        self._opened_today = 0
+        self._syms_today: Set[str] = set()
+        self._realized: Dict[str, Dict[int, Tuple[str, int, str]]] = {st: {} for st in _FINAL_TRADE_STATES}
+        self._slots_version = -1
+        self._slots_dirty = True
+        self._open_rows: List[Tuple[str, int, str, float]] = []
+        self._buy_rows: List[Tuple[str, int, str, float, Optional[float]]] = []
+        self._index_map: Dict[int, Tuple[str, int, str]] = {}
+        self.live = True   # False → لا patch hooks → إعادة بناء عند كل get()
+        self.day_rebuilds = 0
+        self.slot_rebuilds = 0
+
+    @property
+    def store(self) -> Any:
+        return self._store if self._store is not None else _TRADE_STORE
+
+    @property
+    def manager(self) -> StructureManager:
+        return self._manager if self._manager is not None else _STRUCTURE_MANAGER
+
+    @staticmethod
+    def _slot_key(rec: Dict[str, Any]) -> Tuple[str, int, str]:
+        return (
+            normalize_symbol(rec.get("symbol")),
+            int(rec.get("track_num", 0) or 0),
+            str(rec.get("slot_id") or "?"),
+        )
+
+    # ----- اليوم -----
+    def _in_day(self, ts: Any) -> bool:
+        try:
+            return bool(ts) and self._day_bounds[0] <= float(ts) < self._day_bounds[1]
+        except Exception:
+            return False
+
+    def _rebuild_day_locked(self, day: str) -> None:
+        start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+        self._day = day
+        self._day_bounds = (start, start + 86400.0)
+        self._opened_today = 0
+        self._syms_today = set()
+        self._realized = {st: {} for st in _FINAL_TRADE_STATES}
+        lo, hi = self._day_bounds
+        for tr in self.store.trades():
+            opened, closed = tr.get("opened_at"), tr.get("closed_at")
+            try:
+                if opened and lo <= float(opened) < hi:
+                    self._opened_today += 1
+                    self._syms_today.add(normalize_symbol(tr.get("symbol")))
+                if closed and lo <= float(closed) < hi:
+                    entries = self._realized.get((tr.get("status") or "").lower())
+                    if entries is not None:
+                        entries[tr.get("id")] = self._slot_key(tr)
+            except Exception:
+                continue
+        self.day_rebuilds += 1
+
+    def _add_today_locked(self, before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> None:
+        if before is None and self._in_day(after.get("opened_at")):
+            self._opened_today += 1
+            self._syms_today.add(normalize_symbol(after.get("symbol")))
+        tid = after.get("id")
+        for entries in self._realized.values():
+            entries.pop(tid, None)
+        st = (after.get("status") or "").lower()
+        if st in self._realized and self._in_day(after.get("closed_at")):
+            self._realized[st][tid] = self._slot_key(after)
+
+    def on_change(self, before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> None:
+        """patch hook (كل الأحداث): تحديث أحداث اليوم + تعليم الخانات للإعادة."""
+        with self._lock:
+            if self._day is not None:
+                if _utc_day(utc_ts()) != self._day:
+                    self._day = None   # يوم جديد → إعادة بناء كسولة في get()
+                else:
+                    self._add_today_locked(before, after)
+            for rec in (before, after):
+                if rec is not None and (rec.get("status") or "").lower() in _ACTIVE_SLOT_STATES:
+                    self._slots_dirty = True
+
+    # ----- الخانات -----
+    def _rebuild_slots_locked(self) -> None:
+        mgr = self.manager
+        version = mgr.version
+        store = self.store
+        open_rows: List[Tuple[str, int, str, float]] = []
+        buy_rows: List[Tuple[str, int, str, float, Optional[float]]] = []
+        now = time.time()
+        for sid, cell in list((mgr.view().get("slots") or {}).items()):
+            if not cell:
+                continue
+            st = (cell.get("status") or "").lower()
+            sym = normalize_symbol(cell.get("symbol"))
+            track_num = int(cell.get("track_num", 0) or 0)
+            if not sym or track_num <= 0 or st not in _ACTIVE_SLOT_STATES:
+                continue
+            tr = store.latest_for_slot(sym, track_num, str(sid))
+            ts = float(tr.get("opened_at") or now) if tr else now
+            if st == "buy":
+                bp = tr.get("bought_price") if tr else None
+                buy_rows.append((sym, track_num, str(sid), ts, float(bp) if bp is not None else None))
+            else:
+                open_rows.append((sym, track_num, str(sid), ts))
+        open_rows.sort(key=lambda x: (x[0], x[1], int(x[2]) if x[2].isdigit() else 0))
+        buy_rows.sort(key=lambda x: (x[0], x[1], int(x[2]) if x[2].isdigit() else 0))
+        self._open_rows, self._buy_rows = open_rows, buy_rows
+        self._index_map = {i: row[:3] for i, row in enumerate(open_rows + buy_rows, 1)}
+        self._slots_version = version
+        self._slots_dirty = False
+        self.slot_rebuilds += 1
+
+    def get(self) -> Dict[str, Any]:
+        """كل ما يحتاجه أمر status (نسخ صغيرة؛ لا مرور على الصفقات إلا عند تغيّر اليوم)."""
+        with self._lock:
+            today = _utc_day(utc_ts())
+            if not self.live or self._day != today:
+                self._rebuild_day_locked(today)
+            if not self.live or self._slots_dirty or self._slots_version != self.manager.version:
+                self._rebuild_slots_locked()
+            open_syms = {r[0] for r in self._open_rows}
+            buy_syms = {r[0] for r in self._buy_rows}
+            structure = self.manager.view()
+            return {
+                "day": today,
+                "cycle_slots": int(structure.get("cycle_slots", DEFAULT_CYCLE_SLOTS)),
+                "today_total": self._opened_today,
+                "today_open": len(open_syms & self._syms_today),
+                "today_buy": len(buy_syms & self._syms_today),
+                "today_realized": {
+                    st: [entries[t] for t in sorted(entries)] for st, entries in self._realized.items()
+                },
+                "open": list(self._open_rows),
+                "buy": list(self._buy_rows),
+                "index_map": dict(self._index_map),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"day_rebuilds": self.day_rebuilds, "slot_rebuilds": self.slot_rebuilds, "live": self.live}
+
+_STATUS_SNAPSHOT = StatusSnapshot()
+if hasattr(_TRADE_STORE, "add_patch_hook"):
+    _TRADE_STORE.add_patch_hook(_STATUS_SNAPSHOT.on_change, final_only=False)
+else:
+    _STATUS_SNAPSHOT.live = False
+
+def get_status_snapshot() -> StatusSnapshot:
+    return _STATUS_SNAPSHOT
+
+# --------- Trade analytics (أمر stats) ---------
+# الصفقات النهائية كأعمدة NumPy (صف لكل صفقة) تُبنى مرة واحدة من الأرشيف + الطبقة الساخنة.
+# صفقة تصبح نهائية → تُضاف كصف معلّق (patch hook) وتُدمج عند القراءة التالية؛
+# تعديل صفقة نهائية أصلاً (تصحيح PnL) → إعادة بناء كاملة عند القراءة التالية.
+# الفلاتر (فترة closed_at / مسار / رمز) أقنعة bool؛ التجميع bincount / percentile بدون حلقات Python.
+_STAT_STATUS_CODES = {st: i for i, st in enumerate(_FINAL_TRADE_STATES)}
+
+class TradeColumns:
+    _FLOAT_COLS = ("opened_at", "bought_at", "closed_at", "tp1_at", "amount", "pnl_usdt", "pnl_pct")
+
+    def __init__(self, store: Any = None) -> None:
+        self._store = store
+        self._lock = threading.RLock()
+        self._cols: Optional[Dict[str, Any]] = None
+        self._symbols: List[str] = []
+        self._sym_index: Dict[str, int] = {}
+        self._ids: Set[int] = set()
+        self._pending: List[Dict[str, Any]] = []
+        self.rebuilds = 0
+        self.appended = 0
+
+    def _source(self):
+        if self._store is not None:
+            return (tr for tr in self._store.trades()
+                    if (tr.get("status") or "").lower() in _FINAL_TRADE_STATES)
+        return iter_all_trades(status=_FINAL_TRADE_STATES)
+
+    @staticmethod
+    def _f(v: Any) -> float:
+        try:
+            return float(v) if v is not None else float("nan")
+        except Exception:
+            return float("nan")
+
+    def _columns_from(self, recs) -> Dict[str, Any]:
+        raw: Dict[str, List[Any]] = {k: [] for k in ("id", "track", "sym", "status") + self._FLOAT_COLS}
+        for tr in recs:
+            try:
+                tid = int(tr.get("id") or 0)
+            except Exception:
+                continue
+            if tid in self._ids:
+                continue
+            self._ids.add(tid)
+            sym = normalize_symbol(tr.get("symbol"))
+            code = self._sym_index.get(sym)
+            if code is None:
+                code = self._sym_index[sym] = len(self._symbols)
+                self._symbols.append(sym)
+            raw["id"].append(tid)
+            raw["track"].append(int(tr.get("track_num", 0) or 0))
+            raw["sym"].append(code)
+            raw["status"].append(_STAT_STATUS_CODES[(tr.get("status") or "").lower()])
+            for k in self._FLOAT_COLS:
+                raw[k].append(self._f(tr.get(k)))
+        cols = {
+            "id": np.asarray(raw["id"], dtype=np.int64),
+            "track": np.asarray(raw["track"], dtype=np.int32),
+            "sym": np.asarray(raw["sym"], dtype=np.int32),
+            "status": np.asarray(raw["status"], dtype=np.int8),
+        }
+        for k in self._FLOAT_COLS:
+            cols[k] = np.asarray(raw[k], dtype=np.float64)
+        return cols
+
+    def _ensure_locked(self) -> Dict[str, Any]:
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        if self._cols is None:
+            self._symbols, self._sym_index, self._ids = [], {}, set()
+            self._pending = []
+            self._cols = self._columns_from(self._source())
+            self.rebuilds += 1
+        elif self._pending:
+            pending, self._pending = self._pending, []
+            extra = self._columns_from(pending)
+            self._cols = {k: np.concatenate((v, extra[k])) for k, v in self._cols.items()}
+            self.appended += int(extra["id"].size)
+        return self._cols
+
+    def on_patch(self, before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> None:
+        was_final = before is not None and (before.get("status") or "").lower() in _FINAL_TRADE_STATES
+        with self._lock:
+            if self._cols is None:
+                return
+            if was_final:
+                self._cols = None   # تصحيح صفقة نهائية → إعادة بناء عند القراءة التالية
+            elif (after.get("status") or "").lower() in _FINAL_TRADE_STATES:
+                self._pending.append(dict(after))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cols = None
+
+    def summary(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        track_num: Optional[Any] = None,
+        symbol: Optional[str] = None,
+        top: int = 3,
+    ) -> Dict[str, Any]:
+        """
+        إحصاءات على الصفقات النهائية المطابقة (الفترة على closed_at):
+        win rate لكل حالة، percentiles لـ PnL، مدة الاحتفاظ (bought_at → closed_at)،
+        الوقت حتى TP1 (bought_at → tp1_at)، أفضل/أسوأ الرموز، وعائد كل مسار.
+        """
+        with self._lock:
+            c = self._ensure_locked()
+            symbols = list(self._symbols)
+            if symbol:
+                s = normalize_symbol(symbol)
+                codes = [self._sym_index[x] for x in {s, s + "USDT"} if x in self._sym_index]
+        n_all = int(c["id"].size)
+        mask = np.ones(n_all, dtype=bool)
+        if since is not None:
+            mask &= c["closed_at"] >= float(since)
+        if until is not None:
+            mask &= c["closed_at"] < float(until)
+        if track_num is not None:
+            mask &= c["track"] == int(track_num)
+        if symbol:
+            mask &= np.isin(c["sym"], codes)
+
+        pnl = np.nan_to_num(c["pnl_usdt"][mask])
+        pct = c["pnl_pct"][mask]
+        status = c["status"][mask]
+        n = int(pnl.size)
+        out: Dict[str, Any] = {"count": n, "total_trades": n_all}
+        if not n:
+            return out
+
+        out["net"] = float(pnl.sum())
+        out["win_rate"] = float((pnl > 0).mean() * 100.0)
+        out["by_status"] = {}
+        for st, code in _STAT_STATUS_CODES.items():
+            sel = status == code
+            k = int(sel.sum())
+            if k:
+                out["by_status"][st] = {
+                    "count": k,
+                    "share": k * 100.0 / n,
+                    "win_rate": float((pnl[sel] > 0).mean() * 100.0),
+                    "net": float(pnl[sel].sum()),
+                }
+
+        qs = (5, 25, 50, 75, 95)
+        pct_ok = pct[~np.isnan(pct)]
+        out["pnl_usdt_pct"] = dict(zip(qs, (float(x) for x in np.percentile(pnl, qs))))
+        out["pnl_pct_pct"] = dict(zip(qs, (float(x) for x in np.percentile(pct_ok, qs)))) if pct_ok.size else {}
+
+        bought = c["bought_at"][mask]
+        hold = c["closed_at"][mask] - bought
+        hold = hold[~np.isnan(hold) & (hold >= 0)]
+        out["hold_mean"] = float(hold.mean()) if hold.size else None
+        out["hold_median"] = float(np.median(hold)) if hold.size else None
+        ttp = c["tp1_at"][mask] - bought
+        ttp = ttp[~np.isnan(ttp) & (ttp >= 0)]
+        out["tp1_count"] = int(ttp.size)
+        out["tp1_mean"] = float(ttp.mean()) if ttp.size else None
+        out["tp1_median"] = float(np.median(ttp)) if ttp.size else None
+
+        sym = c["sym"][mask]
+        sym_net = np.bincount(sym, weights=pnl, minlength=len(symbols))
+        sym_cnt = np.bincount(sym, minlength=len(symbols))
+        used = np.flatnonzero(sym_cnt)
+        order = used[np.argsort(sym_net[used], kind="stable")]
+        out["best_symbols"] = [(symbols[i], float(sym_net[i]), int(sym_cnt[i])) for i in order[::-1][:top]
+                               if sym_net[i] > 0]
+        out["worst_symbols"] = [(symbols[i], float(sym_net[i]), int(sym_cnt[i])) for i in order[:top]
+                                if sym_net[i] < 0]
+
+        track = c["track"][mask]
+        amount = np.nan_to_num(c["amount"][mask])
+        tr_net = np.bincount(track, weights=pnl)
+        tr_amt = np.bincount(track, weights=amount)
+        tr_cnt = np.bincount(track)
+        out["tracks"] = [
+            {
+                "track": int(t),
+                "count": int(tr_cnt[t]),
+                "net": float(tr_net[t]),
+                "return_pct": float(tr_net[t] / tr_amt[t] * 100.0) if tr_amt[t] > 0 else None,
+            }
+            for t in np.flatnonzero(tr_cnt)
+        ]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = int(self._cols["id"].size) if self._cols is not None else 0
+            return {"rows": rows, "pending": len(self._pending), "rebuilds": self.rebuilds,
+                    "appended": self.appended, "numpy": np is not None}
+
+_TRADE_COLUMNS = TradeColumns()
+if hasattr(_TRADE_STORE, "add_patch_hook"):
+    _TRADE_STORE.add_patch_hook(_TRADE_COLUMNS.on_patch)
+
+def get_trade_columns() -> TradeColumns:
+    return _TRADE_COLUMNS
+
+# --------- Terminal Notices ---------
+# العدّادات في الذاكرة (تُحمّل من TERMINAL_LOG_FILE مرة واحدة) + ring buffer لآخر الأحداث.
+# الحفظ دوري كل TERMINAL_NOTICE_FLUSH_SEC عبر PersistenceWorker (وعند الإيقاف).
+# rate limit لكل key: حدث واحد في الـ ring كل TERMINAL_NOTICE_KEY_INTERVAL_SEC،
+# والباقي يُعدّ فقط (suppressed) حتى لا يطغى رمز واحد على السجل.
+TERMINAL_NOTICE_FLUSH_SEC = float(os.getenv("TERMINAL_NOTICE_FLUSH_SEC", "30"))
+TERMINAL_NOTICE_RING_SIZE = int(os.getenv("TERMINAL_NOTICE_RING_SIZE", "200"))
+TERMINAL_NOTICE_KEY_INTERVAL_SEC = float(os.getenv("TERMINAL_NOTICE_KEY_INTERVAL_SEC", "10"))
+
+class TerminalNoticeLog:
+    def __init__(self, path: str = TERMINAL_LOG_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._counts: Optional[Dict[str, Dict[str, Any]]] = None
+        self._recent: "collections.deque[Tuple[float, str, str]]" = collections.deque(maxlen=max(1, TERMINAL_NOTICE_RING_SIZE))
+        self._last_ring_ts: Dict[str, float] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+
+    def _ensure_loaded(self) -> Dict[str, Dict[str, Any]]:
+        if self._counts is None:
+            data = persist_read_json(self.path, {}) or {}
+            self._counts = {str(k): dict(v) for k, v in data.items() if isinstance(v, dict)}
+        return self._counts
+
+    def record(self, key: str, msg: str) -> None:
+        now = utc_ts()
+        with self._lock:
+            counts = self._ensure_loaded()
+            ent = counts.get(key)
+            if ent is None:
+                ent = counts[key] = {"count": 0, "last_ts": 0}
+            ent["count"] = int(ent.get("count", 0)) + 1
+            ent["last_ts"] = now
+            if now - self._last_ring_ts.get(key, 0.0) >= TERMINAL_NOTICE_KEY_INTERVAL_SEC:
+                self._last_ring_ts[key] = now
+                self._recent.append((now, key, msg))
+            else:
+                ent["suppressed"] = int(ent.get("suppressed", 0)) + 1
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= TERMINAL_NOTICE_FLUSH_SEC
+        if due:
+            self.flush()
+
+    def flush(self) -> bool:
+        """تسليم نسخة من العدّادات لـ PersistenceWorker إن تغيّرت."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._dirty or self._counts is None:
+                return False
+            payload = {k: dict(v) for k, v in self._counts.items()}
+            self._dirty = False
+        persist_json(self.path, payload)
+        self.flushes += 1
+        return True
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._ensure_loaded().items()}
+
+    def recent(self, limit: int = 20) -> List[Tuple[float, str, str]]:
+        with self._lock:
+            return list(self._recent)[-max(0, int(limit)):]
+
+_TERMINAL_NOTICES = TerminalNoticeLog()
+
+def get_terminal_notices() -> TerminalNoticeLog:
+    return _TERMINAL_NOTICES
+
+def log_terminal_notification(msg: str, tag: Optional[str] = None) -> None:
+    """
+    تسجيل إشعار بسيط (في الذاكرة؛ يُحفظ دورياً في TERMINAL_LOG_FILE) على شكل:
+      { "msg": {"count": N, "last_ts": ..., "suppressed": n}, ... }
+    """
+    try:
+        _TERMINAL_NOTICES.record(msg if tag is None else tag, msg)
+    except Exception as e:
+        console_echo(f"[TERMINAL_LOG] error: {e}")
+
+# --------- Blacklist ---------
+# frozenset في الذاكرة (CachedStateFile)؛ الفحص لكل توصية بدون I/O.
+_BLACKLIST_STATE = _cached_state(
+    BLACKLIST_FILE,
+    frozenset,
+    decode=lambda arr: frozenset(normalize_symbol(s) for s in arr if s),
+    encode=lambda symbols: sorted(symbols),
+)
+
+def _load_blacklist() -> Set[str]:
+    try:
+        return set(_BLACKLIST_STATE.get())
+    except Exception as e:
+        console_echo(f"[BLACKLIST] read error: {e}")
+    return set()
+
+def _save_blacklist(symbols: Set[str]) -> None:
+    try:
+        _BLACKLIST_STATE.set(frozenset(symbols))
+    except Exception as e:
+        console_echo(f"[BLACKLIST] save error: {e}")
+
+def add_to_blacklist(symbol: str) -> bool:
+    s_norm = normalize_symbol(symbol)
+    return _BLACKLIST_STATE.update(
+        lambda bl: (bl, False) if s_norm in bl else (bl | {s_norm}, True)
+    )
+
+def remove_from_blacklist(symbol: str) -> bool:
+    s_norm = normalize_symbol(symbol)
+    return _BLACKLIST_STATE.update(
+        lambda bl: (bl - {s_norm}, True) if s_norm in bl else (bl, False)
+    )
+
+def list_blacklist() -> List[str]:
+    return sorted(_BLACKLIST_STATE.get())
+
+def _is_blocked_symbol(symbol: str) -> bool:
+    return normalize_symbol(symbol) in _BLACKLIST_STATE.get()
+
+# --------- KuCoin Rate-Limit Governor ---------
+# كل استدعاءات KuCoin REST تمر عبر token bucket واحد للعملية كلها،
+# مع أولويات: بيع > شراء > استعلام أوامر > أسعار المراقبة > التقارير.
+#   - الطلب لا يأخذ token طالما يوجد منتظر بأولوية أعلى.
+#   - عند 429 يتوقف الـ bucket كله KC_RATE_PENALTY_SEC بدل أن يضرب كل مراقب على حدة.
+#   - stats(): عمق الطابور + زمن الانتظار لكل أولوية.
+KC_PRIO_SELL = 0
+KC_PRIO_BUY = 1
+KC_PRIO_ORDER = 2
+KC_PRIO_PRICE = 3
+KC_PRIO_REPORT = 4
+_KC_PRIO_NAMES = {0: "sell", 1: "buy", 2: "order", 3: "price", 4: "report"}
+
+KC_RATE_PER_SEC = float(os.getenv("KC_RATE_PER_SEC", "10"))
+KC_RATE_BURST = float(os.getenv("KC_RATE_BURST", "20"))
+KC_RATE_PENALTY_SEC = float(os.getenv("KC_RATE_PENALTY_SEC", "10"))
+
+# الأولوية الافتراضية لجلب الأسعار في السياق الحالي (task / thread)
+_KC_PRIORITY: "contextvars.ContextVar[int]" = contextvars.ContextVar("kc_priority", default=KC_PRIO_PRICE)
+
+@contextmanager
+def kc_priority(prio: int):
+    """تغيير أولوية طلبات KuCoin داخل الكتلة (مثلاً KC_PRIO_REPORT لأوامر التقارير)."""
+    token = _KC_PRIORITY.set(int(prio))
+    try:
+        yield
+    finally:
+        _KC_PRIORITY.reset(token)
+
+def _is_rate_limited_error(e: BaseException) -> bool:
+    text = str(e)
+    return "429" in text or "Too Many" in text or "too many" in text
+
+class KucoinRateGovernor:
+    """
+    Token bucket مشترك (thread-safe) لكل استدعاءات KuCoin REST عبر acquire()
+    (يحترم إيقاف ما بعد 429 وترتيب الأولويات).
+    """
+
+    def __init__(self, rate: float = KC_RATE_PER_SEC, burst: float = KC_RATE_BURST) -> None:
+        self.rate = max(0.1, float(rate))
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._waiting: Dict[int, int] = {p: 0 for p in _KC_PRIO_NAMES}
+        self._granted: Dict[int, int] = {p: 0 for p in _KC_PRIO_NAMES}
+        self._wait_total: Dict[int, float] = {p: 0.0 for p in _KC_PRIO_NAMES}
+        self._wait_max: Dict[int, float] = {p: 0.0 for p in _KC_PRIO_NAMES}
+        self.rate_limited = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def _try_take(self, prio: int, cost: float) -> float:
+        """يرجّع 0 عند النجاح، وإلا عدد الثواني المقترح للانتظار."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if any(n > 0 for p, n in self._waiting.items() if p < prio):
+                return 1.0 / self.rate  # أولوية أعلى تنتظر
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate
+
+    def _enter(self, prio: int) -> None:
+        with self._lock:
+            self._waiting[prio] += 1
+
+    def _leave(self, prio: int, waited: float) -> None:
+        with self._lock:
+            self._waiting[prio] -= 1
+            self._granted[prio] += 1
+            self._wait_total[prio] += waited
+            if waited > self._wait_max[prio]:
+                self._wait_max[prio] = waited
+
+    async def acquire(self, prio: Optional[int] = None, cost: float = 1.0) -> float:
+        prio = _KC_PRIORITY.get() if prio is None else int(prio)
+        t0 = time.monotonic()
+        self._enter(prio)
+        try:
+            while True:
+                wait = self._try_take(prio, cost)
+                if wait <= 0.0:
+                    break
+                await asyncio.sleep(min(max(wait, 0.005), 1.0))
+        finally:
+            waited = time.monotonic() - t0
+            self._leave(prio, waited)
+        return waited
+
+    def penalize(self, seconds: float = KC_RATE_PENALTY_SEC) -> None:
+        """بعد 429: إيقاف كل الطلبات مؤقتاً وتفريغ الـ bucket."""
+        with self._lock:
+            self.rate_limited += 1
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + float(seconds))
+        console_echo(f"[RATE] KuCoin 429 → pausing REST for {seconds:g}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per = {}
+            for p, name in _KC_PRIO_NAMES.items():
+                n = self._granted[p]
+                per[name] = {
+                    "queued": self._waiting[p],
+                    "granted": n,
+                    "avg_wait_ms": round(self._wait_total[p] / n * 1000.0, 1) if n else 0.0,
+                    "max_wait_ms": round(self._wait_max[p] * 1000.0, 1),
+                }
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "queue_depth": sum(self._waiting.values()),
+                "paused_sec": round(max(0.0, self._paused_until - time.monotonic()), 1),
+                "rate_limited": self.rate_limited,
+                "by_priority": per,
+            }
+
+_KC_GOVERNOR = KucoinRateGovernor()
+
+def get_kucoin_governor() -> KucoinRateGovernor:
+    return _KC_GOVERNOR
+
+# --------- KuCoin Async Gateway ---------
+# كل استدعاءات KuCoin REST من الـ coroutines تمر من هنا بدل الاستدعاء المتزامن على الـ loop:
+#   - الطلبات العامة (ticker / allTickers / symbols): aiohttp مع connection pool keep-alive
+#     إن كانت المكتبة مثبتة، وإلا نفس دوال الكلينت عبر الـ thread pool.
+#   - الطلبات الخاصة (orders / accounts): الكلينت المتزامن داخل thread pool محدود،
+#     فالتوقيع (HMAC) والـ HTTP يحصلان خارج الـ event loop.
+#   - timeout لكل استدعاء + governor (أولويات + 429) قبل كل طلب.
+#   - وضع الأوامر بدون timeout من جهة الـ loop (timeout=None): wait_for لا يوقف الـ thread،
+#     فالأمر قد يُنفَّذ في البورصة بينما نرجّع None → صفقة غير متتبَّعة أو خروج مزدوج.
+#     نعتمد على timeout الـ HTTP client نفسه.
+try:
+    import aiohttp  # type: ignore
+except Exception:  # pragma: no cover
+    aiohttp = None
+
+KC_GATEWAY_WORKERS = int(os.getenv("KC_GATEWAY_WORKERS", "8"))
+KC_CALL_TIMEOUT_SEC = float(os.getenv("KC_CALL_TIMEOUT_SEC", "10"))
+_KC_DEFAULT_TIMEOUT: Any = object()
+
+class KucoinGateway:
+    """
+    call(fn, ...)   → دالة متزامنة (الكلينت) في thread pool مع timeout (timeout=None → بدون حدّ).
+    public(path...) → GET عام بدون توقيع عبر aiohttp (keep-alive)، أو fallback عبر call().
+    """
+
+    def __init__(self, workers: int = KC_GATEWAY_WORKERS, timeout: float = KC_CALL_TIMEOUT_SEC) -> None:
+        self.workers = max(1, int(workers))
+        self.timeout = float(timeout)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._session = None
+        self.calls = 0
+        self.http_calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.inflight = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kc-gw")
+        return self._pool
+
+    async def _http(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.workers * 2, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _failed(self, e: BaseException) -> None:
+        if isinstance(e, asyncio.TimeoutError):
+            self.timeouts += 1
+        else:
+            self.errors += 1
+            if _is_rate_limited_error(e):
+                _KC_GOVERNOR.penalize()
+
+    async def call(
+        self,
+        fn,
+        *args,
+        prio: Optional[int] = None,
+        cost: float = 1.0,
+        timeout: Any = _KC_DEFAULT_TIMEOUT,
+        **kwargs,
+    ):
+        await _KC_GOVERNOR.acquire(prio, cost)
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()  # kc_priority يبقى فعّالاً داخل الـ thread
+        self.calls += 1
+        self.inflight += 1
+        try:
+            fut = loop.run_in_executor(self._executor(), functools.partial(ctx.run, fn, *args, **kwargs))
+            if timeout is None:
+                return await fut
+            return await asyncio.wait_for(fut, self.timeout if timeout is _KC_DEFAULT_TIMEOUT else timeout)
+        except Exception as e:
+            self._failed(e)
+            raise
+        finally:
+            self.inflight -= 1
+
+    async def public(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        fallback=None,
+        prio: Optional[int] = None,
+        cost: float = 1.0,
+        timeout: Optional[float] = None,
+    ):
+        """يرجّع حقل data من رد KuCoin. fallback = دالة الكلينت المكافئة (بدون aiohttp)."""
+        if aiohttp is None:
+            if fallback is None:
+                raise RuntimeError(f"no HTTP client for {path}")
+            return await self.call(fallback, prio=prio, cost=cost, timeout=timeout or self.timeout)
+
+        await _KC_GOVERNOR.acquire(prio, cost)
+        self.http_calls += 1
+        self.inflight += 1
+        try:
+            session = await self._http()
+            async with session.get(
+                f"{KUCOIN_REST_BASE}{path}",
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+            ) as resp:
+                if resp.status == 429:
+                    raise RuntimeError(f"KuCoin {path}: HTTP 429 Too Many Requests")
+                body = await resp.json(content_type=None)
+            if str((body or {}).get("code")) != "200000":
+                raise RuntimeError(f"KuCoin {path}: {(body or {}).get('code')} {(body or {}).get('msg')}")
+            return body.get("data")
+        except Exception as e:
+            self._failed(e)
+            raise
+        finally:
+            self.inflight -= 1
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http": "aiohttp" if aiohttp is not None else "thread-pool",
+            "workers": self.workers,
+            "calls": self.calls,
+            "http_calls": self.http_calls,
+            "inflight": self.inflight,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+_KC_GATEWAY = KucoinGateway()
+
+def get_kucoin_gateway() -> KucoinGateway:
+    return _KC_GATEWAY
+
+async def kc_call_async(fn, *args, prio: Optional[int] = None, cost: float = 1.0, **kwargs):
+    """استدعاء دالة KuCoin متزامنة عبر الـ gateway (governor + thread pool + timeout)."""
+    return await _KC_GATEWAY.call(fn, *args, prio=prio, cost=cost, **kwargs)
+
+async def kc_public(
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    fallback=None,
+    prio: Optional[int] = None,
+    cost: float = 1.0,
+):
+    """طلب KuCoin عام عبر الـ gateway (aiohttp keep-alive أو fallback للكلينت)."""
+    return await _KC_GATEWAY.public(path, params, fallback=fallback, prio=prio, cost=cost)
+
+# --------- KuCoin Meta / Price / Balance / Orders ---------
+_SYMBOL_META_CACHE: Dict[str, Dict[str, Any]] = {}
+_SYMBOL_META_LOCK = asyncio.Lock()
+
+def _parse_symbol_meta(s: Dict[str, Any]) -> Dict[str, Any]:
+    base_min = float(s.get("baseMinSize", 0) or 0.0)
+    base_inc = float(s.get("baseIncrement", base_min or 0) or 0.0)
+    quote_inc = float(s.get("quoteIncrement", 0) or 0.0)
+    return {
+        "symbol": s.get("symbol"),
+        "baseMinSize": base_min,
+        "baseIncrement": base_inc if base_inc > 0 else base_min,
+        "quoteIncrement": quote_inc if quote_inc > 0 else 0.0001,
+    }
+
+async def get_symbol_meta(pair: str) -> Optional[Dict[str, Any]]:
+    """
+    جلب معلومات الزوج من KuCoin (baseMinSize / baseIncrement / quoteIncrement).
+    يستخدم كاش داخلي لتجنب التكرار: تنزيل قائمة الرموز مرة واحدة يملأ الكاش لكل الأزواج.
+    """
+    try:
+        key = (pair or "").upper()
+        if key in _SYMBOL_META_CACHE:
+            return _SYMBOL_META_CACHE[key]
+
+        if kucoin is None:
+            # fallback بسيط في وضع عدم توفر الكلينت
+            meta = {
+                "symbol": pair,
+                "baseMinSize": 0.0001,
+                "baseIncrement": 0.000001,
+                "quoteIncrement": 0.0001,
+            }
+            _SYMBOL_META_CACHE[key] = meta
+            return meta
+
+        async with _SYMBOL_META_LOCK:
+            if key in _SYMBOL_META_CACHE:  # ملأه طلب متزامن آخر
+                return _SYMBOL_META_CACHE[key]
+            # بعض نسخ مكتبة KuCoin تستعمل get_symbol_list فقط
+            symbols = await kc_public("/api/v2/symbols", fallback=kucoin.get_symbol_list, prio=KC_PRIO_BUY)
+            for s in symbols or []:
+                sym_key = (s.get("symbol") or "").upper()
+                if sym_key:
+                    _SYMBOL_META_CACHE[sym_key] = _parse_symbol_meta(s)
+        return _SYMBOL_META_CACHE.get(key)
+    except Exception as e:
+        console_echo(f"[META] get_symbol_meta error for {pair}: {e}")
+        return None
+
+# --------- KuCoin Public WebSocket (Price Feed) ---------
+# اتصال WebSocket عام واحد لكل البوت بدل REST polling لكل مراقب:
+#   - الاشتراك في /market/ticker لرموز الخانات open/buy (عدّاد مراجع لكل رمز).
+#   - كل tick يُخزَّن كآخر سعر ويوقظ المراقبين المنتظرين لهذا الرمز.
+#   - REST يبقى fallback فقط (عند انقطاع الاتصال أو قِدم السعر).
+# PRICE_FEED_WS_URL يسمح بتوجيه الاتصال لسيرفر محلي (اختبارات / fake server)
+# بدون طلب bullet-public token.
+try:
+    import websockets  # type: ignore
+except Exception:  # pragma: no cover
+    websockets = None
+
+PRICE_FEED_ENABLED = os.getenv("PRICE_FEED_ENABLED", "1") == "1"
+PRICE_FEED_WS_URL = os.getenv("PRICE_FEED_WS_URL", "")
+PRICE_FEED_STALE_SEC = float(os.getenv("PRICE_FEED_STALE_SEC", "15"))
+PRICE_FEED_TOPICS_PER_MSG = 100  # حد KuCoin لعدد الرموز في رسالة subscribe واحدة
+
+KUCOIN_REST_BASE = (
+    "https://openapi-sandbox.kucoin.com"
+    if bool(globals().get("KUCOIN_SANDBOX", False))
+    else "https://api.kucoin.com"
+)
+
+async def _ws_pump(ws: Any, on_message: Any, ping_sec: float) -> None:
+    """
+    قراءة رسائل الـ WebSocket + ping دوري (KuCoin) كـ tasks متوازية تحت asyncio.wait:
+    أول من ينتهي (انقطاع القراءة أو فشل ws.send للـ ping) ينهي الجلسة ويُلغي الآخر،
+    واستثناؤه يُرفع للمستدعي → إعادة اتصال بدل اتصال "حيّ" بلا ping.
+    """
+    async def _reader() -> None:
+        async for raw in ws:
+            on_message(raw)
+
+    async def _pinger() -> None:
+        while True:
+            await asyncio.sleep(max(1.0, ping_sec))
+            await ws.send(json.dumps({"id": uuid.uuid4().hex, "type": "ping"}))
+
+    loop = asyncio.get_running_loop()
+    tasks = [loop.create_task(_reader()), loop.create_task(_pinger())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for t in done:
+        if not t.cancelled() and t.exception() is not None:
+            raise t.exception()
+
+class KucoinPriceFeed:
+    """
+    Price feed مشترك فوق KuCoin public WebSocket.
+    المراقبون يستدعون subscribe/unsubscribe وينتظرون wait_tick،
+    و fetch_current_price يقرأ latest() قبل اللجوء إلى REST.
+    """
+
+    def __init__(self, ws_url: Optional[str] = None, stale_sec: float = PRICE_FEED_STALE_SEC, ping_sec: float = 18.0) -> None:
+        self.ws_url = ws_url or PRICE_FEED_WS_URL or None
+        self.stale_sec = float(stale_sec)
+        self.ping_sec = float(ping_sec)   # لـ ws_url override فقط (bullet-public يحدّد pingInterval)
+        self._prices: Dict[str, Tuple[float, float]] = {}   # sym_norm → (price, recv_ts)
+        self._refs: Dict[str, int] = {}                     # sym_norm → عدد المشتركين
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._listeners: List[Any] = []
+        self._ws: Any = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.connected = False
+        self.ticks = 0
+        self.reconnects = 0
+
+    # ----- الحالة العامة -----
+    def latest(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """آخر سعر من الـ stream إذا كان أحدث من max_age (افتراضي stale_sec)."""
+        item = self._prices.get(normalize_symbol(symbol))
+        if not item:
+            return None
+        price, ts = item
+        age_limit = self.stale_sec if max_age is None else float(max_age)
+        if (time.time() - ts) > age_limit:
+            return None
+        return price
+
+    def symbols(self) -> List[str]:
+        return sorted(self._refs.keys())
+
+    def add_listener(self, callback: Any) -> None:
+        """callback(sym_norm, price) يُستدعى مع كل tick (يجب أن يكون سريعاً وغير متزامن)."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    # ----- الاشتراكات -----
+    def subscribe(self, symbol: str) -> None:
+        sym_norm = normalize_symbol(symbol)
+        if not sym_norm:
+            return
+        self._refs[sym_norm] = self._refs.get(sym_norm, 0) + 1
+        if self._refs[sym_norm] == 1 and self.connected:
+            self._spawn(self._send_topics("subscribe", [sym_norm]))
+        self.start()
+
+    def unsubscribe(self, symbol: str) -> None:
+        sym_norm = normalize_symbol(symbol)
+        n = self._refs.get(sym_norm, 0) - 1
+        if n > 0:
+            self._refs[sym_norm] = n
+            return
+        self._refs.pop(sym_norm, None)
+        self._prices.pop(sym_norm, None)
+        if self.connected:
+            self._spawn(self._send_topics("unsubscribe", [sym_norm]))
+
+    async def wait_tick(self, symbol: str, timeout: float) -> Optional[float]:
+        """
+        انتظار tick جديد للرمز حتى timeout ثانية.
+        يرجّع السعر أو None عند انتهاء المهلة (→ المراقب يستخدم REST).
+        """
+        sym_norm = normalize_symbol(symbol)
+        if not self.connected or sym_norm not in self._refs:
+            await asyncio.sleep(timeout)
+            return None
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(sym_norm, set()).add(fut)
+        try:
+            return await asyncio.wait_for(fut, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(sym_norm)
+            if waiters is not None:
+                waiters.discard(fut)
+                if not waiters:
+                    self._waiters.pop(sym_norm, None)
+
+    # ----- دورة الحياة -----
+    def start(self) -> None:
+        """تشغيل الاتصال (مرة واحدة) إذا توفرت مكتبة websockets و event loop شغّال."""
+        if self._task is not None and not self._task.done():
+            return
+        if not PRICE_FEED_ENABLED or websockets is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._stopping = False
+        self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.connected = False
+        try:
+            if self._ws is not None:
+                await self._ws.close()
+        except Exception:
+            pass
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def _spawn(self, coro: Any) -> None:
+        try:
+            asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+
+    async def _resolve_endpoint(self) -> Tuple[str, float]:
+        """(ws_url, ping_interval_sec) — من override أو من bullet-public."""
+        if self.ws_url:
+            return self.ws_url, self.ping_sec
+
+        def _bullet() -> Dict[str, Any]:
+            req = urllib.request.Request(f"{KUCOIN_REST_BASE}/api/v1/bullet-public", data=b"", method="POST")
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return json.loads(resp.read().decode("utf-8")) or {}
+
+        data = (await kc_call_async(_bullet, prio=KC_PRIO_PRICE)).get("data") or {}
+        server = (data.get("instanceServers") or [{}])[0]
+        endpoint = server.get("endpoint")
+        token = data.get("token")
+        if not endpoint or not token:
+            raise RuntimeError("bullet-public returned no endpoint/token")
+        ping_sec = float(server.get("pingInterval", 18000) or 18000) / 1000.0
+        return f"{endpoint}?token={token}&connectId={uuid.uuid4().hex}", ping_sec
+
+    async def _send_topics(self, kind: str, symbols: List[str]) -> None:
+        ws = self._ws
+        if ws is None or not symbols:
+            return
+        pairs = [format_symbol(s) for s in symbols]
+        for i in range(0, len(pairs), PRICE_FEED_TOPICS_PER_MSG):
+            chunk = pairs[i:i + PRICE_FEED_TOPICS_PER_MSG]
+            msg = {
+                "id": uuid.uuid4().hex,
+                "type": kind,
+                "topic": "/market/ticker:" + ",".join(chunk),
+                "privateChannel": False,
+                "response": True,
+            }
+            try:
+                await ws.send(json.dumps(msg))
+            except Exception as e:
+                console_echo(f"[FEED] {kind} send error: {e}")
+                return
+
+    def _on_ticker(self, pair: str, data: Dict[str, Any]) -> None:
+        price_str = data.get("price") or data.get("bestBid") or data.get("bestAsk")
+        if not price_str:
+            return
+        try:
+            price = float(price_str)
+        except Exception:
+            return
+        sym_norm = normalize_symbol(pair)
+        self._prices[sym_norm] = (price, time.time())
+        self.ticks += 1
+        for fut in list(self._waiters.pop(sym_norm, ())):
+            if not fut.done():
+                fut.set_result(price)
+        for cb in list(self._listeners):
+            try:
+                cb(sym_norm, price)
+            except Exception as e:
+                console_echo(f"[FEED] listener error: {e}")
+
+    def _on_message(self, raw: Any) -> None:
+        try:
+            msg = json.loads(raw)
+        except Exception:
+            return
+        if msg.get("type") != "message":
+            return
+        topic = msg.get("topic") or ""
+        if not topic.startswith("/market/ticker:"):
+            return
+        self._on_ticker(topic.split(":", 1)[1], msg.get("data") or {})
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self._stopping:
+            try:
+                url, ping_sec = await self._resolve_endpoint()
+                async with websockets.connect(url, ping_interval=None, close_timeout=5) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    backoff = 1.0
+                    console_echo(f"[FEED] connected ({len(self._refs)} symbols)")
+                    await self._send_topics("subscribe", list(self._refs.keys()))
+                    await _ws_pump(ws, self._on_message, ping_sec)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                console_echo(f"[FEED] connection error: {e}")
+            finally:
+                self.connected = False
+                self._ws = None
+                # أيقظ المنتظرين حتى يرجعوا إلى REST فوراً
+                for waiters in list(self._waiters.values()):
+                    for fut in waiters:
+                        if not fut.done():
+                            fut.set_result(None)
+            if self._stopping:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2.0, 60.0)
+
+_PRICE_FEED = KucoinPriceFeed()
+
+def get_price_feed() -> KucoinPriceFeed:
+    return _PRICE_FEED
+
+# --------- Price cache (TTL + in-flight dedup) ---------
+# كل من status / track / drawdown / sell اليدوي / المراقبين يطلب نفس الرمز
+# في نفس الثانية تقريباً → نخزّن آخر سعر لكل رمز لمدة PRICE_CACHE_TTL_SEC،
+# ونجمع الطلبات المتزامنة لنفس الرمز في طلب REST واحد.
+PRICE_CACHE_TTL_SEC = float(os.getenv("PRICE_CACHE_TTL_SEC", "2"))
+
+class PriceCache:
+    """
+    كاش أسعار مفتاحه normalize_symbol:
+      - hits       : طلب خُدم من الكاش (سعر أحدث من TTL).
+      - misses     : طلب نفّذ loader فعلياً (REST).
+      - coalesced  : طلب انتظر طلباً جارياً لنفس الرمز بدل طلب جديد.
+    """
+
+    def __init__(self, ttl_sec: float = PRICE_CACHE_TTL_SEC) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self._entries: Dict[str, Tuple[float, float]] = {}  # sym_norm → (price, ts)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def peek(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        item = self._entries.get(normalize_symbol(symbol))
+        if not item:
+            return None
+        ttl = self.ttl_sec if max_age is None else float(max_age)
+        if (time.time() - item[1]) > ttl:
+            return None
+        return item[0]
+
+    def put(self, symbol: str, price: float) -> None:
+        self._entries[normalize_symbol(symbol)] = (float(price), time.time())
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(normalize_symbol(symbol), None)
+
+    async def get(self, symbol: str, loader: Any, ttl: Optional[float] = None) -> Optional[float]:
+        """
+        سعر الرمز من الكاش أو عبر loader(sym_norm) (coroutine).
+        النتيجة None لا تُخزَّن (يُعاد المحاولة في الطلب التالي).
+        """
+        sym_norm = normalize_symbol(symbol)
+        cached = self.peek(sym_norm, ttl)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        pending = self._inflight.get(sym_norm)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[sym_norm] = fut
+        price: Optional[float] = None
+        try:
+            price = await loader(sym_norm)
+            if price is not None:
+                self.put(sym_norm, price)
+            return price
+        finally:
+            self._inflight.pop(sym_norm, None)
+            if not fut.done():
+                fut.set_result(price)
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.coalesced
+        total = served + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "saved_pct": (served / total * 100.0) if total else 0.0,
+            "symbols": len(self._entries),
+        }
+
+_PRICE_CACHE = PriceCache()
+
+def get_price_cache() -> PriceCache:
+    return _PRICE_CACHE
+
+# --------- PriceBoard (all-tickers snapshot) ---------
+# طلب market/allTickers واحد لكل دورة (PRICE_BOARD_TTL_SEC) يغطي كل الرموز،
+# بدل get_ticker لكل Slot → عدد الطلبات ثابت سواء 10 أو 500 خانة.
+# الرموز غير الموجودة في الـ snapshot فقط ترجع إلى get_ticker المنفرد.
+# عند طلب رموز قليلة (< PRICE_BOARD_MIN_SYMBOLS) لا يستحق الأمر تنزيل كل السوق.
+PRICE_BOARD_ENABLED = os.getenv("PRICE_BOARD_ENABLED", "1") == "1"
+PRICE_BOARD_TTL_SEC = float(os.getenv("PRICE_BOARD_TTL_SEC", "10"))
+PRICE_BOARD_MIN_SYMBOLS = int(os.getenv("PRICE_BOARD_MIN_SYMBOLS", "3"))
+PRICE_BOARD_DEMAND_WINDOW_SEC = 120.0
+
+class PriceBoard:
+    """
+    Snapshot لكل أسعار السوق مفهرس بـ normalize_symbol.
+      - refresh(): طلب allTickers واحد (مع قفل حتى لا يتكرر بالتوازي).
+      - get(): يحدّث الـ snapshot عند الحاجة ثم يقرأ من الذاكرة.
+    """
+
+    def __init__(self, ttl_sec: float = PRICE_BOARD_TTL_SEC) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self._prices: Dict[str, float] = {}
+        self._snapshot_ts = 0.0
+        self._attempt_ts = 0.0
+        self._lock = asyncio.Lock()
+        self._demand: Dict[str, float] = {}  # sym_norm → آخر وقت طُلب فيه
+        self.snapshots = 0
+        self.lookups = 0
+        self.missing = 0
+
+    def is_fresh(self) -> bool:
+        return bool(self._prices) and (time.time() - self._snapshot_ts) <= self.ttl_sec
+
+    def lookup(self, symbol: str) -> Optional[float]:
+        """قراءة من آخر snapshot فقط (بدون تحديث)."""
+        if not self.is_fresh():
+            return None
+        return self._prices.get(normalize_symbol(symbol))
+
+    def _wanted(self, sym_norm: str) -> bool:
+        now = time.time()
+        self._demand[sym_norm] = now
+        cutoff = now - PRICE_BOARD_DEMAND_WINDOW_SEC
+        if len(self._demand) > PRICE_BOARD_MIN_SYMBOLS * 4:
+            for k in [k for k, ts in self._demand.items() if ts < cutoff]:
+                self._demand.pop(k, None)
+        active = sum(1 for ts in self._demand.values() if ts >= cutoff)
+        return active >= PRICE_BOARD_MIN_SYMBOLS
+
+    async def refresh(self, force: bool = False) -> bool:
+        if kucoin is None:
+            return False
+        async with self._lock:
+            if not force and self.is_fresh():
+                return True
+            # لا نعيد المحاولة بعد فشل قبل انتهاء الدورة
+            if not force and (time.time() - self._attempt_ts) < self.ttl_sec:
+                return self.is_fresh()
+            self._attempt_ts = time.time()
+            try:
+                # وزن allTickers في KuCoin = 15 مقابل 2 للـ ticker المفرد
+                data = await kc_public("/api/v1/market/allTickers", fallback=kucoin.get_ticker, cost=7.5)
+                rows = (data or {}).get("ticker") or []
+                prices: Dict[str, float] = {}
+                for row in rows:
+                    price_str = row.get("last") or row.get("buy") or row.get("sell")
+                    if not price_str:
+                        continue
+                    try:
+                        prices[normalize_symbol(row.get("symbol", ""))] = float(price_str)
+                    except Exception:
+                        continue
+                if not prices:
+                    raise RuntimeError("empty allTickers snapshot")
+                self._prices = prices
+                self._snapshot_ts = time.time()
+                self.snapshots += 1
+                return True
+            except Exception as e:
+                console_echo(f"[BOARD] allTickers error: {e}")
+                return False
+
+    async def get(self, symbol: str) -> Optional[float]:
+        """
+        السعر من الـ snapshot، أو None إذا:
+          - الطلب قليل الرموز (لا داعي لـ allTickers)، أو
+          - الرمز غير موجود في الـ snapshot (→ get_ticker منفرد).
+        """
+        sym_norm = normalize_symbol(symbol)
+        if not PRICE_BOARD_ENABLED or not self._wanted(sym_norm):
+            return None
+        if not self.is_fresh():
+            await self.refresh()
+        price = self.lookup(sym_norm)
+        if price is None:
+            self.missing += 1
+        else:
+            self.lookups += 1
+        return price
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "snapshots": self.snapshots,
+            "lookups": self.lookups,
+            "missing": self.missing,
+            "markets": len(self._prices),
+            "age_sec": (time.time() - self._snapshot_ts) if self._snapshot_ts else None,
+        }
+
+_PRICE_BOARD = PriceBoard()
+
+def get_price_board() -> PriceBoard:
+    return _PRICE_BOARD
+
+async def fetch_current_price(symbol: str) -> Optional[float]:
+    """
+    جلب آخر سعر من KuCoin.
+    يسجل price_fetch_fail_<SYMBOL> في Terminal Notices عند الفشل.
+    """
+    sym_norm = normalize_symbol(symbol)
+    streamed = _PRICE_FEED.latest(sym_norm)
+    if streamed is not None:
+        return streamed
+    boarded = await _PRICE_BOARD.get(sym_norm)
+    if boarded is not None:
+        return boarded
+    return await _PRICE_CACHE.get(sym_norm, _rest_ticker_price)
+
+# --------- Bounded price fan-out (التقارير) ---------
+# التقارير (status / track / drawdown) تجمع الرموز المميّزة أولاً ثم تجلبها بالتوازي:
+#   - حد أقصى REPORT_PRICE_CONCURRENCY طلب في نفس الوقت (الباقي ينتظر دوره).
+#   - مهلة كلية REPORT_PRICE_DEADLINE_SEC للتقرير كله: ما لم يصل → None (يُعرض N/A).
+#   - الطلبات الجارية عند انتهاء المهلة لا تُلغى (نتيجتها تملأ PriceCache للتقرير التالي)،
+#     والطلبات التي لم تبدأ بعد تُتخطّى.
+REPORT_PRICE_CONCURRENCY = int(os.getenv("REPORT_PRICE_CONCURRENCY", "8"))
+REPORT_PRICE_DEADLINE_SEC = float(os.getenv("REPORT_PRICE_DEADLINE_SEC", "5"))
+
+async def fetch_prices_bounded(
+    symbols: List[str],
+    concurrency: Optional[int] = None,
+    deadline_sec: Optional[float] = None,
+    prio: Optional[int] = None,
+) -> Dict[str, Optional[float]]:
+    """{sym_norm: price أو None} لكل رمز مميّز، خلال deadline_sec كحد أقصى."""
+    distinct = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s))
+    out: Dict[str, Optional[float]] = {s: None for s in distinct}
+    if not distinct:
+        return out
+    limit = max(1, int(concurrency or REPORT_PRICE_CONCURRENCY))
+    timeout = max(0.0, float(REPORT_PRICE_DEADLINE_SEC if deadline_sec is None else deadline_sec))
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + timeout
+    sem = asyncio.Semaphore(limit)
+
+    async def _one(sym: str) -> Tuple[str, Optional[float]]:
+        async with sem:
+            if loop.time() >= deadline_at:
+                return sym, None   # لم يبدأ قبل المهلة → لا طلب
+            try:
+                if prio is not None:
+                    with kc_priority(prio):
+                        return sym, await fetch_current_price(sym)
+                return sym, await fetch_current_price(sym)
+            except Exception as e:
+                console_echo(f"[PRICE] report fetch error {sym}: {e}")
+                return sym, None
+
+    tasks = [asyncio.ensure_future(_one(s)) for s in distinct]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for t in done:
+        sym, price = t.result()
+        out[sym] = price
+    for t in pending:
+        t.add_done_callback(lambda f: f.exception() if not f.cancelled() else None)
+    if pending:
+        console_echo(f"[PRICE] report deadline {timeout:g}s: {len(pending)}/{len(distinct)} symbol(s) → N/A")
+    return out
+
+async def _rest_ticker_price(symbol: str) -> Optional[float]:
+    pair = format_symbol(symbol)
+    sym_norm = normalize_symbol(symbol)
+    try:
+        if kucoin is None:
+            return None
+        ticker = await kc_public(
+            "/api/v1/market/orderbook/level1",
+            {"symbol": pair},
+            fallback=functools.partial(kucoin.get_ticker, symbol=pair),
+        )
+        price_str = (ticker or {}).get("price")
+        if price_str is None:
+            log_terminal_notification(f"price_fetch_fail_{sym_norm}", tag=f"price_fetch_fail_{sym_norm}")
+            return None
+        return float(price_str)
+    except Exception as e:
+        console_echo(f"[PRICE] fetch error for {pair}: {e}")
         log_terminal_notification(f"price_fetch_fail_{sym_norm}", tag=f"price_fetch_fail_{sym_norm}")
         return None
 
-def get_trade_balance_usdt(sim_override: bool = False) -> float:
+async def get_trade_balance_usdt(sim_override: bool = False) -> float:
     """
     قراءة الرصيد المتاح من USDT في حساب التداول.
     في وضع المحاكاة أو عدم توفر الكلينت نرجّع قيمة كبيرة.
@@ -637,7 +3739,7 @@ def get_trade_balance_usdt(sim_override: bool = False) -> float:
     try:
         if sim_override or IS_SIMULATION or kucoin is None:
             return float(os.getenv("SIM_USDT_BALANCE", "999999"))
-        accts = kucoin.get_accounts()
+        accts = await kc_call_async(kucoin.get_accounts, prio=KC_PRIO_BUY)
         avail = 0.0
         for a in accts:
             if (a.get("currency") or "").upper() != "USDT":
@@ -656,7 +3758,7 @@ def get_trade_balance_usdt(sim_override: bool = False) -> float:
 # --- أوامر السوق (حقيقي/محاكاة) ---
 _SIM_ORDERS: Dict[str, Tuple[float, float]] = {}  # orderId → (filled_qty, deal_funds)
 
-def _sim_place_order(
+async def _sim_place_order(
     pair: str,
     side: str,
     size: Optional[str] = None,
@@ -670,9 +3772,15 @@ def _sim_place_order(
     sym = symbol_hint or pair
     price = None
     try:
-        # محاولة جلب السعر بشكل متزامن (استدعاء بسيط على kucoin)
+        # محاولة جلب السعر عبر الـ gateway (بدون حجب الـ event loop)
         if kucoin is not None:
-            ticker = kucoin.get_ticker(symbol=pair)
+            prio = KC_PRIO_SELL if str(side).lower() == "sell" else KC_PRIO_BUY
+            ticker = await kc_public(
+                "/api/v1/market/orderbook/level1",
+                {"symbol": pair},
+                fallback=functools.partial(kucoin.get_ticker, symbol=pair),
+                prio=prio,
+            )
             price_str = (ticker or {}).get("price")
             if price_str:
                 price = float(price_str)
@@ -698,7 +3806,7 @@ def _sim_place_order(
     _SIM_ORDERS[order_id] = (qty, deal_funds)
     return {"orderId": order_id, "symbol": pair, "side": side, "price": price}
 
-def place_market_order(
+async def place_market_order(
     pair: str,
     side: str,
     size: Optional[str] = None,
@@ -713,7 +3821,7 @@ def place_market_order(
     """
     try:
         if sim_override or IS_SIMULATION or kucoin is None:
-            return _sim_place_order(pair, side, size=size, funds=funds, symbol_hint=symbol_hint)
+            return await _sim_place_order(pair, side, size=size, funds=funds, symbol_hint=symbol_hint)
 
         args: Dict[str, Any] = {"symbol": pair, "side": side}
         if size is not None:
@@ -722,7 +3830,12 @@ def place_market_order(
             args["funds"] = funds
 
         # واجهة مكتبة KuCoin الرسمية: create_market_order(symbol, side, size=None, funds=None)
-        order = kucoin.create_market_order(**args)
+        # timeout=None: انتهاء الانتظار لا يلغي الطلب في الـ thread → لا نرجّع None لأمر قد يكون نُفّذ
+        _FILL_TRACKER.start()  # الـ stream جاهز قبل رسائل التنفيذ
+        prio = KC_PRIO_SELL if str(side).lower() == "sell" else KC_PRIO_BUY
+        order = await _KC_GATEWAY.call(
+            kucoin.create_market_order, prio=prio, timeout=None, **args
+        )
         console_echo(f"[ORDER] market {side} {pair} → {order}")
         return order
     except Exception as e:
@@ -746,7 +3859,7 @@ async def get_order_deal_size(
                 return _SIM_ORDERS[order_id]
             return 0.0, 0.0
 
-        info = kucoin.get_order(order_id)
+        info = await kc_call_async(kucoin.get_order, order_id, prio=KC_PRIO_ORDER)
         filled_size = float(info.get("dealSize", 0) or 0.0)
         deal_funds = float(info.get("dealFunds", 0) or 0.0)
         return filled_size, deal_funds
@@ -754,6 +3867,266 @@ async def get_order_deal_size(
         console_echo(f"[ORDER] get_order_deal_size error: {e}")
         return 0.0, 0.0
 
+# --------- Fill tracker (KuCoin private WebSocket) ---------
+# بدل sleep(1) + get_order مرة واحدة بعد كل أمر سوق:
+#   - اتصال خاص واحد على /spotMarket/tradeOrdersV2 (bullet-private موقّع).
+#   - كل orderId له Future ينحلّ عند رسالة filled/done مع (dealSize, dealFunds)
+#     (dealFunds = مجموع matchSize × matchPrice من رسائل match).
+#   - رسالة تصل قبل تسجيل الانتظار تُحفظ في _done.
+#   - عند غياب الـ stream أو انقطاعه: polling لـ get_order بـ backoff أُسّي.
+FILL_WS_ENABLED = os.getenv("FILL_WS_ENABLED", "1") == "1"
+FILL_WS_URL = os.getenv("FILL_WS_URL", "")            # override (اختبارات / fake server)
+FILL_WAIT_SEC = float(os.getenv("FILL_WAIT_SEC", "5"))  # أقصى انتظار على الـ stream قبل polling
+FILL_POLL_FIRST_SEC = 0.25
+FILL_POLL_MAX_SEC = float(os.getenv("FILL_POLL_MAX_SEC", "10"))
+FILL_DONE_TTL_SEC = 300
+
+def _kucoin_private_headers(method: str, path: str, body: str = "") -> Dict[str, str]:
+    """ترويسات KuCoin V2 الموقّعة (KC-API-SIGN / KC-API-PASSPHRASE)."""
+    key = str(globals().get("KUCOIN_API_KEY", "") or "")
+    secret = str(globals().get("KUCOIN_API_SECRET", "") or "").encode("utf-8")
+    passphrase = str(globals().get("KUCOIN_API_PASSPHRASE", "") or "").encode("utf-8")
+    ts = str(int(time.time() * 1000))
+    sign = base64.b64encode(hmac.new(secret, (ts + method + path + body).encode("utf-8"), hashlib.sha256).digest())
+    pp = base64.b64encode(hmac.new(secret, passphrase, hashlib.sha256).digest())
+    return {
+        "KC-API-KEY": key,
+        "KC-API-SIGN": sign.decode("utf-8"),
+        "KC-API-TIMESTAMP": ts,
+        "KC-API-PASSPHRASE": pp.decode("utf-8"),
+        "KC-API-KEY-VERSION": str(globals().get("KUCOIN_API_KEY_VERSION", 2)),
+        "Content-Type": "application/json",
+    }
+
+class OrderFillTracker:
+    """
+    wait_fill(order_id) → (filled_qty, deal_funds):
+      من الـ private stream إن كان متصلاً، وإلا polling بـ backoff أُسّي.
+    """
+
+    def __init__(self, ws_url: Optional[str] = None, ping_sec: float = 18.0) -> None:
+        self.ws_url = ws_url or FILL_WS_URL or None
+        self.ping_sec = float(ping_sec)   # لـ ws_url override فقط
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._acc: Dict[str, List[float]] = {}                     # orderId → [size, funds]
+        self._done: Dict[str, Tuple[float, float, float]] = {}     # orderId → (size, funds, ts)
+        self._ws: Any = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.connected = False
+        self.stream_fills = 0
+        self.polled_fills = 0
+        self.reconnects = 0
+
+    def _enabled(self) -> bool:
+        if not FILL_WS_ENABLED or websockets is None:
+            return False
+        if self.ws_url:
+            return True
+        return bool(kucoin is not None and globals().get("KUCOIN_API_KEY"))
+
+    # ----- دورة الحياة -----
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if not self._enabled():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._stopping = False
+        self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.connected = False
+        try:
+            if self._ws is not None:
+                await self._ws.close()
+        except Exception:
+            pass
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    async def _resolve_endpoint(self) -> Tuple[str, float]:
+        if self.ws_url:
+            return self.ws_url, self.ping_sec
+
+        def _bullet() -> Dict[str, Any]:
+            path = "/api/v1/bullet-private"
+            req = urllib.request.Request(
+                f"{KUCOIN_REST_BASE}{path}", data=b"", method="POST",
+                headers=_kucoin_private_headers("POST", path),
+            )
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return json.loads(resp.read().decode("utf-8")) or {}
+
+        data = (await kc_call_async(_bullet, prio=KC_PRIO_ORDER)).get("data") or {}
+        server = (data.get("instanceServers") or [{}])[0]
+        endpoint = server.get("endpoint")
+        token = data.get("token")
+        if not endpoint or not token:
+            raise RuntimeError("bullet-private returned no endpoint/token")
+        ping_sec = float(server.get("pingInterval", 18000) or 18000) / 1000.0
+        return f"{endpoint}?token={token}&connectId={uuid.uuid4().hex}", ping_sec
+
+    # ----- الرسائل -----
+    def _resolve(self, order_id: str, size: float, funds: float) -> None:
+        now = time.time()
+        self._done[order_id] = (size, funds, now)
+        if len(self._done) > 256:
+            for k in [k for k, v in self._done.items() if now - v[2] > FILL_DONE_TTL_SEC]:
+                self._done.pop(k, None)
+        fut = self._pending.get(order_id)
+        if fut is not None and not fut.done():
+            fut.set_result((size, funds))
+
+    def _on_order_change(self, data: Dict[str, Any]) -> None:
+        order_id = data.get("orderId")
+        if not order_id:
+            return
+        kind = (data.get("type") or "").lower()
+        acc = self._acc.setdefault(order_id, [0.0, 0.0])
+        if kind == "match":
+            try:
+                msize = float(data.get("matchSize") or 0.0)
+                acc[0] += msize
+                acc[1] += msize * float(data.get("matchPrice") or 0.0)
+            except Exception:
+                pass
+        if kind in ("filled", "canceled") or (data.get("status") or "").lower() == "done":
+            self._acc.pop(order_id, None)
+            try:
+                size = float(data.get("filledSize") or 0.0) or acc[0]
+            except Exception:
+                size = acc[0]
+            self._resolve(order_id, size, acc[1])
+
+    def _on_message(self, raw: Any) -> None:
+        try:
+            msg = json.loads(raw)
+        except Exception:
+            return
+        if msg.get("type") != "message":
+            return
+        if not (msg.get("topic") or "").startswith("/spotMarket/tradeOrders"):
+            return
+        self._on_order_change(msg.get("data") or {})
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self._stopping:
+            try:
+                url, ping_sec = await self._resolve_endpoint()
+                async with websockets.connect(url, ping_interval=None, close_timeout=5) as ws:
+                    self._ws = ws
+                    await ws.send(json.dumps({
+                        "id": uuid.uuid4().hex,
+                        "type": "subscribe",
+                        "topic": "/spotMarket/tradeOrdersV2",
+                        "privateChannel": True,
+                        "response": True,
+                    }))
+                    self.connected = True
+                    backoff = 1.0
+                    console_echo("[FILLS] private order stream connected")
+                    await _ws_pump(ws, self._on_message, ping_sec)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                console_echo(f"[FILLS] connection error: {e}")
+            finally:
+                self.connected = False
+                self._ws = None
+                # المنتظرون ينتقلون إلى polling فوراً
+                for fut in list(self._pending.values()):
+                    if not fut.done():
+                        fut.set_result(None)
+            if self._stopping:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2.0, 60.0)
+
+    # ----- الانتظار -----
+    async def wait_fill(self, order_id: str, timeout: float = FILL_WAIT_SEC) -> Tuple[float, float]:
+        self.start()
+        got = self._done.pop(order_id, None)
+        if got is None and self.connected:
+            fut = self._pending.get(order_id)
+            if fut is None:
+                fut = asyncio.get_running_loop().create_future()
+                self._pending[order_id] = fut
+            try:
+                got = await asyncio.wait_for(asyncio.shield(fut), timeout=timeout)
+            except asyncio.TimeoutError:
+                got = None
+            finally:
+                self._pending.pop(order_id, None)
+                self._done.pop(order_id, None)
+        if got is not None and got[0] > 0.0 and got[1] > 0.0:
+            self.stream_fills += 1
+            return float(got[0]), float(got[1])
+        return await self._poll(order_id)
+
+    async def _poll(self, order_id: str) -> Tuple[float, float]:
+        """get_order بـ backoff أُسّي حتى يصبح الأمر غير نشط أو تنتهي FILL_POLL_MAX_SEC."""
+        delay = FILL_POLL_FIRST_SEC
+        deadline = time.time() + FILL_POLL_MAX_SEC
+        last = (0.0, 0.0)
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                info = await kc_call_async(kucoin.get_order, order_id, prio=KC_PRIO_ORDER) or {}
+                last = (float(info.get("dealSize", 0) or 0.0), float(info.get("dealFunds", 0) or 0.0))
+                if not info.get("isActive", False) and last[0] > 0.0:
+                    self.polled_fills += 1
+                    return last
+            except Exception as e:
+                console_echo(f"[FILLS] poll error for {order_id}: {e}")
+            if time.time() + delay >= deadline:
+                return last
+            delay = min(delay * 2.0, 2.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "stream_fills": self.stream_fills,
+            "polled_fills": self.polled_fills,
+            "pending": len(self._pending),
+            "reconnects": self.reconnects,
+        }
+
+_FILL_TRACKER = OrderFillTracker()
+
+def get_fill_tracker() -> OrderFillTracker:
+    return _FILL_TRACKER
+
+async def wait_order_fill(
+    order_id: str,
+    symbol: Optional[str] = None,
+    sim_override: bool = False,
+) -> Tuple[float, float]:
+    """
+    (filled_qty, deal_funds) لأمر سوق فور تنفيذه (بديل sleep(1) + get_order_deal_size).
+    في وضع المحاكاة نقرأ من _SIM_ORDERS مباشرة.
+    """
+    if not order_id:
+        return 0.0, 0.0
+    if sim_override or IS_SIMULATION or kucoin is None or order_id.startswith("SIM-"):
+        return await get_order_deal_size(order_id, symbol=symbol, sim_override=sim_override)
+    try:
+        return await _FILL_TRACKER.wait_fill(order_id)
+    except Exception as e:
+        console_echo(f"[ORDER] wait_order_fill error: {e}")
+        return 0.0, 0.0
+
 # --------- إشعارات تلغرام ---------
 async def send_notification(message: str, to_telegram: bool = True) -> None:
     """
@@ -772,6 +4145,26 @@ async def send_notification(message: str, to_telegram: bool = True) -> None:
     except Exception as e:
         _console_echo(f"[TG] send_notification error: {e}")
 
+async def send_document(data: Any, filename: str, caption: str = "") -> bool:
+    """
+    إرسال تقرير كبير كملف مرفق واحد (txt/csv) من buffer في الذاكرة بدل عشرات الرسائل.
+    data: str / bytes / BytesIO. يرجّع True عند النجاح (False → المستدعي يرجع لتقسيم الرسائل).
+    """
+    try:
+        if client is None:
+            return False
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        buf = data if isinstance(data, io.BytesIO) else io.BytesIO(data)
+        buf.name = filename  # Telethon يأخذ اسم الملف من .name
+        buf.seek(0)
+        await client.send_file(OWNER_CHAT, buf, caption=caption or None, force_document=True)
+        _console_echo(f"[TG] document {filename} ({buf.getbuffer().nbytes} bytes)")
+        return True
+    except Exception as e:
+        _console_echo(f"[TG] send_document error: {e}")
+        return False
+
 async def send_notification_both(message: str) -> None:
     """
     إرسال نفس الرسالة إلى OWNER_CHAT ثم SECONDARY_CHAT (إن كان معرفاً).
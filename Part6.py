@@ -36,11 +36,15 @@ send_to_second_account = globals().get("send_to_second_account")
 
 get_trade_structure = globals().get("get_trade_structure")
 save_trade_structure = globals().get("save_trade_structure")
+get_structure_manager = globals().get("get_structure_manager")
 
 fetch_current_price = globals().get("fetch_current_price")
-normalize_symbol = globals().get("normalize_symbol") or (lambda s: (s or "").upper().replace('-', '').replace('/', '))
+_report_price = globals().get("_report_price") or fetch_current_price
+_report_prices = globals().get("_report_prices")
+normalize_symbol = globals().get("normalize_symbol") or (lambda s: (s or "").upper().replace('-', '').replace('/', ''))
 
 monitor_and_execute = globals().get("monitor_and_execute")
+start_monitor = globals().get("start_monitor")
 
 register_trade_outcome = globals().get("register_trade_outcome")
 accumulate_summary = globals().get("accumulate_summary")
@@ -49,6 +53,9 @@ accumulate_summary = globals().get("accumulate_summary")
 _load_trades_cache = globals().get("_load_trades_cache")
 if _load_trades_cache is None:
     def _load_trades_cache() -> List[Dict[str, Any]]:
+        get_trade_store = globals().get("get_trade_store") or globals().get("get_trade_journal")
+        if callable(get_trade_store):
+            return get_trade_store().trades()
         if not os.path.exists(TRADES_FILE):
             return []
         try:
@@ -147,11 +154,21 @@ async def _maybe_warn_ntp_diff():
 _FINAL_STATES = {"closed", "stopped", "drwn", "failed"}
 
 def _latest_trade_for_slot(
-    trades: List[Dict[str, Any]],
+    trades: Optional[List[Dict[str, Any]]],
     sym_norm: str,
     track_num: int,
     slot_id: str
 ) -> Optional[Dict[str, Any]]:
+    # فهرس (symbol, track_num, slot_id) → أحدث صفقة في TradeRepository: O(1)
+    get_trade_store = globals().get("get_trade_store")
+    store = get_trade_store() if callable(get_trade_store) else None
+    if getattr(store, "indexed", False):
+        try:
+            return store.latest_for_slot(sym_norm, int(track_num), str(slot_id))
+        except Exception:
+            pass
+    if trades is None:
+        trades = _load_trades_cache()
     latest = None
     latest_ts = -1.0
     for tr in trades:
@@ -171,7 +188,7 @@ def _latest_trade_for_slot(
     return latest
 
 def _latest_state_for_slot(
-    trades: List[Dict[str, Any]],
+    trades: Optional[List[Dict[str, Any]]],
     sym_norm: str,
     track_num: int,
     slot_id: str
@@ -180,7 +197,7 @@ def _latest_state_for_slot(
     return (tr.get("status") or "").lower() if tr else None
 
 def _is_final_in_trades_slot(
-    trades: List[Dict[str, Any]],
+    trades: Optional[List[Dict[str, Any]]],
     sym_norm: str,
     track_num: int,
     slot_id: str
@@ -210,9 +227,10 @@ async def _hourly_drawdown_check_and_notify():
 
         structure = get_trade_structure()
         slots: Dict[str, Any] = structure.get("slots") or {}
-        trades = _load_trades_cache()
+        trades = None  # البحث عبر فهرس الخانات في المخزن
 
         affected_lines: List[str] = []
+        candidates: List[Tuple[str, str, int, float]] = []  # (slot_id, sym, track, bought_price)
 
         for sid, cell in slots.items():
             if not cell:
@@ -237,10 +255,21 @@ async def _hourly_drawdown_check_and_notify():
             if _is_final_in_trades_slot(trades, sym, track_num, str(sid)):
                 continue
 
-            if not callable(fetch_current_price):
-                continue
+            candidates.append((str(sid), sym, track_num, bought_price))
 
-            price = await fetch_current_price(sym)
+        if not candidates or not callable(fetch_current_price):
+            return
+
+        # كل الرموز دفعة واحدة: بالتوازي مع حد + مهلة (أولوية التقارير في KuCoin governor)
+        if callable(_report_prices):
+            prices = await _report_prices([c[1] for c in candidates])
+        else:
+            prices = {}
+            for sym in dict.fromkeys(c[1] for c in candidates):
+                prices[sym] = await _report_price(sym)
+
+        for sid, sym, track_num, bought_price in candidates:
+            price = prices.get(sym)
             if price is None or price <= 0:
                 continue
 
@@ -277,26 +306,28 @@ async def _hourly_drawdown_check_and_notify():
 async def resume_open_trades():
     """
     عند تشغيل البوت:
-      - أي Slot بحالة open/reserved → يعاد تشغيل monitor_and_execute عليها من جديد.
-      - أي Slot بحالة buy          → يعاد تشغيل monitor_and_execute (سيكتشف من الهيكل أنها BUY ويكمل TP/Trailing/SL logic).
+      - أي Slot بحالة open/reserved → تُسجَّل من جديد في MonitorScheduler (start_monitor).
+      - أي Slot بحالة buy          → تُسجَّل في MonitorScheduler (يكتشف من الهيكل أنها BUY ويكمل TP/Trailing/SL logic).
       - لا يتم استئناف أي Slot إذا كانت الصفقة منتهية نهائيًا في TRADES_FILE (closed/stopped/drwn/failed)،
         ويتم تنظيف الخانة (slot = None) في هذه الحالة.
     في النهاية: يُرسل تلخيص بعدد الـ Slots التي تم استئناف مراقبتها وعدد الخانات التي تم تنظيفها.
+    التنظيف يُعتمد (StructureManager.update) قبل تشغيل أي مراقبة: start_monitor ينتظر setup
+    (شبكة)، والـ scheduler قد يعدّل خانات مسجّلة خلالها — حفظ النسخة القديمة بعد الحلقة كان يمحوها.
     """
     open_resumed = 0
     buy_resumed = 0
     cleaned_slots: List[Tuple[str, int, str]] = []  # (symbol, track_num, slot_id)
 
-    if not callable(get_trade_structure) or not callable(save_trade_structure) or not callable(monitor_and_execute):
+    if not callable(get_trade_structure) or not callable(save_trade_structure) or not callable(start_monitor):
         if callable(send_notification):
             await send_notification("⚠️ resume_open_trades: required helpers not available.")
         return
 
     structure = get_trade_structure()
     slots: Dict[str, Any] = structure.get("slots") or {}
-    trades = _load_trades_cache()
+    trades = None  # البحث عبر فهرس الخانات في المخزن (O(slots))
 
-    dirty = False
+    to_resume: List[Tuple[str, str, int, str, Dict[str, Any]]] = []  # (sid, symbol, track, status, cell)
 
     for sid, cell in list(slots.items()):
         if not cell:
@@ -311,8 +342,6 @@ async def resume_open_trades():
             if track_num <= 0:
                 continue
 
-            entry = float(cell.get("entry", 0) or 0)
-            sl = float(cell.get("sl", 0) or 0)
             targets = list(cell.get("targets") or [])
             amount = float(cell.get("amount", 0) or 0)
 
@@ -323,28 +352,11 @@ async def resume_open_trades():
             # إذا الصفقة نهائية في TRADES_FILE → حرّر الخانة ولا تستأنف مراقبتها
             if _is_final_in_trades_slot(trades, symbol, track_num, str(sid)):
                 if status in ("open", "buy", "reserved"):
-                    slots[str(sid)] = None
-                    dirty = True
                     cleaned_slots.append((symbol, track_num, str(sid)))
                 continue
 
-            # استئناف المراقبة
             if status in ("open", "reserved", "buy"):
-                asyncio.create_task(
-                    monitor_and_execute(
-                        symbol,
-                        entry,
-                        sl,
-                        targets,
-                        amount,
-                        track_num,
-                        str(sid),
-                    )
-                )
-                if status in ("open", "reserved"):
-                    open_resumed += 1
-                else:
-                    buy_resumed += 1
+                to_resume.append((str(sid), symbol, track_num, status, cell))
 
         except Exception as e:
             sym_dbg = cell.get("symbol") if isinstance(cell, dict) else None
@@ -353,13 +365,48 @@ async def resume_open_trades():
             else:
                 print(f"resume error on Slot {sid}: {e}")
 
-    if dirty:
+    if cleaned_slots:
         try:
-            structure["slots"] = slots
-            save_trade_structure(structure)
+            if callable(get_structure_manager):
+                async with get_structure_manager().update() as s:
+                    live_slots = s.setdefault("slots", {})
+                    for _, _, sid in cleaned_slots:
+                        live_slots[sid] = None
+            else:
+                for _, _, sid in cleaned_slots:
+                    slots[sid] = None
+                structure["slots"] = slots
+                save_trade_structure(structure)
         except Exception as e:
             print(f"⚠️ resume cleanup save error: {e}")
 
+    # استئناف المراقبة (بعد اعتماد التنظيف)
+    for sid, symbol, track_num, status, cell in to_resume:
+        try:
+            trade_id = cell.get("trade_id")
+            if trade_id is None:
+                tr = _latest_trade_for_slot(trades, symbol, track_num, sid)
+                trade_id = tr.get("id") if tr else None
+            if trade_id is None:
+                print(f"resume skipped Slot {sid} for {symbol}: no trade_id")
+                continue
+            await start_monitor(
+                symbol,
+                float(cell.get("entry", 0) or 0),
+                float(cell.get("sl", 0) or 0),
+                list(cell.get("targets") or []),
+                float(cell.get("amount", 0) or 0),
+                track_num,
+                sid,
+                int(trade_id),
+            )
+            if status in ("open", "reserved"):
+                open_resumed += 1
+            else:
+                buy_resumed += 1
+        except Exception as e:
+            print(f"resume error on Slot {sid} for {symbol}: {e}")
+
     # ملخص الاستئناف
     if open_resumed or buy_resumed or cleaned_slots:
         lines = [
@@ -378,16 +425,40 @@ async def resume_open_trades():
         if callable(send_notification):
             await send_notification("\n".join(lines))
 
+# ---------- Hot/Cold: أرشفة الصفقات القديمة ----------
+_last_archive_ts = 0.0
+
+async def _maybe_archive_trades() -> None:
+    """كل TRADES_ARCHIVE_INTERVAL_SEC: نقل الصفقات النهائية القديمة للأرشيف الشهري (في thread)."""
+    global _last_archive_ts
+    archive_closed_trades = globals().get("archive_closed_trades")
+    if not callable(archive_closed_trades):
+        return
+    interval = float(globals().get("TRADES_ARCHIVE_INTERVAL_SEC", 21600))
+    now = time.time()
+    if now - _last_archive_ts < interval:
+        return
+    _last_archive_ts = now
+    try:
+        await asyncio.to_thread(archive_closed_trades)
+    except Exception as e:
+        print(f"⚠️ archive_closed_trades error: {e}")
+
 # ---------- Status notifier (NTP + drawdown) ----------
 async def status_notifier():
     """
     منبّه دوري:
       - كل ساعة: فحص NTP + تجميع تنبيه هبوط 4%+ لكل المراكز المشتراة (BUY).
+      - كل TRADES_ARCHIVE_INTERVAL_SEC: أرشفة الصفقات المنتهية القديمة (hot/cold).
     """
     while True:
         try:
             await _maybe_warn_ntp_diff()
             await _hourly_drawdown_check_and_notify()
+            await _maybe_archive_trades()
+            get_terminal_notices = globals().get("get_terminal_notices")
+            if callable(get_terminal_notices):
+                get_terminal_notices().flush()  # عدّادات Terminal Notices المعلّقة
             await asyncio.sleep(3600)
         except Exception as e:
             print(f"⚠️ status_notifier error: {e}")
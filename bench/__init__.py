@@ -0,0 +1 @@
+# benchmarks (خارج أقسام البوت) — python -m bench.<name>
@@ -0,0 +1,283 @@
+# ============================================
+# BatchLadderEvaluator — تقييم ladder/trailing لكل الخانات دفعة واحدة (NumPy)
+#   - نُقل من Section 4: غير موصول بـ MonitorScheduler (ThresholdIndex.is_quiet يجيب
+#     نفس سؤال "هل الخانة هادئة؟" بـ O(1) لكل خانة)، فيبقى هنا كـ benchmark + مرجع متّجه.
+#   - التكافؤ مع _ladder_step (Section 4) مُختبَر في tests/test_batch_ladder.py.
+#
+# التشغيل:  python -m bench.batch_ladder [sizes...]
+# ============================================
+
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bench.sections import load_sections
+
+# نفس قيم SELL_* في Section 4 (tests/test_batch_ladder.py يتحقّق من التطابق)
+SELL_NONE = 0
+SELL_FLOOR = 1
+SELL_TRAIL = 2
+
+
+class BatchLadderEvaluator:
+    """
+    حالة كل الخانات كمصفوفات NumPy (صف لكل Slot، مع free-list لإعادة استخدام الصفوف):
+      entry / bought / targets (مبطّنة بـ +inf) / tp1 / highest_idx / armed / max_after_touch / floor
+    evaluate() يطبّق نفس منطق _ladder_step (+ شرط الشراء) على كل الصفوف بعمليات متّجهة
+    ويرجّع قرار كل صف بدون أي تنفيذ؛ التنفيذ (شراء/بيع/إشعار) يبقى في SlotMonitor.
+    eps / retrace_percent = EPS / RETRACE_PERCENT من Section 4.
+    """
+
+    def __init__(self, capacity: int = 256, width: int = 8, eps: float = 1e-9, retrace_percent: float = 1.0) -> None:
+        self.eps = float(eps)
+        self.retrace_percent = float(retrace_percent)
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._alloc(int(capacity), int(width))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _alloc(self, cap: int, width: int) -> None:
+        old = getattr(self, "entry", None)
+        n = self._size
+        entry = np.full(cap, np.nan)
+        bought = np.zeros(cap, dtype=bool)
+        targets = np.full((cap, width), np.inf)
+        tp1 = np.full(cap, np.nan)
+        hi = np.full(cap, -1, dtype=np.int64)
+        armed = np.zeros(cap, dtype=bool)
+        mat = np.full(cap, np.nan)
+        floor = np.full(cap, np.nan)
+        if old is not None and n:
+            entry[:n] = self.entry[:n]
+            bought[:n] = self.bought[:n]
+            targets[:n, : self.targets.shape[1]] = self.targets[:n]
+            tp1[:n] = self.tp1[:n]
+            hi[:n] = self.hi[:n]
+            armed[:n] = self.armed[:n]
+            mat[:n] = self.mat[:n]
+            floor[:n] = self.floor[:n]
+        self.entry, self.bought, self.targets, self.tp1 = entry, bought, targets, tp1
+        self.hi, self.armed, self.mat, self.floor = hi, armed, mat, floor
+
+    def upsert(
+        self,
+        key: str,
+        entry_price: float,
+        bought: bool,
+        targets: List[float],
+        highest_idx: int,
+        trailing_armed: bool,
+        max_after_touch: Optional[float],
+        last_tp_floor: Optional[float],
+    ) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size >= self.entry.shape[0]:
+                    self._alloc(self.entry.shape[0] * 2, self.targets.shape[1])
+                row = self._size
+                self._size += 1
+            self._rows[key] = row
+        k = len(targets)
+        if k > self.targets.shape[1]:
+            self._alloc(self.entry.shape[0], k)
+        self.targets[row, :] = np.inf
+        self.targets[row, :k] = targets
+        self.tp1[row] = float(targets[0]) if k else np.nan
+        self.entry[row] = entry_price
+        self.bought[row] = bool(bought)
+        self.hi[row] = int(highest_idx)
+        self.armed[row] = bool(trailing_armed)
+        self.mat[row] = np.nan if max_after_touch is None else float(max_after_touch)
+        self.floor[row] = np.nan if last_tp_floor is None else float(last_tp_floor)
+        return row
+
+    def upsert_monitor(self, mon: Any) -> int:
+        return self.upsert(
+            mon.key, mon.entry_price, mon.bought_price is not None, mon.targets,
+            mon.highest_idx, mon.trailing_armed, mon.max_after_touch, mon.last_tp_floor,
+        )
+
+    def remove(self, key: str) -> None:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self.entry[row] = np.nan
+        self.bought[row] = False
+        self._free.append(row)
+
+    def row_of(self, key: str) -> Optional[int]:
+        return self._rows.get(key)
+
+    def evaluate(self, rows: "np.ndarray", prices: "np.ndarray") -> Dict[str, Any]:
+        """
+        rows: أرقام الصفوف، prices: سعر كل صف (nan = لا يوجد سعر).
+        يرجّع dict من المصفوفات: buy / advanced / armed_now / sell / event + الحالة الجديدة.
+        event = صف يحتاج SlotMonitor.step (أي حدث أو سعر مفقود)؛ الباقي هادئ (hold).
+        """
+        EPS = self.eps
+        p = np.asarray(prices, dtype=float)
+        valid = ~np.isnan(p)
+        bought = self.bought[rows]
+        entry = self.entry[rows]
+        T = self.targets[rows]
+        tp1 = self.tp1[rows]
+        hi = self.hi[rows]
+        armed = self.armed[rows]
+        mat = self.mat[rows]
+        floor = self.floor[rows]
+        pv = np.where(valid, p, -np.inf)
+
+        buy = valid & ~bought & (pv <= entry + EPS)
+        live = valid & bought
+
+        # -------- TP ladder: أعلى هدف ملامَس (الأهداف مرتّبة تصاعدياً) --------
+        touched = (T - EPS <= pv[:, None]).sum(axis=1) - 1
+        new_hi = np.where(live, np.maximum(hi, touched), hi)
+        advanced = live & (new_hi > hi)
+        hi_tp = np.take_along_axis(T, np.clip(new_hi, 0, T.shape[1] - 1)[:, None], axis=1)[:, 0]
+
+        arm_now = advanced & ~armed & (pv >= tp1 - EPS)
+        new_floor = np.where(advanced, hi_tp, floor)
+        new_floor = np.where(arm_now, np.maximum(np.nan_to_num(new_floor, nan=0.0), tp1), new_floor)
+        new_mat = np.where(arm_now, pv, mat)
+        new_armed = armed | arm_now
+
+        # -------- Trailing --------
+        trail = live & new_armed
+        new_mat = np.where(trail, np.fmax(new_mat, pv), new_mat)
+        enforced = np.maximum(np.nan_to_num(new_floor, nan=0.0), tp1)
+        base = np.where(np.isnan(new_mat) | (new_mat == 0.0), pv, new_mat)
+        trigger = base * (1.0 - self.retrace_percent / 100.0)
+        sell_floor = trail & (pv < enforced - EPS)
+        sell_trail = trail & ~sell_floor & (pv <= trigger + EPS) & (pv >= enforced - EPS)
+        sell = np.where(sell_floor, SELL_FLOOR, np.where(sell_trail, SELL_TRAIL, SELL_NONE))
+
+        return {
+            "buy": buy,
+            "advanced": advanced,
+            "armed_now": arm_now,
+            "sell": sell,
+            "event": ~valid | buy | advanced | (sell != SELL_NONE),
+            "highest_idx": new_hi,
+            "armed": new_armed,
+            "max_after_touch": new_mat,
+            "floor": new_floor,
+        }
+
+
+def random_states(n: int, rng: "np.random.Generator") -> List[Tuple[Any, ...]]:
+    """n حالة عشوائية: (entry, bought, targets, highest_idx, armed, max_after_touch, floor)."""
+    states = []
+    for _ in range(n):
+        entry = float(rng.uniform(0.5, 100.0))
+        k = int(rng.integers(1, 7))
+        targets = sorted(float(entry * (1.0 + 0.01 * j + rng.uniform(0.0, 0.01))) for j in range(1, k + 1))
+        bought = bool(rng.random() < 0.8)
+        hi = int(rng.integers(-1, k)) if bought else -1
+        armed = bought and hi >= 0
+        mat = float(targets[hi] * rng.uniform(1.0, 1.02)) if armed else None
+        floor = float(targets[hi]) if hi >= 0 else None
+        states.append((entry, bought, targets, hi, armed, mat, floor))
+    return states
+
+
+def random_prices(states: Sequence[Tuple[Any, ...]], rng: "np.random.Generator") -> "np.ndarray":
+    prices = np.array([s[0] * rng.uniform(0.97, 1.08) for s in states])
+    prices[rng.random(len(states)) < 0.02] = np.nan
+    return prices
+
+
+def scalar_decisions(ladder_step: Any, eps: float, states: Sequence[Tuple[Any, ...]], prices: Sequence[float]) -> List[Any]:
+    """المرجع: None (لا سعر) / bool (شراء) / نتيجة _ladder_step لكل خانة."""
+    out: List[Any] = []
+    for (entry, bought, targets, hi, armed, mat, floor), p in zip(states, prices):
+        if p != p:
+            out.append(None)
+        elif not bought:
+            out.append(p <= entry + eps)
+        else:
+            out.append(ladder_step(targets, targets[0], hi, armed, mat, floor, p))
+    return out
+
+
+def mismatches(batch: Dict[str, Any], scalar: Sequence[Any]) -> List[int]:
+    """أرقام الصفوف التي يختلف فيها قرار evaluate() عن المرجع."""
+    bad = []
+    for i, ref in enumerate(scalar):
+        if ref is None:
+            ok = bool(batch["event"][i])
+        elif isinstance(ref, bool):
+            ok = bool(batch["buy"][i]) == ref
+        else:
+            ok = (
+                int(batch["highest_idx"][i]) == ref[0]
+                and bool(batch["armed"][i]) == ref[1]
+                and bool(batch["advanced"][i]) == ref[4]
+                and bool(batch["armed_now"][i]) == ref[5]
+                and int(batch["sell"][i]) == ref[6]
+            )
+        if not ok:
+            bad.append(i)
+    return bad
+
+
+def build(states: Sequence[Tuple[Any, ...]], eps: float, retrace_percent: float) -> Tuple[BatchLadderEvaluator, "np.ndarray"]:
+    ev = BatchLadderEvaluator(capacity=max(1, len(states)), eps=eps, retrace_percent=retrace_percent)
+    for i, (entry, bought, targets, hi, armed, mat, floor) in enumerate(states):
+        ev.upsert(f"k{i}", entry, bought, targets, hi, armed, mat, floor)
+    rows = np.array([ev.row_of(f"k{i}") for i in range(len(states))], dtype=np.int64)
+    return ev, rows
+
+
+def benchmark(ns: Dict[str, Any], sizes: Sequence[int] = (1000, 10000), seed: int = 7) -> List[Dict[str, Any]]:
+    """BatchLadderEvaluator مقابل حلقة _ladder_step لكل خانة (نفس الحالات العشوائية)."""
+    eps, retrace = float(ns["EPS"]), float(ns["RETRACE_PERCENT"])
+    rng = np.random.default_rng(seed)
+    results: List[Dict[str, Any]] = []
+    for n in sizes:
+        states = random_states(n, rng)
+        prices = random_prices(states, rng)
+        ev, rows = build(states, eps, retrace)
+
+        t0 = time.perf_counter()
+        scalar = scalar_decisions(ns["_ladder_step"], eps, states, prices.tolist())
+        t_scalar = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        out = ev.evaluate(rows, prices)
+        t_batch = time.perf_counter() - t0
+
+        res = {
+            "slots": n,
+            "scalar_ms": round(t_scalar * 1000.0, 3),
+            "batch_ms": round(t_batch * 1000.0, 3),
+            "speedup": round(t_scalar / t_batch, 1) if t_batch > 0 else None,
+            "mismatches": len(mismatches(out, scalar)),
+        }
+        print(
+            f"[BENCH] {n} slots: scalar {res['scalar_ms']}ms | batch {res['batch_ms']}ms "
+            f"| x{res['speedup']} | mismatches={res['mismatches']}"
+        )
+        results.append(res)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    sizes = [int(a) for a in (argv or [])] or [1000, 10000]
+    with tempfile.TemporaryDirectory() as d:
+        ns = load_sections(d, sections=("Part2.py", "part3.py", "part4.py"))
+        res = benchmark(ns, sizes)
+    return 1 if any(r["mismatches"] for r in res) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,32 @@
+# ============================================
+# تحميل أقسام البوت (Section 2 → 6) في namespace واحد خارج الـ notebook
+#   - نفس ترتيب التشغيل؛ Section 1 (Telethon / KuCoin client) غير مطلوب:
+#     كل قسم يقرأ ما يحتاجه عبر globals().get مع قيم افتراضية.
+#   - كل الملفات (TRADES_FILE / STRUCTURE_FILE / الأرشيف) نسبية → تُنشأ داخل workdir.
+#   - يُستخدم من bench/*.py ومن tests/conftest.py.
+# ============================================
+
+import os
+from typing import Any, Dict, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECTIONS = ("Part2.py", "part3.py", "part4.py", "part5.py", "Part6.py")
+
+
+def load_sections(
+    workdir: Optional[str] = None,
+    sections: Sequence[str] = SECTIONS,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """exec الأقسام بالترتيب داخل workdir (إن وُجد) ويرجّع الـ namespace المشترك."""
+    ns: Dict[str, Any] = {"__name__": "bot"}
+    if extra:
+        ns.update(extra)
+    if workdir:
+        os.chdir(workdir)
+    for name in sections:
+        path = os.path.join(ROOT, name)
+        with open(path, encoding="utf-8") as f:
+            src = f.read()
+        exec(compile(src, path, "exec"), ns)
+    return ns
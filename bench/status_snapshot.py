@@ -0,0 +1,105 @@
+# ============================================
+# أمر status على n صفقة: المرور الكامل القديم مقابل StatusSnapshot (بارد / دافئ)
+#   (نُقل من Section 2؛ السلوك مُختبَر في tests/test_status_snapshot.py)
+#   الهدف: الدافئ < 50ms.
+#
+# التشغيل:  python -m bench.status_snapshot [n] [slots]
+# ============================================
+
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from bench.sections import load_sections
+
+
+def benchmark(ns: Dict[str, Any], n: int = 100000, slots: int = 60, seed: int = 7) -> Dict[str, Any]:
+    utc_day = ns["_utc_day"]
+    rng = random.Random(seed)
+    now = time.time()
+    syms = [f"C{i}USDT" for i in range(400)]
+    records = []
+    for i in range(1, n + 1):
+        opened = now - rng.uniform(0, 400 * 86400) if i <= n - 200 else now - rng.uniform(0, 3600)
+        final = rng.random() < 0.97
+        records.append({
+            "id": i,
+            "symbol": rng.choice(syms),
+            "track_num": rng.randint(1, 10),
+            "slot_id": str(rng.randint(1, slots)),
+            "status": rng.choice(ns["_FINAL_TRADE_STATES"]) if final else "buy",
+            "opened_at": opened,
+            "closed_at": min(now, opened + rng.uniform(60, 86400)) if final else None,
+        })
+
+    class _MemBacking:
+        def trades(self) -> List[Dict[str, Any]]:
+            return records
+
+        def open_trade(self, rec: Dict[str, Any]) -> int:
+            return int(rec["id"])
+
+        def patch(self, trade_id: int, fields: Dict[str, Any], op: str = "patch") -> bool:
+            return True
+
+    res: Dict[str, Any] = {"trades": n, "slots": slots}
+    today = utc_day(now)
+
+    # المرور الكامل كما كان في show_bot_status
+    t0 = time.perf_counter()
+    _ = {st: sum(1 for tr in records if (tr.get("status") or "").lower() == st)
+         for st in ("closed", "stopped", "drwn", "failed")}
+    latest_opened: Dict[str, str] = {}
+    for tr in records:
+        d = utc_day(tr.get("opened_at")) or ""
+        if d > latest_opened.get(tr["symbol"], ""):
+            latest_opened[tr["symbol"]] = d
+    _ = sum(1 for tr in records if utc_day(tr.get("opened_at")) == today)
+    _ = [tr for tr in records if utc_day(tr.get("closed_at")) == today]
+    res["full_scan_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+    with tempfile.TemporaryDirectory() as d:
+        repo = ns["TradeRepository"](_MemBacking(), flush_sec=3600)
+        mgr = ns["StructureManager"](os.path.join(d, "structure.json"), write_delay=3600)
+        for sid in range(1, slots + 1):
+            mgr.set_slot(str(sid), {"status": "buy" if sid % 2 else "open", "symbol": syms[sid],
+                                    "track_num": 1 + sid % 10})
+        snap = ns["StatusSnapshot"](repo, mgr)
+        repo.add_patch_hook(snap.on_change, final_only=False)
+        repo.trades()  # التحميل يتم عند الإقلاع (get_trade_store().start())، لا عند status
+
+        t0 = time.perf_counter()
+        snap.get()
+        res["snapshot_cold_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+        # أحداث: فتح + شراء + إغلاق (تعلّم الخانات للإعادة)
+        tid = repo.open_trade({"symbol": syms[1], "track_num": 2, "slot_id": "1", "status": "open", "opened_at": now})
+        repo.patch(tid, {"status": "buy", "bought_price": 1.0}, op="bought")
+        repo.patch(tid, {"status": "closed", "closed_at": now, "pnl_usdt": 0.1}, op="finalized")
+        t0 = time.perf_counter()
+        out = snap.get()
+        res["snapshot_warm_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        repo._stop.set()
+        mgr.close()
+
+    res["ok"] = res["snapshot_warm_ms"] < 50.0 and out["today_total"] >= 1
+    print(
+        f"[BENCH] status @ {n} trades: full scan {res['full_scan_ms']}ms | snapshot cold "
+        f"{res['snapshot_cold_ms']}ms / warm {res['snapshot_warm_ms']}ms (target < 50ms)"
+    )
+    return res
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = [int(a) for a in (argv or [])]
+    with tempfile.TemporaryDirectory() as d:
+        ns = load_sections(d, sections=("Part2.py",))
+        res = benchmark(ns, *args)
+    return 0 if res["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,95 @@
+# ============================================
+# latest_for_slot / استعلامات status: مسح خطّي للقائمة مقابل SqliteTradeStore المفهرس
+#   (نُقل من Section 2؛ السلوك مُختبَر في tests/test_trade_store.py)
+#
+# التشغيل:  python -m bench.trade_store [n] [lookups]
+# ============================================
+
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from bench.sections import load_sections
+
+
+def random_trades(n: int, seed: int = 11, now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """n صفقة عشوائية (97% نهائية) على 400 رمز × 10 مسارات × 10 خانات."""
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    syms = [f"C{i}USDT" for i in range(400)]
+    records = []
+    for i in range(1, n + 1):
+        closed = rng.random() < 0.97
+        opened = now - rng.uniform(0, 400 * 86400)
+        records.append({
+            "id": i,
+            "symbol": rng.choice(syms),
+            "track_num": rng.randint(1, 10),
+            "slot_id": str(rng.randint(1, 10)),
+            "status": rng.choice(["closed", "drwn", "failed"]) if closed else rng.choice(["open", "buy"]),
+            "opened_at": opened,
+            "closed_at": opened + rng.uniform(60, 86400) if closed else None,
+        })
+    return records
+
+
+def benchmark(ns: Dict[str, Any], n: int = 100000, lookups: int = 1000, seed: int = 11) -> Dict[str, Any]:
+    """latest_for_slot × lookups + عدّ الحالات + صفقات اليوم المغلقة على n صفقة."""
+    records = random_trades(n, seed)
+    rng = random.Random(seed + 1)
+    keys = [(f"C{rng.randrange(400)}USDT", rng.randint(1, 10), str(rng.randint(1, 10))) for _ in range(lookups)]
+    today = ns["_utc_day"](time.time())
+
+    class _Scan(ns["_TradeScanQueries"]):
+        def trades(self) -> List[Dict[str, Any]]:
+            return records
+
+    scan = _Scan()
+    res: Dict[str, Any] = {"trades": n, "lookups": lookups}
+    scan_n = max(1, min(lookups, 20))  # المسح الخطّي بطيء → عيّنة ثم تقدير
+    t0 = time.perf_counter()
+    for k in keys[:scan_n]:
+        scan.latest_for_slot(*k)
+    res["scan_latest_ms_each"] = round((time.perf_counter() - t0) * 1000.0 / scan_n, 3)
+
+    with tempfile.TemporaryDirectory() as d:
+        store = ns["SqliteTradeStore"](os.path.join(d, "bench.sqlite3"))
+        t0 = time.perf_counter()
+        store._insert_many(records)
+        res["sqlite_import_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+        t0 = time.perf_counter()
+        got = [store.latest_for_slot(*k) for k in keys]
+        res["sqlite_latest_ms_each"] = round((time.perf_counter() - t0) * 1000.0 / lookups, 3)
+        res["mismatches"] = sum(
+            1 for k, g in zip(keys[:scan_n], got) if (g or {}).get("id") != (scan.latest_for_slot(*k) or {}).get("id")
+        )
+
+        t0 = time.perf_counter()
+        store.status_counts()
+        store.closed_on_day(today)
+        store.by_status("buy")
+        res["sqlite_status_queries_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+        store.close()
+
+    print(
+        f"[BENCH] {n} trades: latest_for_slot scan {res['scan_latest_ms_each']}ms vs sqlite "
+        f"{res['sqlite_latest_ms_each']}ms | status queries {res['sqlite_status_queries_ms']}ms "
+        f"| import {res['sqlite_import_ms']}ms | mismatches={res['mismatches']}"
+    )
+    return res
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = [int(a) for a in (argv or [])]
+    with tempfile.TemporaryDirectory() as d:
+        ns = load_sections(d, sections=("Part2.py",))
+        res = benchmark(ns, *args)
+    return 1 if res["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -15,7 +15,7 @@ import os
 import re
 
 # ====== Globals من Section 1/2 ======
-TRACK_FILE   = globals().get("TRACK_FILE",   "tracks.json")
+STRUCTURE_FILE = globals().get("STRUCTURE_FILE", "trade_structure.json")
 TRADES_FILE  = globals().get("TRADES_FILE",  "trades.json")
 DEFAULT_CYCLE_COUNT = globals().get("DEFAULT_CYCLE_COUNT", 1)
 
@@ -24,15 +24,25 @@ TRADE_INCREMENT_PERCENT = float(globals().get("TRADE_INCREMENT_PERCENT", 2.0))
 
 get_trade_structure     = globals().get("get_trade_structure")
 get_effective_max_open  = globals().get("get_effective_max_open")
+get_structure_manager   = globals().get("get_structure_manager")
+get_trade_store         = globals().get("get_trade_store") or globals().get("get_trade_journal")
 log_terminal_notification = globals().get("log_terminal_notification", lambda msg, tag=None: None)
 
 
 # ========== أدوات حفظ/تحميل الهيكل ==========
 def save_trade_structure(structure: Dict[str, Any]) -> None:
-    """حفظ ملف المسارات/الخانات (TRACK_FILE) بأمان."""
+    """
+    حفظ المسارات/الخانات عبر StructureManager (نفس STRUCTURE_FILE الذي يقرأه
+    get_trade_structure؛ كتابة ذرّية مجمّعة).
+    """
     try:
-        with open(TRACK_FILE, "w") as f:
+        if callable(get_structure_manager):
+            get_structure_manager().replace(structure)
+            return
+        tmp = f"{STRUCTURE_FILE}.tmp"
+        with open(tmp, "w") as f:
             json.dump(structure, f, indent=2)
+        os.replace(tmp, STRUCTURE_FILE)
     except Exception as e:
         print(f"⚠️ save_trade_structure error: {e}")
 
@@ -281,47 +291,23 @@ def update_trade_status(
       - هذا يسمح بإلغاء صفقات معلّقة (open/reserved) بدون احتسابها في الإحصائيات.
     """
     try:
-        if not os.path.exists(TRADES_FILE):
+        if not callable(get_trade_store):
             return
+        store = get_trade_store()
 
-        with open(TRADES_FILE, "r") as f:
-            data = json.load(f) or {}
-        trades = data.get("trades", []) or []
-
-        sym_norm = _normalize_symbol(symbol)
-        best_i = None
-        best_ts = -1.0
-
-        for i, tr in enumerate(trades):
-            try:
-                if _normalize_symbol(tr.get("symbol", "")) != sym_norm:
-                    continue
-                if track_num is not None and str(tr.get("track_num")) != str(track_num):
-                    continue
-                if cycle_num is not None and str(tr.get("cycle_num")) != str(cycle_num):
-                    continue
-                ts = float(tr.get("opened_at", 0) or 0)
-                if ts >= best_ts:
-                    best_ts = ts
-                    best_i = i
-            except Exception:
-                continue
-
-        if best_i is None:
+        # SQLite: استعلام مفهرس (symbol, track_num, ..., opened_at) / journal: مسح خطّي
+        tr = store.latest_for_symbol(symbol, track_num, cycle_num)
+        if tr is None:
             return  # لا صفقة مطابقة
 
-        tr = trades[best_i]
-        tr["status"] = new_status
+        fields: Dict[str, Any] = {"status": new_status}
         # إضافة ختم زمني للإغلاق عند الحالات النهائية
         if new_status.lower() in ("closed", "stopped", "drwn", "failed"):
             if not tr.get("closed_at"):
-                tr["closed_at"] = datetime.now(timezone.utc).timestamp()
-
-        trades[best_i] = tr
-        data["trades"] = trades
+                fields["closed_at"] = datetime.now(timezone.utc).timestamp()
 
-        with open(TRADES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        # حدث status واحد في الـ journal بدل إعادة كتابة TRADES_FILE
+        store.patch(tr["id"], fields, op="status")
 
     except Exception as e:
         print(f"⚠️ update_trade_status error: {e}")
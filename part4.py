@@ -1,7 +1,8 @@
 # ============================================
 # Section 4) Execution & Monitoring (NEW: Tracks + Slots + 2% rule)
 #   - execute_trade(): استلام التوصية وفتح Slot جديد
-#   - monitor_and_execute(): شراء/إدارة TP + Trailing + SL إشعار فقط
+#   - SlotMonitor: شراء/إدارة TP + Trailing + SL إشعار فقط (لكل خانة)
+#   - MonitorScheduler: مُجدول مركزي واحد لكل الخانات (سعر واحد لكل رمز)
 #   - الحد الأقصى للصفقات المفتوحة = cycle_slots من الهيكل
 #   - البيع حصراً بعد TP1 (Trailing 1%)، لا بيع على SL
 #   - تصنيف النتيجة بالاعتماد على classify_pnl من Section 3
@@ -9,8 +10,11 @@
 # ============================================
 
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Set
 import asyncio
+import bisect
+import contextlib
+import heapq
 import os
 import json
 import time
@@ -28,6 +32,7 @@ CYCLE_SLOTS_DEFAULT = int(globals().get("CYCLE_SLOTS", 10))
 # من Section 2:
 get_trade_structure = globals().get("get_trade_structure")
 save_trade_structure = globals().get("save_trade_structure")
+get_structure_manager = globals().get("get_structure_manager")
 track_base_amount = globals().get("track_base_amount")
 
 # من Section 1 (أو 2):
@@ -44,6 +49,11 @@ get_symbol_meta = globals().get("get_symbol_meta")
 get_trade_balance_usdt = globals().get("get_trade_balance_usdt")
 place_market_order = globals().get("place_market_order")
 get_order_deal_size = globals().get("get_order_deal_size")
+wait_order_fill = globals().get("wait_order_fill") or get_order_deal_size
+get_price_feed = globals().get("get_price_feed")
+get_trade_store = globals().get("get_trade_store") or globals().get("get_trade_journal")
+kc_call_async = globals().get("kc_call_async")
+fetch_current_price = globals().get("fetch_current_price")  # feed → PriceBoard → PriceCache → REST
 
 # من Section 2: Email Gate + blacklist
 _email_gate_allows = globals().get("_email_gate_allows")
@@ -73,6 +83,13 @@ _console_echo = console_echo
 RETRACE_PERCENT = 1.0   # هبوط 1% من القمّة
 EPS = 1e-9              # هامش صغير للتحاشي من مساواة رقمية
 PRICE_TIMEOUT_SEC = 600  # 10 دقائق بدون سعر → إلغاء الصفقة
+TICK_MIN_GAP_SEC = 1.0   # أقل فاصل بين دورتين عند الاستيقاظ على ticks الـ WebSocket
+MONITOR_POLL_SEC = 60    # فاصل إعادة المحاولة عند فشل جلب السعر
+# فاصل فحص متكيّف حسب قرب السعر من العتبة التالية (دخول / TP / أرضية / trigger):
+MONITOR_POLL_MIN_SEC = float(globals().get("MONITOR_POLL_MIN_SEC", 5))     # عند العتبة
+MONITOR_POLL_MAX_SEC = float(globals().get("MONITOR_POLL_MAX_SEC", 60))    # بعيد جداً (= الفاصل الثابت القديم، لا أبطأ منه)
+MONITOR_POLL_FAR_PCT = float(globals().get("MONITOR_POLL_FAR_PCT", 5.0))   # مسافة % تُعتبر "بعيدة"
+MONITOR_MAX_INFLIGHT = int(globals().get("MONITOR_MAX_INFLIGHT", 32))      # أقصى خانات تُقيَّم بالتوازي
 
 _FINAL_STATES = {"closed", "stopped", "drwn", "failed"}
 
@@ -101,8 +118,36 @@ def _get_cycle_slots_limit(structure: Dict[str, Any]) -> int:
         return CYCLE_SLOTS_DEFAULT
 
 
+def _structure_manager():
+    """StructureManager من Section 2 (أو None إن لم يكن متاحاً)."""
+    return get_structure_manager() if callable(get_structure_manager) else None
+
+
+def _structure_view() -> Optional[Dict[str, Any]]:
+    """البنية الحالية للقراءة فقط (بدون نسخ أو قراءة ملف)."""
+    mgr = _structure_manager()
+    if mgr is not None:
+        return mgr.view()
+    return get_trade_structure() if get_trade_structure else None
+
+
+_LEGACY_STRUCTURE_LOCK = asyncio.Lock()
+
+
+@contextlib.asynccontextmanager
+async def _legacy_structure_txn():
+    """
+    بديل update() بدون StructureManager فقط: قراءة ثم حفظ عند النجاح.
+    المعاملات متسلسلة بقفل واحد حتى لا تمحو إحداها الأخرى.
+    """
+    async with _LEGACY_STRUCTURE_LOCK:
+        structure = get_trade_structure()
+        yield structure
+        save_trade_structure(structure)
+
+
 def _count_open_slots(structure: Dict[str, Any]) -> int:
-    """عدد الخانات (slots) المفتوحة حالياً (open/reserved/buy)."""
+    """عدد الخانات (slots) المفتوحة حالياً (open/reserved/buy) — مسح (fallback بدون StructureManager)."""
     slots = structure.get("slots") or {}
     cnt = 0
     for cell in slots.values():
@@ -158,6 +203,13 @@ def _allocate_new_slot_id(structure: Dict[str, Any]) -> str:
     return sid
 
 
+def _trade_journal():
+    """مخزن الصفقات من Section 2 (TradeJournal أو SqliteTradeStore)."""
+    if not callable(get_trade_store):
+        raise RuntimeError("trade store not available")
+    return get_trade_store()
+
+
 def _append_trade_record(
     symbol: str,
     track_num: int,
@@ -169,30 +221,10 @@ def _append_trade_record(
     sim_flag: bool
 ) -> int:
     """
-    إضافة سجل صفقة جديد إلى TRADES_FILE.
+    إضافة سجل صفقة جديد إلى TRADES_FILE (حدث opened في الـ journal).
     يرجّع trade_id (int) ويخزّنه لاحقاً في الخانة.
     """
-    data = {"trades": []}
-    if os.path.exists(TRADES_FILE):
-        try:
-            with open(TRADES_FILE, "r") as f:
-                loaded = json.load(f) or {}
-            data["trades"] = loaded.get("trades", []) or []
-        except Exception:
-            pass
-
-    trades = data["trades"]
-    if trades:
-        try:
-            last_id = max(int(tr.get("id", 0)) for tr in trades)
-        except Exception:
-            last_id = len(trades)
-    else:
-        last_id = 0
-    new_id = last_id + 1
-
     rec = {
-        "id": new_id,
         "symbol": normalize_symbol(symbol),
         "track_num": int(track_num),
         "slot_id": str(slot_id),
@@ -204,6 +236,7 @@ def _append_trade_record(
         "opened_at": datetime.now(timezone.utc).timestamp(),
         "simulated": bool(sim_flag),
         "bought_at": None,
+        "tp1_at": None,
         "closed_at": None,
         "bought_price": None,
         "sell_price": None,
@@ -211,44 +244,34 @@ def _append_trade_record(
         "pnl_usdt": None,
         "pnl_pct": None,
     }
-    trades.append(rec)
-
     try:
-        with open(TRADES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        return _trade_journal().open_trade(rec)
     except Exception as e:
         _console_echo(f"[TRADES] append error: {e}")
-
-    return new_id
+        return 0
 
 
 def _update_trade_on_buy(trade_id: int, bought_price: float, qty: float) -> None:
-    """تحديث سجل TRADES_FILE بعد تنفيذ أمر الشراء."""
-    if not os.path.exists(TRADES_FILE):
-        return
+    """تحديث سجل TRADES_FILE بعد تنفيذ أمر الشراء (حدث bought)."""
     try:
-        with open(TRADES_FILE, "r") as f:
-            data = json.load(f) or {}
-        trades = data.get("trades", []) or []
-    except Exception:
-        return
+        _trade_journal().patch(trade_id, {
+            "status": "buy",
+            "bought_price": float(bought_price),
+            "sell_qty": float(qty),
+            "bought_at": datetime.now(timezone.utc).timestamp(),
+        }, op="bought")
+    except Exception as e:
+        _console_echo(f"[TRADES] buy update error: {e}")
 
-    changed = False
-    for tr in trades:
-        if int(tr.get("id", 0)) == int(trade_id):
-            tr["status"] = "buy"
-            tr["bought_price"] = float(bought_price)
-            tr["sell_qty"] = float(qty)
-            tr["bought_at"] = datetime.now(timezone.utc).timestamp()
-            changed = True
-            break
-
-    if changed:
-        try:
-            with open(TRADES_FILE, "w") as f:
-                json.dump({"trades": trades}, f, indent=2)
-        except Exception as e:
-            _console_echo(f"[TRADES] buy update error: {e}")
+
+def _mark_trade_tp1(trade_id: int) -> None:
+    """أول لمس لـ TP1 (تفعيل التريلينغ) → tp1_at في سجل الصفقة (لإحصاءات stats)."""
+    try:
+        _trade_journal().patch(trade_id, {
+            "tp1_at": datetime.now(timezone.utc).timestamp(),
+        }, op="tp1")
+    except Exception as e:
+        _console_echo(f"[TRADES] tp1 update error: {e}")
 
 
 def _finalize_trade_record(
@@ -258,105 +281,58 @@ def _finalize_trade_record(
     sell_qty: float,
     pnl_usdt: float,
     pnl_pct: float
-) -> None:
-    """تحديث سجل TRADES_FILE عند إغلاق الصفقة (closed/drwn/failed/...)."""
-    if not os.path.exists(TRADES_FILE):
-        return
+) -> bool:
+    """
+    تحديث سجل TRADES_FILE عند إغلاق الصفقة (حدث finalized: closed/drwn/failed/...).
+    يرجّع True إذا وُجد السجل (الـ PnL يدخل الـ rollup عبر patch hook).
+    """
     try:
-        with open(TRADES_FILE, "r") as f:
-            data = json.load(f) or {}
-        trades = data.get("trades", []) or []
-    except Exception:
-        return
-
-    changed = False
-    for tr in trades:
-        if int(tr.get("id", 0)) == int(trade_id):
-            tr["status"] = status
-            tr["sell_price"] = float(sell_price)
-            tr["sell_qty"] = float(sell_qty)
-            tr["pnl_usdt"] = float(pnl_usdt)
-            tr["pnl_pct"] = float(pnl_pct)
-            tr["closed_at"] = datetime.now(timezone.utc).timestamp()
-            changed = True
-            break
-
-    if changed:
-        try:
-            with open(TRADES_FILE, "w") as f:
-                json.dump({"trades": trades}, f, indent=2)
-        except Exception as e:
-            _console_echo(f"[TRADES] finalize error: {e}")
+        return bool(_trade_journal().patch(trade_id, {
+            "status": status,
+            "sell_price": float(sell_price),
+            "sell_qty": float(sell_qty),
+            "pnl_usdt": float(pnl_usdt),
+            "pnl_pct": float(pnl_pct),
+            "closed_at": datetime.now(timezone.utc).timestamp(),
+        }, op="finalized"))
+    except Exception as e:
+        _console_echo(f"[TRADES] finalize error: {e}")
+    return False
 
 
-def _update_track_pointer_on_result(status: str) -> None:
+async def _update_track_pointer_on_result(status: str) -> None:
     """
     تحديث next_track_index حسب نتيجة الصفقة:
       - إذا status == "closed" (ربح ≥ 2%) → نزيد المؤشر +1 حتى لا يتخطى MAX_TRACKS.
       - أي حالة أخرى → لا تغيير (إعادة المحاولة على نفس المسار المنطقي).
+    القراءة والكتابة داخل update(): الاعتماد يكتب next_track_index فقط.
     """
-    if get_trade_structure is None or save_trade_structure is None:
+    if (status or "").lower() != "closed":
+        return
+    mgr = _structure_manager()
+    if mgr is None and (get_trade_structure is None or save_trade_structure is None):
         return
     try:
-        s = get_trade_structure()
-        max_tracks = int(s.get("max_tracks", MAX_TRACKS))
-        try:
-            cur = int(s.get("next_track_index", 1))
-        except Exception:
-            cur = 1
-        if (status or "").lower() == "closed":
-            cur = min(max_tracks, cur + 1)
-            s["next_track_index"] = cur
-            save_trade_structure(s)
+        async with (mgr.update() if mgr is not None else _legacy_structure_txn()) as s:
+            max_tracks = int(s.get("max_tracks", MAX_TRACKS))
+            try:
+                cur = int(s.get("next_track_index", 1))
+            except Exception:
+                cur = 1
+            s["next_track_index"] = min(max_tracks, cur + 1)
     except Exception as e:
         _console_echo(f"[TRACK PTR] update error: {e}")
 
 
 # ============================================
-# fetch_current_price (Async)
+# Price feed (Section 2)
 # ============================================
 
-async def fetch_current_price(symbol: str) -> Optional[float]:
-    """
-    جلب السعر الحالي من KuCoin.
-    - يستخدم kucoin.get_ticker(pair)
-    - عند الفشل: يسجّل في Terminal Notices (price_fetch_fail_SYMBOL)
-    """
-    if kucoin is None:
-        return None
-
+def _price_feed():
+    """Price feed المشترك (WebSocket) من Section 2 إن وُجد."""
     try:
-        pair = format_symbol(symbol)
+        return get_price_feed() if callable(get_price_feed) else None
     except Exception:
-        pair = symbol
-
-    sym_norm = normalize_symbol(symbol)
-
-    try:
-        # نستخدم to_thread حتى لا نحجب event loop
-        ticker = await asyncio.to_thread(kucoin.get_ticker, pair)
-        if not ticker:
-            raise RuntimeError("empty ticker")
-
-        price_str = (
-            ticker.get("price")
-            or ticker.get("bestBid")
-            or ticker.get("bestAsk")
-        )
-        if not price_str:
-            raise RuntimeError("no price field")
-
-        return float(price_str)
-    except Exception as e:
-        try:
-            if callable(log_terminal_notification):
-                log_terminal_notification(
-                    f"price_fetch_fail_{sym_norm}",
-                    tag=f"price_fetch_fail_{sym_norm}"
-                )
-        except Exception:
-            pass
-        _console_echo(f"[PRICE] fetch error for {sym_norm}: {e}")
         return None
 
 
@@ -374,7 +350,7 @@ async def execute_trade(symbol: str, entry_price: float, sl_price: float, target
       - يختار رقم المسار (track_num) حسب next_track_index.
       - يخصص Slot ID جديد.
       - يسجّل في trade_structure + TRADES_FILE.
-      - يطلق monitor_and_execute كـ task.
+      - يسجّل الخانة في MonitorScheduler (بدون task لكل خانة).
     """
     sym_norm = normalize_symbol(symbol)
 
@@ -428,75 +404,71 @@ async def execute_trade(symbol: str, entry_price: float, sl_price: float, target
             )
         return
 
-    structure = get_trade_structure()
-    cap = _get_cycle_slots_limit(structure)
-    open_cnt = _count_open_slots(structure)
-
-    if open_cnt >= cap:
-        if callable(send_notification_tc):
-            await send_notification_tc(
-                f"⚠️ Cannot open new trade. Capacity reached {open_cnt}/{cap}.",
-                symbol=sym_norm
-            )
-        return
-
-    # ===== 5) اختيار المسار وحجم الصفقة =====
-    track_num = _select_track_for_new_trade(structure)
-    tracks_def = structure.get("tracks") or {}
-    tinfo = tracks_def.get(str(track_num)) or {}
-
-    try:
-        amount = float(tinfo.get("amount", 0) or 0.0)
-    except Exception:
-        amount = 0.0
-
-    if amount <= 0.0:
-        try:
-            if callable(track_base_amount):
-                amount = float(track_base_amount(track_num))
-            else:
-                amount = float(INITIAL_TRADE_AMOUNT * ((1 + TRADE_INCREMENT_PERCENT / 100.0) ** (track_num - 1)))
-        except Exception:
-            amount = float(INITIAL_TRADE_AMOUNT)
+    # فحص السعة + اختيار المسار + حجز الخانة + سجل TRADES_FILE في معاملة واحدة
+    mgr = _structure_manager()
+    capacity_msg: Optional[str] = None
+    async with (mgr.update() if mgr is not None else _legacy_structure_txn()) as structure:
+        cap = _get_cycle_slots_limit(structure)
+        open_cnt = mgr.counts()["active"] if mgr is not None else _count_open_slots(structure)
 
-    # ===== 6) تخصيص Slot جديد =====
-    slot_id = _allocate_new_slot_id(structure)
-    sim_flag = bool(is_simulation()) if callable(is_simulation) else False
+        if open_cnt >= cap:
+            capacity_msg = f"⚠️ Cannot open new trade. Capacity reached {open_cnt}/{cap}."
+        else:
+            # ===== 5) اختيار المسار وحجم الصفقة =====
+            track_num = _select_track_for_new_trade(structure)
+            tracks_def = structure.get("tracks") or {}
+            tinfo = tracks_def.get(str(track_num)) or {}
 
-    cell = {
-        "symbol": sym_norm,
-        "entry": float(entry_price),
-        "sl": float(sl_price),
-        "targets": targets,
-        "status": "open",
-        "amount": float(amount),
-        "track_num": int(track_num),
-        "slot_id": str(slot_id),
-        "start_time": None,
-        "filled_qty": None,
-        "bought_price": None,
-        "simulated": bool(sim_flag),
-        "trade_id": None,  # نملأه بعد append
-    }
+            try:
+                amount = float(tinfo.get("amount", 0) or 0.0)
+            except Exception:
+                amount = 0.0
 
-    structure.setdefault("slots", {})[str(slot_id)] = cell
-    save_trade_structure(structure)
+            if amount <= 0.0:
+                try:
+                    if callable(track_base_amount):
+                        amount = float(track_base_amount(track_num))
+                    else:
+                        amount = float(INITIAL_TRADE_AMOUNT * ((1 + TRADE_INCREMENT_PERCENT / 100.0) ** (track_num - 1)))
+                except Exception:
+                    amount = float(INITIAL_TRADE_AMOUNT)
+
+            # ===== 6) تخصيص Slot جديد =====
+            slot_id = _allocate_new_slot_id(structure)
+            sim_flag = bool(is_simulation()) if callable(is_simulation) else False
+
+            # ===== 7) سجل في TRADES_FILE =====
+            trade_id = _append_trade_record(
+                symbol=sym_norm,
+                track_num=track_num,
+                slot_id=str(slot_id),
+                entry=float(entry_price),
+                sl=float(sl_price),
+                targets=targets,
+                amount=float(amount),
+                sim_flag=sim_flag,
+            )
 
-    # ===== 7) سجل في TRADES_FILE =====
-    trade_id = _append_trade_record(
-        symbol=sym_norm,
-        track_num=track_num,
-        slot_id=str(slot_id),
-        entry=float(entry_price),
-        sl=float(sl_price),
-        targets=targets,
-        amount=float(amount),
-        sim_flag=sim_flag,
-    )
-    # خزّن trade_id في الخانة
-    structure = get_trade_structure()
-    structure["slots"][str(slot_id)]["trade_id"] = int(trade_id)
-    save_trade_structure(structure)
+            structure.setdefault("slots", {})[str(slot_id)] = {
+                "symbol": sym_norm,
+                "entry": float(entry_price),
+                "sl": float(sl_price),
+                "targets": targets,
+                "status": "open",
+                "amount": float(amount),
+                "track_num": int(track_num),
+                "slot_id": str(slot_id),
+                "start_time": None,
+                "filled_qty": None,
+                "bought_price": None,
+                "simulated": bool(sim_flag),
+                "trade_id": int(trade_id),
+            }
+
+    if capacity_msg is not None:
+        if callable(send_notification_tc):
+            await send_notification_tc(capacity_msg, symbol=sym_norm)
+        return
 
     # ===== 8) إشعار استقبال التوصية =====
     if callable(send_notification_tc):
@@ -510,37 +482,90 @@ async def execute_trade(symbol: str, entry_price: float, sl_price: float, target
             symbol=sym_norm
         )
 
-    # ===== 9) إطلاق المراقب =====
-    asyncio.create_task(
-        monitor_and_execute(
-            symbol=sym_norm,
-            entry_price=float(entry_price),
-            sl_price=float(sl_price),
-            targets=targets,
-            amount=float(amount),
-            track_num=int(track_num),
-            slot_id=str(slot_id),
-            trade_id=int(trade_id),
-        )
+    # ===== 9) تسجيل الخانة في المُجدول المركزي =====
+    await start_monitor(
+        symbol=sym_norm,
+        entry_price=float(entry_price),
+        sl_price=float(sl_price),
+        targets=targets,
+        amount=float(amount),
+        track_num=int(track_num),
+        slot_id=str(slot_id),
+        trade_id=int(trade_id),
     )
 
 
 # ============================================
-# monitor_and_execute
+# قرار TP ladder + Trailing (دالة صافية؛ مرجع bench/batch_ladder.py)
 # ============================================
 
-async def monitor_and_execute(
-    symbol: str,
-    entry_price: float,
-    sl_price: float,
+SELL_NONE = 0
+SELL_FLOOR = 1   # كسر الأرضية (آخر TP مُلامس)
+SELL_TRAIL = 2   # هبوط ≥ RETRACE_PERCENT من القمّة فوق الأرضية
+
+
+def _ladder_step(
     targets: List[float],
-    amount: float,
-    track_num: int,
-    slot_id: str,
-    trade_id: int,
-):
+    tp1_val: float,
+    highest_idx: int,
+    trailing_armed: bool,
+    max_after_touch: Optional[float],
+    last_tp_floor: Optional[float],
+    price: float,
+) -> Tuple[int, bool, Optional[float], Optional[float], bool, bool, int]:
+    """
+    منطق TP ladder + Trailing لصفقة مشتراة عند سعر واحد (بدون أي تنفيذ).
+    يرجّع:
+      (highest_idx, trailing_armed, max_after_touch, last_tp_floor,
+       advanced, armed_now, sell_code)
+    """
+    # -------- TP ladder (بدون بيع على الملامسة) --------
+    advanced = False
+    while (highest_idx + 1) < len(targets) and price >= float(targets[highest_idx + 1]) - EPS:
+        highest_idx += 1
+        advanced = True
+        last_tp_floor = float(targets[highest_idx])
+
+    armed_now = False
+    if advanced:
+        if not trailing_armed and price >= tp1_val - EPS:
+            # تفعيل التريلينغ عند لمس TP1
+            trailing_armed = True
+            armed_now = True
+            max_after_touch = price
+            last_tp_floor = max(last_tp_floor or 0.0, tp1_val)
+        elif trailing_armed:
+            if max_after_touch is None or price > max_after_touch:
+                max_after_touch = price
+            last_tp_floor = max(last_tp_floor or 0.0, float(targets[highest_idx]))
+
+    # -------- Trailing logic --------
+    sell_code = SELL_NONE
+    if trailing_armed:
+        # تحديث القمّة
+        if max_after_touch is None or price > max_after_touch:
+            max_after_touch = price
+
+        enforced_floor = max(float(last_tp_floor or 0.0), tp1_val)
+        raw_trigger = (max_after_touch or price) * (1.0 - RETRACE_PERCENT / 100.0)
+
+        # (A) كسر الأرضية → بيع فوري
+        if price < enforced_floor - EPS:
+            sell_code = SELL_FLOOR
+        # (B) هبوط ≥1% من القمّة مع البقاء فوق الأرضية
+        elif price <= raw_trigger + EPS and price >= enforced_floor - EPS:
+            sell_code = SELL_TRAIL
+
+    return highest_idx, trailing_armed, max_after_touch, last_tp_floor, advanced, armed_now, sell_code
+
+
+# ============================================
+# SlotMonitor — حالة ومنطق مراقبة Slot واحد
+# ============================================
+
+class SlotMonitor:
     """
-    منطق التنفيذ والمراقبة:
+    منطق التنفيذ والمراقبة لخانة واحدة (بدون حلقة/نوم خاص بها):
 
       1) شراء Market عند وصول السعر ≤ entry.
       2) لا بيع مباشرة على أي TP:
@@ -555,97 +580,201 @@ async def monitor_and_execute(
          - TRADES_FILE via _finalize_trade_record
          - register_trade_outcome (Counters)
          - تحديث next_track_index على "closed" فقط.
+
+    MonitorScheduler يستدعي step(price) لكل خانة مستحقة، والنتيجة هي
+    عدد الثواني حتى الفحص التالي أو None عند انتهاء المراقبة.
     """
-    sym_norm = normalize_symbol(symbol)
-    sim_flag = bool(is_simulation()) if callable(is_simulation) else False
 
-    try:
-        pair = format_symbol(symbol)
-    except Exception:
-        pair = symbol
+    def __init__(
+        self,
+        symbol: str,
+        entry_price: float,
+        sl_price: float,
+        targets: List[float],
+        amount: float,
+        track_num: int,
+        slot_id: str,
+        trade_id: int,
+    ) -> None:
+        self.sym_norm = normalize_symbol(symbol)
+        self.sim_flag = bool(is_simulation()) if callable(is_simulation) else False
+        try:
+            self.pair = format_symbol(symbol)
+        except Exception:
+            self.pair = symbol
 
-    # ===== meta من KuCoin =====
-    meta = None
-    try:
-        if callable(get_symbol_meta):
-            meta = get_symbol_meta(pair)
-    except Exception as e:
-        _console_echo(f"[META] get_symbol_meta error for {sym_norm}: {e}")
+        self.entry_price = float(entry_price)
+        self.sl_price = float(sl_price)
+        self.amount = float(amount)
+        self.track_num = int(track_num)
+        self.slot_id = str(slot_id)
+        self.trade_id = int(trade_id)
 
-    if not meta:
-        if callable(send_notification_tc):
-            await send_notification_tc(
-                "❌ Meta fetch failed. Cancel trade.",
-                symbol=sym_norm
-            )
-        # فشل كامل → نعتبرها failed
-        register_trade_outcome(str(track_num), "failed") if callable(register_trade_outcome) else None
-        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-        # حرّر الخانة
-        if get_trade_structure and save_trade_structure:
-            s = get_trade_structure()
-            slot_cell = (s.get("slots") or {}).get(str(slot_id))
-            if slot_cell:
-                s["slots"][str(slot_id)] = None
-                save_trade_structure(s)
-        return
+        # ===== أهداف مرتبَة =====
+        try:
+            tps = [float(x) for x in (targets or []) if x is not None]
+        except Exception:
+            tps = []
+        if not tps:
+            tps = [float(self.entry_price * 1.01)]  # احتياط
+        self.targets: List[float] = sorted(tps)
+        self.tp1_val = float(self.targets[0])
+
+        # ===== meta =====
+        self.meta: Optional[Dict[str, Any]] = None
+        self.quote_inc = 0.0
+        self.base_inc = 0.0
+        self.min_base = 0.0
+
+        # ===== حالة الصفقة =====
+        self.bought_price: Optional[float] = None
+        self.qty: float = 0.0
+        self.start_time: Optional[datetime] = None
+
+        self.highest_idx = -1  # أعلى TP مُلامس
+        self.trailing_armed = False
+        self.max_after_touch: Optional[float] = None
+        self.last_tp_floor: Optional[float] = None
+
+        self.last_price_ok_ts = time.time()
+        self.sl_alerted = False
+        self._qty_ok = False
+        self.poll_sec: Optional[float] = None  # آخر إيقاع فحص مُسجَّل
+
+        self.done: Optional[asyncio.Future] = None
+
+    @property
+    def key(self) -> str:
+        return self.slot_id
+
+    # ---------- التهيئة ----------
+    async def setup(self) -> bool:
+        """جلب meta + استرجاع حالة BUY من الهيكل (عند الاستئناف). False → الصفقة أُلغيت."""
+        try:
+            if callable(get_symbol_meta):
+                self.meta = await get_symbol_meta(self.pair)
+        except Exception as e:
+            _console_echo(f"[META] get_symbol_meta error for {self.sym_norm}: {e}")
 
-    quote_inc = float(meta["quoteIncrement"])
-    base_inc = float(meta["baseIncrement"])
-    min_base = float(meta["baseMinSize"])
+        if not self.meta:
+            if callable(send_notification_tc):
+                await send_notification_tc(
+                    "❌ Meta fetch failed. Cancel trade.",
+                    symbol=self.sym_norm
+                )
+            # فشل كامل → نعتبرها failed
+            register_trade_outcome(str(self.track_num), "failed") if callable(register_trade_outcome) else None
+            _finalize_trade_record(self.trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
+            # حرّر الخانة
+            self._release_slot()
+            return False
+
+        self.quote_inc = float(self.meta["quoteIncrement"])
+        self.base_inc = float(self.meta["baseIncrement"])
+        self.min_base = float(self.meta["baseMinSize"])
+
+        # استئناف صفقة BUY: لا نعيد الشراء، نكمل TP/Trailing من سعر التنفيذ المحفوظ
+        try:
+            structure_now = _structure_view()
+            if structure_now is not None:
+                cell = (structure_now.get("slots") or {}).get(self.slot_id) or {}
+                if (cell.get("status") or "").lower() == "buy":
+                    bp = float(cell.get("bought_price") or 0.0)
+                    fq = float(cell.get("filled_qty") or 0.0)
+                    if bp > 0 and fq > 0:
+                        self.bought_price = bp
+                        self.qty = fq
+                        st_iso = cell.get("start_time")
+                        if st_iso:
+                            dt = datetime.fromisoformat(st_iso)
+                            self.start_time = dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+        except Exception as e:
+            _console_echo(f"[MONITOR] resume state error on {self.sym_norm}: {e}")
+        return True
 
-    # ===== أهداف مرتبَة =====
-    try:
-        targets = [float(x) for x in (targets or []) if x is not None]
-    except Exception:
-        targets = []
-    if not targets:
-        targets = [float(entry_price * 1.01)]  # احتياط
-    targets = sorted(targets)
-    tp1_val = float(targets[0])
+    # ---------- أدوات ----------
+    def band(self) -> Tuple[float, float]:
+        """
+        النطاق الهادئ (lo, hi): أي سعر lo < p < hi لا يسبب شراء/TP/تفعيل/بيع
+        ولا قمّة جديدة → لا حاجة لـ step(). يُعاد تسجيله في ThresholdIndex بعد كل تغيّر.
+        """
+        inf = float("inf")
+        if self.bought_price is None:
+            return self.entry_price + EPS, inf  # سقف الدخول
+        if not self._qty_ok:
+            return inf, -inf  # لم يُفحص الحد الأدنى للكمية بعد → أي سعر حدث
+        nxt = self.highest_idx + 1
+        hi = float(self.targets[nxt]) - EPS if nxt < len(self.targets) else inf  # TP التالي
+        if not self.trailing_armed:
+            return -inf, hi
+        enforced_floor = max(float(self.last_tp_floor or 0.0), self.tp1_val)
+        trigger = float(self.max_after_touch or 0.0) * (1.0 - RETRACE_PERCENT / 100.0)
+        lo = max(trigger + EPS, enforced_floor - EPS)  # الأرضية / trailing trigger
+        if self.max_after_touch is not None:
+            hi = min(hi, float(self.max_after_touch))  # قمّة جديدة تغيّر الـ trigger
+        return lo, hi
+
+    def is_active(self, structure: Optional[Dict[str, Any]]) -> bool:
+        """حارس مبكر: إذا تم مسح الخانة أو تغيير الحالة لشيء نهائي، أوقف المراقبة."""
+        try:
+            if structure is None:
+                return True
+            cell_now = (structure.get("slots") or {}).get(self.slot_id)
+            if not cell_now:
+                return False
+            st_now = (cell_now.get("status") or "").lower()
+            return st_now in ("open", "reserved", "buy")
+        except Exception:
+            return True
 
-    # ===== حالة الصفقة =====
-    bought_price: Optional[float] = None
-    qty: float = 0.0
-    start_time: Optional[datetime] = None
+    def _release_slot(self) -> None:
+        mgr = _structure_manager()
+        if mgr is not None:
+            if (mgr.view().get("slots") or {}).get(self.slot_id):
+                mgr.set_slot(self.slot_id, None)
+            return
+        if get_trade_structure and save_trade_structure:
+            s = get_trade_structure()
+            slots = s.get("slots") or {}
+            if slots.get(self.slot_id):
+                slots[self.slot_id] = None
+                s["slots"] = slots
+                save_trade_structure(s)
 
-    highest_idx = -1  # أعلى TP مُلامس
-    trailing_armed = False
-    max_after_touch: Optional[float] = None
-    last_tp_floor: Optional[float] = None
+    def _mark_failed(self) -> None:
+        _finalize_trade_record(self.trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
+        if callable(register_trade_outcome):
+            register_trade_outcome(str(self.track_num), "failed")
 
-    last_price_ok_ts = time.time()
-    sl_alerted = False
+    async def _notify(self, message: str) -> None:
+        if callable(send_notification_tc):
+            await send_notification_tc(message, symbol=self.sym_norm)
 
     # ===== Helper: finalize trade (بيع) =====
-    async def _do_market_sell(exec_price_hint: Optional[float]) -> Tuple[float, float, float, float]:
+    async def _do_market_sell(self, exec_price_hint: Optional[float]) -> Tuple[float, float, float, float]:
         """
         تنفيذ أمر بيع Market:
           - يعيد: (sell_price, sell_qty, pnl_usdt, pnl_pct)
         """
-        nonlocal qty, bought_price
-
-        adj_qty = quantize_down(qty * 0.9998, base_inc) if callable(quantize_down) else qty * 0.9998
-        if adj_qty < min_base or adj_qty <= 0.0:
+        adj_qty = quantize_down(self.qty * 0.9998, self.base_inc) if callable(quantize_down) else self.qty * 0.9998
+        if adj_qty < self.min_base or adj_qty <= 0.0:
             raise RuntimeError("adjusted qty below min_base")
 
-        order = place_market_order(
-            pair, "sell",
+        order = await place_market_order(
+            self.pair, "sell",
             size=str(adj_qty),
-            symbol_hint=sym_norm,
-            sim_override=bool(sim_flag)
+            symbol_hint=self.sym_norm,
+            sim_override=bool(self.sim_flag)
         ) if callable(place_market_order) else None
 
-        await asyncio.sleep(1)
-
         if order and isinstance(order, dict):
             order_id = order.get("orderId")
         else:
             order_id = None
 
-        if order_id and callable(get_order_deal_size):
-            filled_qty, deal_funds = await get_order_deal_size(
-                order_id, symbol=sym_norm, sim_override=bool(sim_flag)
+        if order_id and callable(wait_order_fill):
+            filled_qty, deal_funds = await wait_order_fill(
+                order_id, symbol=self.sym_norm, sim_override=bool(self.sim_flag)
             )
             if filled_qty <= 0.0:
                 raise RuntimeError("sell order filled_qty = 0")
@@ -653,394 +782,726 @@ async def monitor_and_execute(
             sell_qty = float(filled_qty)
         else:
             # fallback تقريبي
-            sell_price = float(exec_price_hint or bought_price or entry_price)
+            sell_price = float(exec_price_hint or self.bought_price or self.entry_price)
             sell_qty = float(adj_qty)
 
-        bp = float(bought_price or entry_price)
+        bp = float(self.bought_price or self.entry_price)
         pnl_usdt = (sell_price - bp) * sell_qty
         pct = ((sell_price - bp) / max(bp, 1e-12)) * 100.0
 
         return sell_price, sell_qty, pnl_usdt, pct
 
     async def _finalize_and_cleanup(
+        self,
         final_status: str,
         sell_price: float,
         sell_qty: float,
         pnl_usdt: float,
         pnl_pct: float,
         tag: str
-    ):
+    ) -> None:
         """تحديث الملفات + counters + pointer + إشعار نهائي + تحرير الـ Slot."""
-        # 1) summary (اختياري)
+        # 1) TRADES_FILE (+ PnL rollup عبر patch hook)
         try:
-            if callable(accumulate_summary):
-                if pnl_usdt >= 0:
-                    accumulate_summary(profit_delta=float(pnl_usdt))
-                else:
-                    accumulate_summary(loss_delta=float(-pnl_usdt))
+            recorded = _finalize_trade_record(self.trade_id, final_status, sell_price, sell_qty, pnl_usdt, pnl_pct)
         except Exception:
-            pass
+            recorded = False
 
-        # 2) TRADES_FILE
+        # 2) summary: فقط إذا لم يوجد سجل صفقة يحمل الـ PnL
         try:
-            _finalize_trade_record(trade_id, final_status, sell_price, sell_qty, pnl_usdt, pnl_pct)
+            if not recorded and callable(accumulate_summary):
+                if pnl_usdt >= 0:
+                    accumulate_summary(profit_delta=float(pnl_usdt), track_num=self.track_num, symbol=self.sym_norm)
+                else:
+                    accumulate_summary(loss_delta=float(-pnl_usdt), track_num=self.track_num, symbol=self.sym_norm)
         except Exception:
             pass
 
         # 3) Counters (structure)
         try:
             if callable(register_trade_outcome):
-                register_trade_outcome(str(track_num), final_status)
+                register_trade_outcome(str(self.track_num), final_status)
         except Exception:
             pass
 
         # 4) مسار next_track_index (يتقدّم فقط عند closed ≥ 2%)
         try:
-            _update_track_pointer_on_result(final_status)
+            await _update_track_pointer_on_result(final_status)
         except Exception:
             pass
 
         # 5) تحرير الـ Slot
-        if get_trade_structure and save_trade_structure:
-            s = get_trade_structure()
-            slots = s.get("slots") or {}
-            cell = slots.get(str(slot_id))
-            if cell:
-                slots[str(slot_id)] = None
-                s["slots"] = slots
-                save_trade_structure(s)
+        self._release_slot()
 
         # 6) إشعار نهائي
         dur_str = ""
         try:
-            if start_time:
-                delta = datetime.now(timezone.utc) - start_time
+            if self.start_time:
+                delta = datetime.now(timezone.utc) - self.start_time
                 dur_str = f"{delta.days}d / {delta.seconds // 3600}h / {(delta.seconds % 3600)//60}m"
         except Exception:
             pass
 
-        if callable(send_notification_tc):
-            emoji = "🟢" if final_status == "closed" else "🔴"
-            await send_notification_tc(
-                (
-                    f"{emoji} Auto SELL — {tag}\n"
-                    f"💰 Buy: {float(bought_price or entry_price):.6f} → Sell: {sell_price:.6f}\n"
-                    f"📦 Qty: {sell_qty:.6f} | 💵 Amount: {amount:.2f} USDT\n"
-                    f"💵 PnL: {pnl_usdt:.4f} USDT  ({pnl_pct:+.2f}%)\n"
-                    f"{('⏱️ ' + dur_str) if dur_str else ''}"
-                ),
-                symbol=sym_norm
+        emoji = "🟢" if final_status == "closed" else "🔴"
+        await self._notify(
+            (
+                f"{emoji} Auto SELL — {tag}\n"
+                f"💰 Buy: {float(self.bought_price or self.entry_price):.6f} → Sell: {sell_price:.6f}\n"
+                f"📦 Qty: {sell_qty:.6f} | 💵 Amount: {self.amount:.2f} USDT\n"
+                f"💵 PnL: {pnl_usdt:.4f} USDT  ({pnl_pct:+.2f}%)\n"
+                f"{('⏱️ ' + dur_str) if dur_str else ''}"
             )
+        )
 
-    # ========== الحلقة الرئيسية ==========
-    try:
-        while True:
-            # ---- حارس مبكر: إذا تم مسح الخانة أو تغيير الحالة لشيء نهائي، أوقف المراقبة ----
-            try:
-                if get_trade_structure:
-                    s_now = get_trade_structure()
-                    cell_now = (s_now.get("slots") or {}).get(str(slot_id))
-                    if not cell_now:
-                        return
-                    st_now = (cell_now.get("status") or "").lower()
-                    if st_now not in ("open", "reserved", "buy"):
-                        return
-            except Exception:
-                pass
-
-            # ---- جلب السعر الحالي ----
-            price = await fetch_current_price(sym_norm)
-            if price is None:
-                if (time.time() - last_price_ok_ts) >= PRICE_TIMEOUT_SEC and bought_price is None:
-                    # فشل 10 دقائق قبل الدخول → نعتبر الصفقة failed ونحرر الـSlot
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            "⛔️ Canceled: لم يتم الحصول على سعر لمدة 10 دقائق. تم إلغاء الصفقة.",
-                            symbol=sym_norm
-                        )
-                    try:
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                    except Exception:
-                        pass
-                    if get_trade_structure and save_trade_structure:
-                        s = get_trade_structure()
-                        slots = s.get("slots") or {}
-                        if str(slot_id) in slots:
-                            slots[str(slot_id)] = None
-                            s["slots"] = slots
-                            save_trade_structure(s)
-                    return
-                await asyncio.sleep(60)
-                continue
+    # =================== تنفيذ الشراء ===================
+    async def _try_buy(self, price: float) -> bool:
+        """تنفيذ الشراء عند entry. False → الصفقة انتهت (failed)."""
+        sym_norm = self.sym_norm
+        try:
+            # حجم USDT المخطّط
+            funds_planned = quantize_down(self.amount, self.quote_inc) if callable(quantize_down) else self.amount
+            if funds_planned <= 0:
+                await self._notify("⚠️ Funds too small.")
+                self._mark_failed()
+                return False
+
+            # رصيد USDT في حساب التداول
+            available_usdt = await get_trade_balance_usdt(sim_override=self.sim_flag) if callable(get_trade_balance_usdt) else funds_planned
+            if available_usdt <= 0:
+                await self._notify("❌ Buy failed: USDT balance is 0.")
+                self._mark_failed()
+                return False
+
+            funds = min(funds_planned, available_usdt)
+            funds = quantize_down(funds, self.quote_inc) if callable(quantize_down) else funds
+            if funds <= 0:
+                await self._notify("❌ Buy failed: not enough USDT after quantization.")
+                self._mark_failed()
+                return False
+
+            est_qty = funds / max(price, 1e-12)
+            est_qty_q = quantize_down(est_qty, self.base_inc) if callable(quantize_down) else est_qty
+            if est_qty_q < self.min_base:
+                min_needed = self.min_base * price
+                await self._notify(
+                    (
+                        "❌ Buy blocked: amount too small for pair min size.\n"
+                        f"• est_qty={est_qty_q:.8f} < baseMinSize={self.min_base}\n"
+                        f"• Approx min USDT needed: {min_needed:.4f}"
+                    )
+                )
+                self._mark_failed()
+                return False
+
+            order = await place_market_order(
+                self.pair, "buy",
+                funds=str(funds),
+                symbol_hint=sym_norm,
+                sim_override=bool(self.sim_flag)
+            ) if callable(place_market_order) else None
+
+            if not order or not isinstance(order, dict) or not order.get("orderId"):
+                await self._notify("❌ Buy error: no orderId returned.")
+                self._mark_failed()
+                return False
+
+            order_id = order["orderId"]
+
+            if callable(wait_order_fill):
+                filled_qty, deal_funds = await wait_order_fill(
+                    order_id, symbol=sym_norm, sim_override=bool(self.sim_flag)
+                )
             else:
-                last_price_ok_ts = time.time()
+                filled_qty, deal_funds = est_qty_q, est_qty_q * price
+
+            if filled_qty <= 0.0:
+                await self._notify("❌ Buy issue: order executed but filled size = 0.")
+                self._mark_failed()
+                return False
+
+            self.qty = float(filled_qty)
+            self.bought_price = float(deal_funds) / float(filled_qty)
+            self.start_time = datetime.now(timezone.utc)
+
+            # تحديث الخانة في structure
+            mgr = _structure_manager()
+            if mgr is not None:
+                cell = dict((mgr.view().get("slots") or {}).get(self.slot_id) or {})
+                cell["status"] = "buy"
+                cell["start_time"] = self.start_time.isoformat()
+                cell["filled_qty"] = self.qty
+                cell["bought_price"] = self.bought_price
+                mgr.set_slot(self.slot_id, cell)
+            elif get_trade_structure and save_trade_structure:
+                s = get_trade_structure()
+                slots = s.get("slots") or {}
+                cell = slots.get(self.slot_id) or {}
+                cell["status"] = "buy"
+                cell["start_time"] = self.start_time.isoformat()
+                cell["filled_qty"] = self.qty
+                cell["bought_price"] = self.bought_price
+                slots[self.slot_id] = cell
+                s["slots"] = slots
+                save_trade_structure(s)
+
+            # تحديث TRADES_FILE للشراء
+            _update_trade_on_buy(self.trade_id, self.bought_price, self.qty)
+
+            sim_tag = " (SIM)" if self.sim_flag else ""
+            await self._notify(
+                (
+                    f"✅ Bought{sim_tag}\n"
+                    f"💰 Price: {self.bought_price:.6f}\n"
+                    f"📦 Qty: {self.qty:.6f}\n"
+                    f"💵 Amount: {self.amount:.2f} USDT\n"
+                    f"🔢 Track {self.track_num} | Slot {self.slot_id}"
+                )
+            )
+            return True
 
-            # =================== تنفيذ الشراء ===================
-            if bought_price is None and price <= float(entry_price) + EPS:
+        except Exception as e:
+            _console_echo(f"[BUY] error on {sym_norm}: {e}")
+            await self._notify(f"❌ Buy execution error: {e}")
+            self._mark_failed()
+            return False
+
+    async def _sell_and_finalize(self, price: float, tag: str) -> None:
+        sell_price, sell_qty, pnl_usdt, pnl_pct = await self._do_market_sell(exec_price_hint=price)
+        res = classify_pnl(float(self.bought_price), float(sell_price)) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
+        final_status = (res.get("status") or "drwn").lower()
+        await self._finalize_and_cleanup(final_status, sell_price, sell_qty, pnl_usdt, res.get("pct", pnl_pct), tag)
+
+    # ========== خطوة مراقبة واحدة ==========
+    async def step(self, price: Optional[float]) -> Optional[float]:
+        """
+        معالجة سعر واحد (أو None عند فشل الجلب).
+        يرجّع عدد الثواني حتى الفحص التالي، أو None إذا انتهت المراقبة.
+        """
+        sym_norm = self.sym_norm
+
+        if price is None:
+            if (time.time() - self.last_price_ok_ts) >= PRICE_TIMEOUT_SEC and self.bought_price is None:
+                # فشل 10 دقائق قبل الدخول → نعتبر الصفقة failed ونحرر الـSlot
+                await self._notify("⛔️ Canceled: لم يتم الحصول على سعر لمدة 10 دقائق. تم إلغاء الصفقة.")
                 try:
-                    # حجم USDT المخطّط
-                    funds_planned = quantize_down(amount, meta["quoteIncrement"]) if callable(quantize_down) else amount
-                    if funds_planned <= 0:
-                        if callable(send_notification_tc):
-                            await send_notification_tc("⚠️ Funds too small.", symbol=sym_norm)
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    # رصيد USDT في حساب التداول
-                    available_usdt = get_trade_balance_usdt(sim_override=sim_flag) if callable(get_trade_balance_usdt) else funds_planned
-                    if available_usdt <= 0:
-                        if callable(send_notification_tc):
-                            await send_notification_tc("❌ Buy failed: USDT balance is 0.", symbol=sym_norm)
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    funds = min(funds_planned, available_usdt)
-                    funds = quantize_down(funds, meta["quoteIncrement"]) if callable(quantize_down) else funds
-                    if funds <= 0:
-                        if callable(send_notification_tc):
-                            await send_notification_tc(
-                                "❌ Buy failed: not enough USDT after quantization.",
-                                symbol=sym_norm
-                            )
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    est_qty = funds / max(price, 1e-12)
-                    est_qty_q = quantize_down(est_qty, base_inc) if callable(quantize_down) else est_qty
-                    if est_qty_q < min_base:
-                        min_needed = min_base * price
-                        if callable(send_notification_tc):
-                            await send_notification_tc(
-                                (
-                                    "❌ Buy blocked: amount too small for pair min size.\n"
-                                    f"• est_qty={est_qty_q:.8f} < baseMinSize={min_base}\n"
-                                    f"• Approx min USDT needed: {min_needed:.4f}"
-                                ),
-                                symbol=sym_norm
-                            )
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    order = place_market_order(
-                        pair, "buy",
-                        funds=str(funds),
-                        symbol_hint=sym_norm,
-                        sim_override=bool(sim_flag)
-                    ) if callable(place_market_order) else None
-
-                    if not order or not isinstance(order, dict) or not order.get("orderId"):
-                        if callable(send_notification_tc):
-                            await send_notification_tc("❌ Buy error: no orderId returned.", symbol=sym_norm)
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    order_id = order["orderId"]
-                    await asyncio.sleep(1)
-
-                    if callable(get_order_deal_size):
-                        filled_qty, deal_funds = await get_order_deal_size(
-                            order_id, symbol=sym_norm, sim_override=bool(sim_flag)
-                        )
-                    else:
-                        filled_qty, deal_funds = est_qty_q, est_qty_q * price
-
-                    if filled_qty <= 0.0:
-                        if callable(send_notification_tc):
-                            await send_notification_tc(
-                                "❌ Buy issue: order executed but filled size = 0.",
-                                symbol=sym_norm
-                            )
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                    qty = float(filled_qty)
-                    bought_price = float(deal_funds) / float(filled_qty)
-                    start_time = datetime.now(timezone.utc)
-
-                    # تحديث الخانة في structure
-                    if get_trade_structure and save_trade_structure:
-                        s = get_trade_structure()
-                        slots = s.get("slots") or {}
-                        cell = slots.get(str(slot_id)) or {}
-                        cell["status"] = "buy"
-                        cell["start_time"] = start_time.isoformat()
-                        cell["filled_qty"] = qty
-                        cell["bought_price"] = bought_price
-                        slots[str(slot_id)] = cell
-                        s["slots"] = slots
-                        save_trade_structure(s)
-
-                    # تحديث TRADES_FILE للشراء
-                    _update_trade_on_buy(trade_id, bought_price, qty)
-
-                    sim_tag = " (SIM)" if sim_flag else ""
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            (
-                                f"✅ Bought{sim_tag}\n"
-                                f"💰 Price: {bought_price:.6f}\n"
-                                f"📦 Qty: {qty:.6f}\n"
-                                f"💵 Amount: {amount:.2f} USDT\n"
-                                f"🔢 Track {track_num} | Slot {slot_id}"
-                            ),
-                            symbol=sym_norm
-                        )
+                    self._mark_failed()
+                except Exception:
+                    pass
+                self._release_slot()
+                return None
+            return float(MONITOR_POLL_SEC)
+        self.last_price_ok_ts = time.time()
+
+        if self.bought_price is None and price <= self.entry_price + EPS:
+            if not await self._try_buy(price):
+                return None
+
+        if self.bought_price is None:
+            return self.poll_interval(price)
+
+        # =================== بعد الشراء: إدارة الخروج ===================
+        # كمية للبيع (مع هامش صغير) + التحقق من min_base
+        if not self._qty_ok:
+            adj_qty = quantize_down(self.qty * 0.9998, self.base_inc) if callable(quantize_down) else self.qty * 0.9998
+            if adj_qty < self.min_base or adj_qty <= 0.0:
+                await self._notify("⚠️ Adjusted qty < min size. Cancel sell logic.")
+                # نعتبرها failed تقنياً، لكن نترك الخانة للتدخّل اليدوي
+                self._mark_failed()
+                return None
+            self._qty_ok = True  # الكمية ثابتة بعد الشراء → فحص واحد يكفي
+
+        targets = self.targets
+        tp1_val = self.tp1_val
+
+        # -------- TP ladder + Trailing (قرار صافٍ بدون تنفيذ) --------
+        (
+            self.highest_idx, self.trailing_armed, self.max_after_touch, self.last_tp_floor,
+            advanced, armed_now, sell_code,
+        ) = _ladder_step(
+            targets, tp1_val, self.highest_idx, self.trailing_armed,
+            self.max_after_touch, self.last_tp_floor, price,
+        )
 
-                except Exception as e:
-                    _console_echo(f"[BUY] error on {sym_norm}: {e}")
-                    if callable(send_notification_tc):
-                        await send_notification_tc(f"❌ Buy execution error: {e}", symbol=sym_norm)
-                    _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                    if callable(register_trade_outcome):
-                        register_trade_outcome(str(track_num), "failed")
-                    return
-
-            # =================== بعد الشراء: إدارة الخروج ===================
-            poll_sec = 60
-
-            if bought_price is not None:
-                # كمية للبيع (مع هامش صغير) + التحقق من min_base
-                adj_qty = quantize_down(qty * 0.9998, base_inc) if callable(quantize_down) else qty * 0.9998
-                if adj_qty < min_base or adj_qty <= 0.0:
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            "⚠️ Adjusted qty < min size. Cancel sell logic.",
-                            symbol=sym_norm
-                        )
-                    # نعتبرها failed تقنياً، لكن نترك الخانة للتدخّل اليدوي
-                    _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                    if callable(register_trade_outcome):
-                        register_trade_outcome(str(track_num), "failed")
-                    return
-
-                # -------- TP ladder (بدون بيع على الملامسة) --------
-                progressed = False
-                while (highest_idx + 1) < len(targets) and price >= float(targets[highest_idx + 1]) - EPS:
-                    highest_idx += 1
-                    progressed = True
-                    last_tp_floor = float(targets[highest_idx])
-
-                if progressed:
-                    if not trailing_armed and price >= tp1_val - EPS:
-                        # تفعيل التريلينغ عند لمس TP1
-                        trailing_armed = True
-                        max_after_touch = price
-                        last_tp_floor = max(last_tp_floor or 0.0, tp1_val)
-                        if callable(send_notification_tc):
-                            await send_notification_tc(
-                                (
-                                    "🟢 Trailing-1% ARMED (on TP1 touch).\n"
-                                    f"• TP1: {tp1_val:.6f} | Price: {price:.6f}\n"
-                                    "• Floor ≥ last TP touched"
-                                ),
-                                symbol=sym_norm
-                            )
-                    else:
-                        if trailing_armed:
-                            if max_after_touch is None or price > max_after_touch:
-                                max_after_touch = price
-                            last_tp_floor = max(last_tp_floor or 0.0, float(targets[highest_idx]))
-
-                    next_label = (
-                        f"TP{highest_idx + 2}"
-                        if (highest_idx + 1) < len(targets)
-                        else "TRAILING-ONLY"
+        if advanced:
+            if armed_now:
+                # تفعيل التريلينغ عند لمس TP1
+                _mark_trade_tp1(self.trade_id)
+                await self._notify(
+                    (
+                        "🟢 Trailing-1% ARMED (on TP1 touch).\n"
+                        f"• TP1: {tp1_val:.6f} | Price: {price:.6f}\n"
+                        "• Floor ≥ last TP touched"
                     )
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            f"➡️ {sym_norm} — Track {track_num} | Slot {slot_id} — touched TP{highest_idx+1} "
-                            f"({float(targets[highest_idx]):.6f}); moving to {next_label}.",
-                            symbol=sym_norm
+                )
+            next_label = (
+                f"TP{self.highest_idx + 2}"
+                if (self.highest_idx + 1) < len(targets)
+                else "TRAILING-ONLY"
+            )
+            await self._notify(
+                f"➡️ {sym_norm} — Track {self.track_num} | Slot {self.slot_id} — touched TP{self.highest_idx+1} "
+                f"({float(targets[self.highest_idx]):.6f}); moving to {next_label}."
+            )
+
+        # -------- Trailing logic --------
+        if self.trailing_armed:
+            try:
+                # (A) كسر الأرضية → بيع فوري
+                if sell_code == SELL_FLOOR:
+                    await self._sell_and_finalize(price, "floor break")
+                    return None
+
+                # (B) هبوط ≥1% من القمّة مع البقاء فوق الأرضية
+                elif sell_code == SELL_TRAIL:
+                    await self._sell_and_finalize(price, f"trailing {RETRACE_PERCENT:g}%")
+                    return None
+            except Exception as e:
+                _console_echo(f"[SELL] trailing error on {sym_norm}: {e}")
+                await self._notify(f"❌ Sell (trail) failed: {e}")
+                # نعتبرها failed
+                self._mark_failed()
+                return None
+
+        await self._check_sl_alert()
+        return self.poll_interval(price)
+
+    async def hold(self, price: float) -> Optional[float]:
+        """
+        مسار سريع مكافئ لـ step(price) عندما لا يقع أي حدث
+        (لا شراء / لا TP / لا تفعيل / لا بيع) — يقرّره ThresholdIndex.is_quiet.
+        """
+        if self.bought_price is not None and not self._qty_ok:
+            return await self.step(price)
+        self.last_price_ok_ts = time.time()
+        if self.bought_price is None:
+            return self.poll_interval(price)
+        if self.trailing_armed:
+            if self.max_after_touch is None or price > self.max_after_touch:
+                self.max_after_touch = price
+        await self._check_sl_alert()
+        return self.poll_interval(price)
+
+    def poll_interval(self, price: float) -> float:
+        """
+        فاصل الفحص التالي: خطّي بين MONITOR_POLL_MIN_SEC (السعر على العتبة)
+        و MONITOR_POLL_MAX_SEC (المسافة ≥ MONITOR_POLL_FAR_PCT%) حسب المسافة لأقرب حد من band().
+        """
+        lo_sec, hi_sec = MONITOR_POLL_MIN_SEC, max(MONITOR_POLL_MIN_SEC, MONITOR_POLL_MAX_SEC)
+        lo, hi = self.band()
+        dist = min(
+            (price - lo) if lo != float("-inf") else float("inf"),
+            (hi - price) if hi != float("inf") else float("inf"),
+        )
+        if dist == float("inf"):
+            pct = float("inf")
+        else:
+            pct = max(0.0, dist) / price * 100.0 if price > 0 else 0.0
+        frac = min(1.0, pct / MONITOR_POLL_FAR_PCT) if MONITOR_POLL_FAR_PCT > 0 else 1.0
+        sec = lo_sec + (hi_sec - lo_sec) * frac
+
+        # تسجيل الإيقاع الفعلي عند تغيّره بوضوح (×1.5) للمعايرة
+        prev = self.poll_sec
+        if prev is None or sec > prev * 1.5 or sec < prev / 1.5:
+            away = "∞" if pct == float("inf") else f"{pct:.2f}%"
+            _console_echo(
+                f"[POLL] {self.sym_norm} T{self.track_num}/S{self.slot_id}: cadence {sec:.1f}s "
+                f"(next level {away} away)"
+            )
+            self.poll_sec = sec
+        return sec
+
+    async def _check_sl_alert(self) -> None:
+        # -------- SL: إشعار فقط بدون بيع --------
+        if not self.sl_alerted and self.start_time is not None and callable(get_latest_candle) and callable(_interval_to_ms):
+            # جلب الشمعة خارج الـ event loop (عبر KuCoin gateway إن وُجد)
+            if asyncio.iscoroutinefunction(get_latest_candle):
+                candle = await get_latest_candle(self.sym_norm, interval="1hour")
+            elif callable(kc_call_async):
+                candle = await kc_call_async(get_latest_candle, self.sym_norm, interval="1hour")
+            else:
+                candle = await asyncio.to_thread(get_latest_candle, self.sym_norm, interval="1hour")
+            now_ms = datetime.now(timezone.utc).timestamp() * 1000.0
+            if candle:
+                interval_ms = _interval_to_ms("1hour")
+                candle_start_ms = float(candle["timestamp"])
+                candle_end_ms = candle_start_ms + interval_ms
+                trade_start_ms = self.start_time.timestamp() * 1000.0
+                if (
+                    candle_end_ms <= now_ms
+                    and candle_end_ms > trade_start_ms
+                    and candle["close"] <= float(self.sl_price) + EPS
+                ):
+                    self.sl_alerted = True
+                    await self._notify(
+                        (
+                            "🛑 SL touched (no sell).\n"
+                            "➡️ Continuing to monitor for TP1/targets."
                         )
+                    )
+
+    async def fail(self, e: Exception) -> None:
+        """أي انهيار غير متوقَّع نعتبر الصفقة failed (مع ترك slot للتدخل اليدوي إذا لزم)."""
+        _console_echo(f"[MONITOR] error on {self.sym_norm}: {e}")
+        await self._notify(f"⚠️ Monitor failed: {e}")
+        self._mark_failed()
+
+
+# ============================================
+# ThresholdIndex — فهرس عتبات مرتّب لكل رمز
+# ============================================
+
+class ThresholdIndex:
+    """
+    كل خانة تسجّل نطاقها الهادئ (lo, hi) من SlotMonitor.band():
+      - السعر <= lo  → حدث (شراء / كسر أرضية / trailing trigger).
+      - السعر >= hi  → حدث (TP التالي / قمّة جديدة بعد التفعيل).
+    لكل رمز قائمتان مرتّبتان (bisect) → tick يزور فقط الخانات التي عبر عتباتها:
+    O(log n + عدد الأحداث) بدل O(عدد الخانات المفتوحة).
+    """
+
+    def __init__(self) -> None:
+        self._bands: Dict[str, Tuple[str, float, float]] = {}
+        self._lows: Dict[str, List[Tuple[float, str]]] = {}
+        self._highs: Dict[str, List[Tuple[float, str]]] = {}
+        self.lookups = 0
+        self.visits = 0
+
+    def __len__(self) -> int:
+        return len(self._bands)
+
+    def register(self, key: str, sym_norm: str, lo: float, hi: float) -> bool:
+        """(إعادة) تسجيل نطاق الخانة بعد أي تغيّر في حالتها. يرجّع True إذا تغيّر النطاق."""
+        old = self._bands.get(key)
+        if old == (sym_norm, lo, hi):
+            return False
+        if old is not None:
+            self.remove(key)
+        self._bands[key] = (sym_norm, lo, hi)
+        if lo != float("-inf"):
+            bisect.insort(self._lows.setdefault(sym_norm, []), (lo, key))
+        if hi != float("inf"):
+            bisect.insort(self._highs.setdefault(sym_norm, []), (hi, key))
+        return True
+
+    def remove(self, key: str) -> None:
+        old = self._bands.pop(key, None)
+        if old is None:
+            return
+        sym_norm, lo, hi = old
+        for book, level in ((self._lows, lo), (self._highs, hi)):
+            arr = book.get(sym_norm)
+            if not arr:
+                continue
+            i = bisect.bisect_left(arr, (level, key))
+            if i < len(arr) and arr[i] == (level, key):
+                del arr[i]
+            if not arr:
+                book.pop(sym_norm, None)
+
+    def crossed(self, sym_norm: str, price: float) -> List[str]:
+        """مفاتيح الخانات التي خرج السعر عن نطاقها الهادئ."""
+        self.lookups += 1
+        out: List[str] = []
+        lows = self._lows.get(sym_norm)
+        if lows:
+            i = bisect.bisect_left(lows, (price, ""))
+            out.extend(key for _, key in lows[i:])
+        highs = self._highs.get(sym_norm)
+        if highs:
+            j = bisect.bisect_right(highs, (price, "\uffff"))
+            out.extend(key for _, key in highs[:j])
+        self.visits += len(out)
+        return out
+
+    def is_quiet(self, key: str, price: Optional[float]) -> bool:
+        band = self._bands.get(key)
+        if band is None or price is None:
+            return False
+        return band[1] < price < band[2]
 
-                # -------- Trailing logic --------
-                if trailing_armed:
-                    poll_sec = 10  # بعد التفعيل نراقب بسرعة أعلى
 
-                    # تحديث القمّة
-                    if max_after_touch is None or price > max_after_touch:
-                        max_after_touch = price
+# ============================================
+# MonitorScheduler — مُجدول مركزي لكل الخانات
+# ============================================
 
-                    enforced_floor = max(float(last_tp_floor or 0.0), tp1_val)
-                    raw_trigger = (max_after_touch or price) * (1.0 - RETRACE_PERCENT / 100.0)
+class MonitorScheduler:
+    """
+    بدل task نائمة لكل Slot:
+      - كل الخانات في priority queue (heapq) مرتبة بوقت الفحص التالي.
+      - الحلقة تسحب الخانات المستحقة فقط وتطلق دورة (task) لها ثم تعود فوراً لـ _wake:
+          • قراءة structure مرة واحدة للحارس المبكر.
+          • جلب سعر واحد لكل رمز (مهما كان عدد الخانات عليه).
+          • كل خانة step/hold في task مستقلة (بحد MONITOR_MAX_INFLIGHT)، فانتظار تنفيذ أمر
+            أو إشعار بطيء لخانة لا يؤخّر باقي الخانات.
+      - خانة ما زالت قيد التقييم (in-flight) تُتخطّى بدل إعادة جدولتها؛ تجدول نفسها عند الانتهاء.
+      - tick من الـ WebSocket feed يقدّم موعد الخانات التي عبر السعر عتباتها فقط
+        (ThresholdIndex، بحد أدنى TICK_MIN_GAP_SEC)؛ الباقي يبقى على موعده الدوري.
+    """
 
+    def __init__(self) -> None:
+        self._monitors: Dict[str, SlotMonitor] = {}
+        self._by_symbol: Dict[str, Set[str]] = {}
+        self._due: Dict[str, float] = {}
+        self._last_eval: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, SlotMonitor] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._feed_hooked = False
+        self._index = ThresholdIndex()
+        self.passes = 0
+        self.evaluations = 0
+        self.price_lookups = 0
+        self.quiet_rows = 0
+        self.busy_skips = 0
+        self.ticks = 0
+
+    def __len__(self) -> int:
+        return len(self._monitors)
+
+    def _push(self, key: str, due_ts: float) -> None:
+        self._seq += 1
+        self._due[key] = due_ts
+        heapq.heappush(self._heap, (due_ts, self._seq, key))
+
+    def _ensure_running(self) -> None:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(max(1, MONITOR_MAX_INFLIGHT))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        feed = _price_feed()
+        if feed is not None and not self._feed_hooked:
+            feed.add_listener(self._on_tick)
+            self._feed_hooked = True
+
+    async def add(self, mon: SlotMonitor) -> asyncio.Future:
+        """تسجيل خانة جديدة (setup ثم أول فحص فوراً). يرجّع Future ينتهي بانتهاء المراقبة."""
+        mon.done = asyncio.get_running_loop().create_future()
+        old = self._monitors.get(mon.key)
+        if old is not None:
+            self._remove(old)
+        if not await mon.setup():
+            mon.done.set_result(None)
+            return mon.done
+
+        self._monitors[mon.key] = mon
+        self._by_symbol.setdefault(mon.sym_norm, set()).add(mon.key)
+        self._index.register(mon.key, mon.sym_norm, *mon.band())
+        feed = _price_feed()
+        if feed is not None:
+            feed.subscribe(mon.sym_norm)
+        self._ensure_running()
+        self._push(mon.key, time.time())
+        self._wake.set()
+        return mon.done
+
+    def _remove(self, mon: SlotMonitor) -> None:
+        if self._monitors.get(mon.key) is not mon:
+            return
+        self._monitors.pop(mon.key, None)
+        self._due.pop(mon.key, None)
+        self._last_eval.pop(mon.key, None)
+        self._index.remove(mon.key)
+        keys = self._by_symbol.get(mon.sym_norm)
+        if keys is not None:
+            keys.discard(mon.key)
+            if not keys:
+                self._by_symbol.pop(mon.sym_norm, None)
+        feed = _price_feed()
+        if feed is not None:
+            feed.unsubscribe(mon.sym_norm)
+        if mon.done is not None and not mon.done.done():
+            mon.done.set_result(None)
+
+    def _on_tick(self, sym_norm: str, price: float) -> None:
+        """listener للـ feed: قدّم موعد الخانات التي عبر السعر عتباتها فقط."""
+        self.ticks += 1
+        if sym_norm not in self._by_symbol:
+            return
+        keys = self._index.crossed(sym_norm, price)
+        if not keys:
+            return
+        now = time.time()
+        woke = False
+        for key in keys:
+            due = self._due.get(key)
+            soon = max(now, self._last_eval.get(key, 0.0) + TICK_MIN_GAP_SEC)
+            if due is None or soon < due:
+                self._push(key, soon)
+                woke = True
+        if woke and self._wake is not None:
+            self._wake.set()
+
+    def _pop_due(self, now: float) -> List[str]:
+        due_keys: List[str] = []
+        seen: Set[str] = set()
+        while self._heap and self._heap[0][0] <= now:
+            due_ts, _, key = heapq.heappop(self._heap)
+            if key in seen or self._due.get(key) != due_ts:
+                continue  # مدخل قديم (أعيدت جدولته)
+            seen.add(key)
+            due_keys.append(key)
+        return due_keys
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = time.time()
+                due_keys = self._pop_due(now)
+                if not due_keys:
+                    timeout = (self._heap[0][0] - now) if self._heap else None
+                    self._wake.clear()
                     try:
-                        # (A) كسر الأرضية → بيع فوري
-                        if price < enforced_floor - EPS:
-                            sell_price, sell_qty, pnl_usdt, pnl_pct = await _do_market_sell(exec_price_hint=price)
-                            res = classify_pnl(float(bought_price), float(sell_price)) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
-                            final_status = (res.get("status") or "drwn").lower()
-                            await _finalize_and_cleanup(final_status, sell_price, sell_qty, pnl_usdt, res.get("pct", pnl_pct))
-                            break
-
-                        # (B) هبوط ≥1% من القمّة مع البقاء فوق الأرضية
-                        elif price <= raw_trigger + EPS and price >= enforced_floor - EPS:
-                            sell_price, sell_qty, pnl_usdt, pnl_pct = await _do_market_sell(exec_price_hint=price)
-                            res = classify_pnl(float(bought_price), float(sell_price)) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
-                            final_status = (res.get("status") or "drwn").lower()
-                            await _finalize_and_cleanup(final_status, sell_price, sell_qty, pnl_usdt, res.get("pct", pnl_pct))
-                            break
-                    except Exception as e:
-                        _console_echo(f"[SELL] trailing error on {sym_norm}: {e}")
-                        if callable(send_notification_tc):
-                            await send_notification_tc(
-                                f"❌ Sell (trail) failed: {e}",
-                                symbol=sym_norm
-                            )
-                        # نعتبرها failed
-                        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-                        if callable(register_trade_outcome):
-                            register_trade_outcome(str(track_num), "failed")
-                        return
-
-                # -------- SL: إشعار فقط بدون بيع --------
-                if not sl_alerted and start_time is not None and callable(get_latest_candle) and callable(_interval_to_ms):
-                    candle = get_latest_candle(sym_norm, interval="1hour")
-                    now_ms = datetime.now(timezone.utc).timestamp() * 1000.0
-                    if candle:
-                        interval_ms = _interval_to_ms("1hour")
-                        candle_start_ms = float(candle["timestamp"])
-                        candle_end_ms = candle_start_ms + interval_ms
-                        trade_start_ms = start_time.timestamp() * 1000.0
-                        if (
-                            candle_end_ms <= now_ms
-                            and candle_end_ms > trade_start_ms
-                            and candle["close"] <= float(sl_price) + EPS
-                        ):
-                            sl_alerted = True
-                            if callable(send_notification_tc):
-                                await send_notification_tc(
-                                    (
-                                        "🛑 SL touched (no sell).\n"
-                                        "➡️ Continuing to monitor for TP1/targets."
-                                    ),
-                                    symbol=sym_norm
-                                )
-
-            await asyncio.sleep(poll_sec)
+                        await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._dispatch(due_keys)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _console_echo(f"[SCHED] pass error: {e}")
+                await asyncio.sleep(1)
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _dispatch(self, due_keys: List[str]) -> None:
+        """متزامنة: حارس is_active + تخطّي الخانات in-flight، ثم دورة في task منفصلة."""
+        structure = None
+        try:
+            structure = _structure_view()  # قراءة فقط: حارس is_active
+        except Exception:
+            structure = None
 
-    except Exception as e:
-        _console_echo(f"[MONITOR] error on {sym_norm}: {e}")
-        if callable(send_notification_tc):
-            await send_notification_tc(
-                f"⚠️ Monitor failed: {e}",
-                symbol=sym_norm
+        batch: List[SlotMonitor] = []
+        for key in due_keys:
+            mon = self._monitors.get(key)
+            if mon is None:
+                continue
+            self._due.pop(key, None)
+            if self._inflight.get(key) is mon:
+                self.busy_skips += 1  # قيد التقييم؛ ستجدول نفسها عند الانتهاء
+                continue
+            if not mon.is_active(structure):
+                self._remove(mon)
+                continue
+            self._inflight[key] = mon
+            batch.append(mon)
+        if batch:
+            self._spawn(self._run_pass(batch))
+
+    async def _run_pass(self, batch: List[SlotMonitor]) -> None:
+        self.passes += 1
+        prices: Dict[str, Optional[float]] = {}
+        quiet: Set[str] = set()
+        try:
+            symbols = sorted({m.sym_norm for m in batch})
+            self.price_lookups += len(symbols)
+            fetched = await asyncio.gather(
+                *(fetch_current_price(sym) for sym in symbols), return_exceptions=True
             )
-        # في أي انهيار غير متوقَّع نعتبر الصفقة failed (مع ترك slot للتدخل اليدوي إذا لزم)
-        _finalize_trade_record(trade_id, "failed", 0.0, 0.0, 0.0, 0.0)
-        if callable(register_trade_outcome):
-            register_trade_outcome(str(track_num), "failed")
+            prices = {
+                sym: (None if isinstance(p, BaseException) else p) for sym, p in zip(symbols, fetched)
+            }
+            # الخانات الهادئة (بدون شراء/TP/بيع) تأخذ المسار الخفيف hold(): نطاق ThresholdIndex (O(1) لكل خانة)
+            quiet = {m.key for m in batch if self._index.is_quiet(m.key, prices.get(m.sym_norm))}
+            self.quiet_rows += len(quiet)
+        except Exception as e:
+            _console_echo(f"[SCHED] price fetch error: {e}")
+        for mon in batch:
+            self._spawn(self._one(mon, prices.get(mon.sym_norm), mon.key in quiet))
+
+    async def _one(self, mon: SlotMonitor, price: Optional[float], quiet: bool) -> None:
+        async with self._sem:
+            try:
+                if quiet:
+                    next_sec = await mon.hold(price)
+                else:
+                    next_sec = await mon.step(price)
+            except Exception as e:
+                await mon.fail(e)
+                next_sec = None
+        if self._inflight.get(mon.key) is mon:
+            self._inflight.pop(mon.key, None)
+        self.evaluations += 1
+        if next_sec is None:
+            self._remove(mon)
+            return
+        if self._monitors.get(mon.key) is mon:
+            self._index.register(mon.key, mon.sym_norm, *mon.band())
+        if self._monitors.get(mon.key) is mon and mon.key not in self._due:
+            now = time.time()
+            self._last_eval[mon.key] = now
+            self._push(mon.key, now + float(next_sec))
+        if self._wake is not None:
+            self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": len(self._monitors),
+            "symbols": len(self._by_symbol),
+            "passes": self.passes,
+            "evaluations": self.evaluations,
+            "price_lookups": self.price_lookups,
+            "quiet_rows": self.quiet_rows,
+            "inflight": len(self._inflight),
+            "busy_skips": self.busy_skips,
+            "indexed": len(self._index),
+            "ticks": self.ticks,
+            "tick_visits": self._index.visits,
+            "avg_cadence_sec": round(
+                sum(m.poll_sec or 0.0 for m in self._monitors.values()) / len(self._monitors), 1
+            ) if self._monitors else None,
+        }
+
+_MONITOR_SCHEDULER = MonitorScheduler()
+
+def get_monitor_scheduler() -> MonitorScheduler:
+    return _MONITOR_SCHEDULER
+
+
+async def start_monitor(
+    symbol: str,
+    entry_price: float,
+    sl_price: float,
+    targets: List[float],
+    amount: float,
+    track_num: int,
+    slot_id: str,
+    trade_id: int,
+) -> asyncio.Future:
+    """تسجيل خانة في المُجدول المركزي بدون إنشاء task خاصة بها."""
+    mon = SlotMonitor(symbol, entry_price, sl_price, targets, amount, track_num, slot_id, trade_id)
+    return await _MONITOR_SCHEDULER.add(mon)
+
+
+# ============================================
+# monitor_and_execute
+# ============================================
+
+async def monitor_and_execute(
+    symbol: str,
+    entry_price: float,
+    sl_price: float,
+    targets: List[float],
+    amount: float,
+    track_num: int,
+    slot_id: str,
+    trade_id: int,
+):
+    """
+    واجهة التوافق القديمة: تسجّل الخانة في MonitorScheduler
+    وتنتظر حتى تنتهي مراقبتها (منطق المراقبة نفسه في SlotMonitor).
+    """
+    done = await start_monitor(
+        symbol, entry_price, sl_price, targets, amount, track_num, slot_id, trade_id
+    )
+    await done
@@ -6,6 +6,7 @@
 #  - Status:
 #       • status        → حالة البوت + الصفقات + إحصائيات
 #       • summary       → ملخّص الربح/الخسارة الإجمالي
+#       • stats [فلاتر] → تحليلات كل التاريخ (win rate / percentiles / hold / TP1 / رموز / مسارات)
 #       • track         → ملخص كل المسارات
 #       • track <n>     → تفاصيل مسار واحد
 #       • verlauf       → سجل كامل لكل الصفقات (TRADES_FILE)
@@ -24,8 +25,11 @@
 #       • debug funds on/off/<N>m
 # ============================================
 
+import io
+import heapq
 import os
 import re
+import csv
 import json
 import time
 import asyncio
@@ -43,8 +47,32 @@ TRADES_FILE = globals().get("TRADES_FILE", "trades.json")
 SUMMARY_FILE = globals().get("SUMMARY_FILE", "summary.json")
 TERMINAL_LOG_FILE = globals().get("TERMINAL_LOG_FILE", "terminal_notices.json")
 
+# ===== PersistenceWorker (Section 2): كتابة ملفات الحالة خارج الـ event loop =====
+persist_json = globals().get("persist_json")
+persist_read_json = globals().get("persist_read_json")
+get_persistence_worker = globals().get("get_persistence_worker")
+
+
+def _read_state_json(path: str, default: Any) -> Any:
+    if callable(persist_read_json):
+        return persist_read_json(path, default)
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_state_json(path: str, data: Any) -> None:
+    if callable(persist_json):
+        persist_json(path, data)
+        return
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
 # ===== Telegram message splitter =====
 TELEGRAM_MSG_LIMIT = 4000  # حد آمن لرسائل تيليجرام
+# فوق هذا الحجم (أحرف) يُرسل التقرير كملف مرفق واحد بدل أجزاء متعددة (0 = تعطيل)
+REPORT_DOCUMENT_THRESHOLD = int(globals().get("REPORT_DOCUMENT_THRESHOLD", 3 * TELEGRAM_MSG_LIMIT))
 
 # ===== console_echo alias =====
 try:
@@ -62,12 +90,20 @@ _console_echo = console_echo
 # ===== دوال إشعارات عامة (من Section 1) =====
 send_notification = globals().get("send_notification")
 send_notification_tc = globals().get("send_notification_tc")
+send_document = globals().get("send_document")
 
 # ===== Helpers عامة من الأقسام السابقة =====
 get_trade_structure = globals().get("get_trade_structure")
 save_trade_structure = globals().get("save_trade_structure")
+get_structure_manager = globals().get("get_structure_manager")
 normalize_symbol = globals().get("normalize_symbol") or (lambda s: (s or "").upper().replace('-', '').replace('/', ''))
 fetch_current_price = globals().get("fetch_current_price")
+get_price_cache = globals().get("get_price_cache")
+get_price_board = globals().get("get_price_board")
+get_trade_store = globals().get("get_trade_store") or globals().get("get_trade_journal")
+get_kucoin_governor = globals().get("get_kucoin_governor")
+kc_priority = globals().get("kc_priority")
+KC_PRIO_REPORT = globals().get("KC_PRIO_REPORT", 4)
 
 is_email_gate_open = globals().get("is_email_gate_open")
 set_email_gate = globals().get("set_email_gate")
@@ -86,6 +122,10 @@ is_debug_funds = globals().get("is_debug_funds")
 
 classify_pnl = globals().get("classify_pnl")
 register_trade_outcome = globals().get("register_trade_outcome")
+accumulate_summary = globals().get("accumulate_summary")
+get_pnl_rollup = globals().get("get_pnl_rollup")
+get_status_snapshot = globals().get("get_status_snapshot")
+get_trade_columns = globals().get("get_trade_columns")
 
 handle_risk_command = globals().get("handle_risk_command")
 
@@ -95,6 +135,7 @@ get_symbol_meta = globals().get("get_symbol_meta")
 get_trade_balance_usdt = globals().get("get_trade_balance_usdt")
 place_market_order = globals().get("place_market_order")
 get_order_deal_size = globals().get("get_order_deal_size")
+wait_order_fill = globals().get("wait_order_fill") or get_order_deal_size
 is_simulation = globals().get("is_simulation")
 
 # نفس الثوابت من Section 2/4
@@ -105,26 +146,97 @@ MAX_TRACKS = int(globals().get("MAX_TRACKS", 10))
 COMMAND_CHAT = globals().get("COMMAND_CHAT", "Mohamad4992")
 CHANNEL_USERNAME = globals().get("CHANNEL_USERNAME", "")
 
+# ===== أسعار التقارير (أدنى أولوية في KuCoin governor) =====
+async def _report_price(sym: str) -> Optional[float]:
+    """جلب سعر لعرضه في تقرير: لا يزاحم أوامر البيع/الشراء ولا أسعار المراقبة."""
+    if not callable(fetch_current_price):
+        return None
+    if callable(kc_priority):
+        with kc_priority(KC_PRIO_REPORT):
+            return await fetch_current_price(sym)
+    return await fetch_current_price(sym)
+
+async def _report_prices(symbols: List[str]) -> Dict[str, Optional[float]]:
+    """أسعار عدة رموز لتقرير واحد: بالتوازي مع حد + مهلة كلية (fetch_prices_bounded)."""
+    fetch_prices_bounded = globals().get("fetch_prices_bounded")
+    if callable(fetch_prices_bounded):
+        return await fetch_prices_bounded(symbols, prio=KC_PRIO_REPORT)
+    out: Dict[str, Optional[float]] = {}
+    for sym in dict.fromkeys(normalize_symbol(s) for s in symbols if s):
+        try:
+            out[sym] = await _report_price(sym)
+        except Exception:
+            out[sym] = None
+    return out
+
 # ========= دوال مساعدة للرسائل الطويلة =========
-async def _send_long_message(text: str, part_title: str = None, limit: int = TELEGRAM_MSG_LIMIT):
+def _split_message(text: str, limit: int = TELEGRAM_MSG_LIMIT) -> List[str]:
+    """
+    تقسيم على حدود الأسطر في وقت خطي: نجمع الأسطر في list ونعمل join مرة لكل جزء
+    (بدل chunk += line المتكرر). السطر الأطول من limit يُقطع قطعاً.
+    """
+    parts: List[str] = []
+    buf: List[str] = []
+    size = 0
+    for line in text.splitlines(True):
+        while len(line) > limit:
+            if buf:
+                parts.append("".join(buf).rstrip())
+                buf, size = [], 0
+            parts.append(line[:limit])
+            line = line[limit:]
+        if size + len(line) > limit and buf:
+            parts.append("".join(buf).rstrip())
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line)
+    if buf:
+        parts.append("".join(buf).rstrip())
+    return [p for p in parts if p]
+
+def _report_filename(part_title: Optional[str], ext: str = "txt") -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", (part_title or "report").lower()).strip("_") or "report"
+    return f"{slug}_{datetime.now(_berlin_tz()).strftime('%Y%m%d_%H%M')}.{ext}"
+
+async def _send_report_document(
+    data: Any, filename: str, caption: str = ""
+) -> bool:
+    """ملف مرفق عبر send_document من Section 2؛ False → المستدعي يرجع للرسائل."""
+    if not callable(send_document):
+        return False
+    try:
+        return bool(await send_document(data, filename, caption=caption))
+    except Exception as e:
+        _console_echo(f"[REPORT] document send failed: {e}")
+        return False
+
+async def _send_long_message(
+    text: str,
+    part_title: str = None,
+    limit: int = TELEGRAM_MSG_LIMIT,
+    as_document: Optional[bool] = None,
+):
+    """
+    رسالة واحدة إن كانت قصيرة؛ فوق REPORT_DOCUMENT_THRESHOLD ملف .txt واحد
+    (as_document=True يفرض الملف، False يمنعه)؛ وإلا أجزاء مرقّمة.
+    """
     if text is None:
         return
-    if len(text) <= limit:
+    if len(text) <= limit and not as_document:
         if callable(send_notification):
             await send_notification(text)
         _console_echo(text)
         return
 
-    parts, chunk = [], ""
-    for line in text.splitlines(True):
-        if len(chunk) + len(line) > limit:
-            parts.append(chunk.rstrip())
-            chunk = line
-        else:
-            chunk += line
-    if chunk:
-        parts.append(chunk.rstrip())
+    if as_document is None:
+        as_document = bool(REPORT_DOCUMENT_THRESHOLD) and len(text) > REPORT_DOCUMENT_THRESHOLD
+    if as_document:
+        first_line = text.lstrip().split("\n", 1)[0][:200]
+        caption = f"{part_title or first_line} — {text.count(chr(10)) + 1} lines"
+        if await _send_report_document(text, _report_filename(part_title), caption=caption):
+            return
 
+    parts = _split_message(text, limit)
     total = len(parts)
     title_prefix = (part_title + " — ") if part_title else ""
     for i, p in enumerate(parts, 1):
@@ -134,52 +246,58 @@ async def _send_long_message(text: str, part_title: str = None, limit: int = TEL
             await send_notification(msg)
         _console_echo(msg)
 
-# ===== Summary accumulation (PnL) =====
-def accumulate_summary(profit_delta: float = 0.0, loss_delta: float = 0.0) -> None:
+# ===== Summary (PnL rollup من Section 2) =====
+def _fmt_hold(sec: float) -> str:
     try:
-        data = {"total_profit": 0.0, "total_loss": 0.0, "net": 0.0}
-        if os.path.exists(SUMMARY_FILE):
-            try:
-                with open(SUMMARY_FILE, "r") as f:
-                    loaded = json.load(f)
-                data["total_profit"] = float(loaded.get("total_profit", 0.0) or 0.0)
-                data["total_loss"] = float(loaded.get("total_loss", 0.0) or 0.0)
-            except Exception:
-                pass
-
-        if profit_delta and profit_delta > 0:
-            data["total_profit"] += float(profit_delta)
-        if loss_delta and loss_delta > 0:
-            data["total_loss"] += float(loss_delta)
+        sec = int(sec)
+        if sec <= 0:
+            return "—"
+        d, rem = divmod(sec, 86400)
+        h, rem = divmod(rem, 3600)
+        return f"{d}d {h}h" if d else f"{h}h {rem // 60}m"
+    except Exception:
+        return "—"
 
-        data["net"] = data["total_profit"] - data["total_loss"]
-        with open(SUMMARY_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"⚠️ accumulate_summary error: {e}")
+def _fmt_rollup_line(label: str, v: Dict[str, Any]) -> str:
+    return (
+        f"• {label}: {v['net']:+.2f} USDT ({v['count']} trades"
+        + (f", win {v['win_rate']:.0f}%" if v["count"] else "")
+        + ")"
+    )
 
 async def show_trade_summary():
-    summary = {"total_profit": 0.0, "total_loss": 0.0, "net": 0.0}
+    if not callable(get_pnl_rollup):
+        if callable(send_notification):
+            await send_notification("⚠️ Summary not available in this setup.")
+        return
     try:
-        if os.path.exists(SUMMARY_FILE):
-            with open(SUMMARY_FILE, "r") as f:
-                loaded = json.load(f)
-            summary["total_profit"] = float(loaded.get("total_profit", 0.0) or 0.0)
-            summary["total_loss"] = float(loaded.get("total_loss", 0.0) or 0.0)
-        else:
-            with open(SUMMARY_FILE, "w") as f:
-                json.dump(summary, f, indent=2)
+        rollup = get_pnl_rollup()
+        tot = rollup.total()
+        st = tot["status"]
+        lines = [
+            "📊 Profit & Loss Summary:",
+            f"💰 Total Profit: {tot['profit']:.2f} USDT",
+            f"📉 Total Loss: {tot['loss']:.2f} USDT",
+            f"📊 Net profit : {tot['net']:.2f} USDT",
+            f"🎯 Win rate: {tot['win_rate']:.1f}% | ⏱ Avg hold: {_fmt_hold(tot['avg_hold_sec'])}",
+            f"🏆 TP: {st.get('closed', 0)} | ❌ SL: {st.get('stopped', 0)} | "
+            f"📉 DRWDN: {st.get('drwn', 0)} | ⚠️ Failed: {st.get('failed', 0)}",
+            "",
+            _fmt_rollup_line("Today (Berlin)", rollup.day(tz="berlin")),
+            _fmt_rollup_line("Today (UTC)", rollup.day(tz="utc")),
+        ]
+        days = rollup.keys("day_berlin")[-7:]
+        if days:
+            lines.extend(["", "📆 Last days (Berlin):"])
+            lines.extend(_fmt_rollup_line(d, rollup.day(d, tz="berlin")) for d in reversed(days))
+        tracks = sorted(rollup.keys("track"), key=lambda k: int(k) if k.isdigit() else 0)
+        if tracks:
+            lines.extend(["", "🛤 By track:"])
+            lines.extend(_fmt_rollup_line(f"Track {t}", rollup.track(t)) for t in tracks)
+        await _send_long_message("\n".join(lines), part_title="📊 Summary")
     except Exception as e:
         if callable(send_notification):
             await send_notification(f"⚠️ Summary read error: {e}")
-    summary["net"] = summary["total_profit"] - summary["total_loss"]
-    if callable(send_notification):
-        await send_notification(
-            "📊 Profit & Loss Summary:\n"
-            f"💰 Total Profit: {summary['total_profit']:.2f} USDT\n"
-            f"📉 Total Loss: {summary['total_loss']:.2f} USDT\n"
-            f"📊 Net profit : {summary['net']:.2f} USDT"
-        )
 
 # ===== Berlin timezone helpers =====
 def _berlin_tz():
@@ -223,6 +341,12 @@ _STATUS_INDEX_MAP: Dict[int, Tuple[str, int, str]] = {}
 _STATUS_REV_INDEX_MAP: Dict[Tuple[str, int, str], int] = {}
 
 def _load_trades_cache() -> List[Dict[str, Any]]:
+    """السجل الحالي من مخزن الصفقات (journal أو SQLite)، مع fallback لقراءة الملف."""
+    if callable(get_trade_store):
+        try:
+            return get_trade_store().trades()
+        except Exception:
+            pass
     if not os.path.exists(TRADES_FILE):
         return []
     try:
@@ -232,7 +356,37 @@ def _load_trades_cache() -> List[Dict[str, Any]]:
     except Exception:
         return []
 
-def _find_latest_trade_for_slot(trades: List[Dict[str, Any]], sym: str, track_num: int, slot_id: str) -> Optional[Dict[str, Any]]:
+def _load_all_trades() -> List[Dict[str, Any]]:
+    """كل التاريخ عبر الطبقتين (أرشيف شهري + ساخن) — للتقارير فقط، ليس للمحرّك."""
+    load_all_trades = globals().get("load_all_trades")
+    if callable(load_all_trades):
+        try:
+            return load_all_trades()
+        except Exception as e:
+            _console_echo(f"[TRADES] archive read error: {e}")
+    return _load_trades_cache()
+
+def _journal_patch(trade_id: int, fields: Dict[str, Any], op: str) -> None:
+    """تعديل صفقة عبر حدث في الـ journal (بدل إعادة كتابة TRADES_FILE)."""
+    try:
+        if callable(get_trade_store):
+            get_trade_store().patch(int(trade_id), fields, op=op)
+    except Exception as e:
+        _console_echo(f"[TRADES] journal patch error: {e}")
+
+def _find_latest_trade_for_slot(trades: Optional[List[Dict[str, Any]]], sym: str, track_num: int, slot_id: str) -> Optional[Dict[str, Any]]:
+    """
+    أحدث صفقة للخانة: فهرس (symbol, track_num, slot_id) في المخزن إن وُجد (O(1))،
+    وإلا مسح trades (None → السجل الساخن الحالي).
+    """
+    store = get_trade_store() if callable(get_trade_store) else None
+    if getattr(store, "indexed", False):
+        try:
+            return store.latest_for_slot(sym, int(track_num), str(slot_id))
+        except Exception:
+            pass
+    if trades is None:
+        trades = _load_trades_cache()
     sym_norm = normalize_symbol(sym)
     latest = None
     latest_ts = -1.0
@@ -257,12 +411,17 @@ def _rebuild_status_index_map():
     _STATUS_INDEX_MAP = {}
     _STATUS_REV_INDEX_MAP = {}
 
+    if callable(get_status_snapshot):
+        _STATUS_INDEX_MAP = get_status_snapshot().get()["index_map"]
+        _STATUS_REV_INDEX_MAP = {key: idx for idx, key in _STATUS_INDEX_MAP.items()}
+        return
+
     if not callable(get_trade_structure):
         return
 
     structure = get_trade_structure()
     slots = structure.get("slots") or {}
-    trades = _load_trades_cache()
+    trades = None  # البحث عبر فهرس الخانات في المخزن (O(slots))
 
     open_list: List[Tuple[str, int, str, float]] = []  # (sym, track, slot, opened_ts)
     buy_list: List[Tuple[str, int, str, float]] = []   # (sym, track, slot, opened_ts)
@@ -301,105 +460,62 @@ def _rebuild_status_index_map():
 
 # ============ STATUS (global) ============
 async def show_bot_status():
-    if not callable(get_trade_structure):
+    if not callable(get_status_snapshot):
         if callable(send_notification):
-            await send_notification("❌ Internal error: trade structure helpers not available.")
+            await send_notification("❌ Internal error: status snapshot not available.")
         return
 
-    today = date.today().isoformat()
-    structure = get_trade_structure()
-    slots = structure.get("slots") or {}
-    cycle_slots = int(structure.get("cycle_slots", CYCLE_SLOTS_DEFAULT))
-
-    trades = _load_trades_cache()
-
-    # ---- Counters من TRADES_FILE ----
-    total_overall = len(trades)
-    overall_tp       = sum(1 for tr in trades if (tr.get("status") or "").lower() == "closed")
-    overall_sl       = sum(1 for tr in trades if (tr.get("status") or "").lower() == "stopped")
-    overall_drawdown = sum(1 for tr in trades if (tr.get("status") or "").lower() == "drwn")
-    overall_failed   = sum(1 for tr in trades if (tr.get("status") or "").lower() == "failed")
-
-    latest_opened_date: Dict[str, str] = {}
-    for tr in trades:
-        sym = normalize_symbol(tr.get("symbol"))
-        if not sym:
-            continue
-        d = _safe_ts_to_datestr(tr.get("opened_at"))
-        if d:
-            prev = latest_opened_date.get(sym)
-            if (not prev) or (d > prev):
-                latest_opened_date[sym] = d
-
-    today_total = sum(1 for tr in trades if _safe_ts_to_datestr(tr.get("opened_at")) == today)
-
-    # ---- open / buy slots ----
-    open_slots: List[Tuple[str, int, str, float]] = []
-    buy_slots: List[Tuple[str, int, str, float]] = []
-
-    def _latest_open_ts_for(sym: str, track_num: int, slot_id: str) -> Optional[float]:
-        tr = _find_latest_trade_for_slot(trades, sym, track_num, slot_id)
-        return float(tr.get("opened_at", time.time())) if tr else None
+    # كل البيانات محسوبة مسبقاً (StatusSnapshot + PnlRollup) → هنا تنسيق النص فقط
+    snap = get_status_snapshot().get()
+    today = snap["day"]
+    cycle_slots = int(snap["cycle_slots"])
 
-    open_syms: List[str] = []
-    buy_syms: List[str] = []
-
-    for sid, cell in slots.items():
-        if not cell:
-            continue
-        st = (cell.get("status") or "").lower()
-        sym = normalize_symbol(cell.get("symbol"))
-        if not sym:
-            continue
-        track_num = int(cell.get("track_num", 0) or 0)
-        if track_num <= 0:
-            continue
-
-        if st in ("open", "reserved"):
-            ts_open = _latest_open_ts_for(sym, track_num, str(sid)) or time.time()
-            open_slots.append((sym, track_num, str(sid), ts_open))
-            open_syms.append(sym)
-        elif st == "buy":
-            ts_buy = _latest_open_ts_for(sym, track_num, str(sid)) or time.time()
-            buy_slots.append((sym, track_num, str(sid), ts_buy))
-            buy_syms.append(sym)
-
-    overall_open = len(open_slots)
-    overall_buy  = len(buy_slots)
-
-    today_open   = sum(1 for sym in set(open_syms) if latest_opened_date.get(sym) == today)
-    today_buy    = sum(1 for sym in set(buy_syms)  if latest_opened_date.get(sym) == today)
-
-    # ---- اليوم (realized) ----
-    tp_today = sl_today = failed_today = drwn_today = 0
-    tp_today_entries: List[str] = []
-    sl_today_entries: List[str] = []
-    failed_today_entries: List[str] = []
-    drwn_today_entries: List[str] = []
-
-    def _fmt_line(tr: Dict[str, Any]) -> str:
-        sym = normalize_symbol(tr.get("symbol"))
-        track_num = int(tr.get("track_num", 0) or 0)
-        slot_id = str(tr.get("slot_id") or "?")
+    # ---- Counters من الـ PnL rollup (النهائية) + المخزن الساخن (غير النهائية) ----
+    rollup = get_pnl_rollup() if callable(get_pnl_rollup) else None
+    if rollup is not None:
+        roll_total = rollup.total()
+        st_all = roll_total["status"]
+        try:
+            live_counts = get_trade_store().status_counts() if callable(get_trade_store) else {}
+        except Exception:
+            live_counts = {}
+        total_overall = roll_total["count"] + sum(
+            n for st, n in live_counts.items() if st not in ("closed", "stopped", "drwn", "failed")
+        )
+    else:
+        history = _load_all_trades()
+        st_all = {}
+        for tr in history:
+            st = (tr.get("status") or "").lower()
+            st_all[st] = st_all.get(st, 0) + 1
+        total_overall = len(history)
+    overall_tp       = st_all.get("closed", 0)
+    overall_sl       = st_all.get("stopped", 0)
+    overall_drawdown = st_all.get("drwn", 0)
+    overall_failed   = st_all.get("failed", 0)
+
+    # ---- open / buy slots (مرتّبة مسبقاً) + اليوم ----
+    open_sorted = snap["open"]   # (sym, track, slot, opened_ts)
+    buy_sorted = snap["buy"]     # (sym, track, slot, opened_ts, bought_price)
+    overall_open = len(open_sorted)
+    overall_buy  = len(buy_sorted)
+    today_total = snap["today_total"]
+    today_open = snap["today_open"]
+    today_buy = snap["today_buy"]
+
+    def _fmt_line(key: Tuple[str, int, str]) -> str:
+        sym, track_num, slot_id = key
         return f"• {sym} — Track {track_num} | Slot {slot_id}"
 
-    for tr in trades:
-        st = (tr.get("status") or "").lower()
-        closed_d = _safe_ts_to_datestr(tr.get("closed_at"))
-        if closed_d != today:
-            continue
-        if st == "closed":
-            tp_today += 1
-            tp_today_entries.append(_fmt_line(tr))
-        elif st == "stopped":
-            sl_today += 1
-            sl_today_entries.append(_fmt_line(tr))
-        elif st == "failed":
-            failed_today += 1
-            failed_today_entries.append(_fmt_line(tr))
-        elif st == "drwn":
-            drwn_today += 1
-            drwn_today_entries.append(_fmt_line(tr))
+    realized = snap["today_realized"]
+    tp_today_entries = [_fmt_line(k) for k in realized.get("closed", [])]
+    sl_today_entries = [_fmt_line(k) for k in realized.get("stopped", [])]
+    failed_today_entries = [_fmt_line(k) for k in realized.get("failed", [])]
+    drwn_today_entries = [_fmt_line(k) for k in realized.get("drwn", [])]
+    tp_today = len(tp_today_entries)
+    sl_today = len(sl_today_entries)
+    failed_today = len(failed_today_entries)
+    drwn_today = len(drwn_today_entries)
 
     used_now = overall_open + overall_buy
     free_now = max(0, cycle_slots - used_now)
@@ -418,23 +534,10 @@ async def show_bot_status():
     sl_pct   = _safe_pct(overall_sl, realized_total)
     drw_pct  = _safe_pct(overall_drawdown, realized_total)
 
-    # ---- بنية index map للـ sell <index> ----
-    open_sorted = sorted(open_slots, key=lambda x: (x[0], x[1], int(x[2])))
-    buy_sorted  = sorted(buy_slots,  key=lambda x: (x[0], x[1], int(x[2])))
-
+    # ---- index map للـ sell <index> (من الـ snapshot) ----
     global _STATUS_INDEX_MAP, _STATUS_REV_INDEX_MAP
-    _STATUS_INDEX_MAP = {}
-    _STATUS_REV_INDEX_MAP = {}
-
-    idx = 1
-    for sym, track_num, sid, ts in open_sorted:
-        _STATUS_INDEX_MAP[idx] = (sym, track_num, sid)
-        _STATUS_REV_INDEX_MAP[(sym, track_num, sid)] = idx
-        idx += 1
-    for sym, track_num, sid, ts in buy_sorted:
-        _STATUS_INDEX_MAP[idx] = (sym, track_num, sid)
-        _STATUS_REV_INDEX_MAP[(sym, track_num, sid)] = idx
-        idx += 1
+    _STATUS_INDEX_MAP = snap["index_map"]
+    _STATUS_REV_INDEX_MAP = {key: idx for idx, key in _STATUS_INDEX_MAP.items()}
 
     # ---- Gate state ----
     try:
@@ -459,9 +562,14 @@ async def show_bot_status():
             f"📉 DRWDN: {overall_drawdown} ({drw_pct:.2f}%) | "
             f"⚠️ Failed: {overall_failed}"
         ),
-        "",
-        "📜 Open Slots:",
     ]
+    if rollup is not None:
+        pnl_today = rollup.day(today)
+        lines.append(
+            f"💰 Realized PnL: today {pnl_today['net']:+.2f} | overall {roll_total['net']:+.2f} USDT"
+            f" | win rate {roll_total['win_rate']:.1f}%"
+        )
+    lines.extend(["", "📜 Open Slots:"])
 
     i = 1
     if open_sorted:
@@ -474,18 +582,14 @@ async def show_bot_status():
 
     lines.extend(["", "📜 Buy Slots:"])
     if buy_sorted:
-        for sym, track_num, sid, ts in buy_sorted:
+        prices = await _report_prices([row[0] for row in buy_sorted])
+        for sym, track_num, sid, ts, bought_price in buy_sorted:
             ts_fmt = _fmt_berlin(ts)
             # حاول إظهار price / Δ%
-            bought_price = None
             now_price = None
             pct_str = "—"
             try:
-                # من TRADES_FILE
-                tr = _find_latest_trade_for_slot(trades, sym, track_num, sid)
-                if tr and tr.get("bought_price") is not None:
-                    bought_price = float(tr["bought_price"])
-                now_price = await fetch_current_price(sym) if callable(fetch_current_price) else None
+                now_price = prices.get(sym)
                 if bought_price and now_price:
                     pct = ((float(now_price) - bought_price) / bought_price) * 100.0
                     pct_str = f"{pct:+.2f}%"
@@ -511,23 +615,77 @@ async def show_bot_status():
     lines.extend(["", "⚠️ Failed (today):"])
     lines.extend(failed_today_entries or ["(none)"])
 
+    # ---- Price cache (توفير طلبات ticker) ----
+    try:
+        if callable(get_price_cache):
+            pc = get_price_cache().stats()
+            lines.extend([
+                "",
+                f"💾 Price cache: hits {pc['hits']} | coalesced {pc['coalesced']} | "
+                f"misses {pc['misses']} → saved {pc['saved_pct']:.1f}%",
+            ])
+        if callable(get_price_board):
+            pb = get_price_board().stats()
+            lines.append(
+                f"📋 PriceBoard: snapshots {pb['snapshots']} | lookups {pb['lookups']} | "
+                f"missing {pb['missing']} | markets {pb['markets']}"
+            )
+        if callable(get_kucoin_governor):
+            gv = get_kucoin_governor().stats()
+            waits = " | ".join(
+                f"{name} {st['granted']}/{st['avg_wait_ms']:.0f}ms"
+                for name, st in gv["by_priority"].items() if st["granted"]
+            )
+            lines.append(
+                f"🚦 KuCoin rate: queue {gv['queue_depth']} | 429s {gv['rate_limited']}"
+                + (f" | {waits}" if waits else "")
+            )
+    except Exception:
+        pass
+
     # ---- Terminal notices summary ----
     lines.extend(["", "🪵 Terminal Notices:"])
-    if os.path.exists(TERMINAL_LOG_FILE):
-        try:
-            with open(TERMINAL_LOG_FILE, "r") as f:
-                notif_log = json.load(f) or {}
-            if notif_log:
-                items = sorted(notif_log.items(), key=lambda kv: kv[1].get("count", 0), reverse=True)
-                notif_summary = "\n".join([f"• {msg} (x{info['count']})" for msg, info in items])
-            else:
-                notif_summary = "(none)"
-        except Exception:
+    try:
+        get_terminal_notices = globals().get("get_terminal_notices")
+        if callable(get_terminal_notices):
+            notif_log = get_terminal_notices().snapshot()  # من الذاكرة
+        else:
+            notif_log = _read_state_json(TERMINAL_LOG_FILE, {}) or {}
+        if notif_log:
+            items = sorted(notif_log.items(), key=lambda kv: kv[1].get("count", 0), reverse=True)
+            notif_summary = "\n".join([
+                f"• {msg} (x{info['count']})"
+                + (f" [rate-limited {info['suppressed']}]" if info.get("suppressed") else "")
+                for msg, info in items
+            ])
+        else:
             notif_summary = "(none)"
-    else:
+    except Exception:
         notif_summary = "(none)"
     lines.append(notif_summary)
 
+    # ---- Persistence worker (زمن الكتابة / عمق الطابور لكل ملف) ----
+    try:
+        if callable(get_persistence_worker):
+            pst = get_persistence_worker().stats()
+            get_state_cache_stats = globals().get("get_state_cache_stats")
+            caches = get_state_cache_stats() if callable(get_state_cache_stats) else []
+            if pst or caches:
+                lines.extend(["", "💾 Persistence:"])
+                for path, m in sorted(pst.items()):
+                    lines.append(
+                        f"• {os.path.basename(path)}: {m['writes']} writes, "
+                        f"avg {m['avg_ms']:.1f}ms / max {m['max_ms']:.1f}ms, "
+                        f"coalesced {m['coalesced']}, queue {m['queue_depth']}"
+                    )
+                for c in caches:
+                    lines.append(
+                        f"• cache {os.path.basename(c['path'])}: "
+                        f"{c['reloads']} reloads, {c['writes']} writes"
+                    )
+    except Exception:
+        pass
+
     await _send_long_message("\n".join(lines), part_title="📊 Bot Status")
 
 # --- Single track details ---
@@ -546,7 +704,7 @@ async def show_single_track_status(track_index: int):
             return
         amount = float(tdata.get("amount", 0) or 0)
         slots = structure.get("slots") or {}
-        trades = _load_trades_cache()
+        trades = None  # البحث عبر فهرس الخانات في المخزن
 
         lines: List[str] = [f"🔎 Track {track_index} / {amount:.2f} USDT — details"]
         open_entries: List[str] = []
@@ -567,11 +725,15 @@ async def show_single_track_status(track_index: int):
             except Exception:
                 return None
 
-        for sid, cell in slots.items():
-            if not cell:
-                continue
-            if int(cell.get("track_num", 0) or 0) != int(track_index):
-                continue
+        track_cells = [
+            (sid, cell) for sid, cell in slots.items()
+            if cell and int(cell.get("track_num", 0) or 0) == int(track_index)
+        ]
+        prices = await _report_prices([
+            cell.get("symbol") for _, cell in track_cells if (cell.get("status") or "").lower() == "buy"
+        ])
+
+        for sid, cell in track_cells:
             st = (cell.get("status") or "").lower()
             sym = normalize_symbol(cell.get("symbol"))
             if not sym:
@@ -595,7 +757,7 @@ async def show_single_track_status(track_index: int):
                 try:
                     if tr and tr.get("bought_price") is not None:
                         bought_price = float(tr["bought_price"])
-                    now_price = await fetch_current_price(sym) if callable(fetch_current_price) else None
+                    now_price = prices.get(sym)
                 except Exception:
                     pass
                 pct_val = _pct(bought_price, now_price) if (bought_price and now_price) else None
@@ -607,8 +769,8 @@ async def show_single_track_status(track_index: int):
                     f"buy {bp_str} → now {now_str} / Δ {pct_str}"
                 )
 
-        # realized (من TRADES_FILE)
-        for tr in trades:
+        # realized (من TRADES_FILE + الأرشيف)
+        for tr in _load_all_trades():
             if int(tr.get("track_num", 0) or 0) != int(track_index):
                 continue
             st = (tr.get("status") or "").lower()
@@ -644,7 +806,14 @@ async def show_single_track_status(track_index: int):
         c_tp = len(tp_entries)
         c_sl = len(sl_entries)
         c_drw = len(drw_entries)
-        lines.append(f"open: {c_open} | buy: {c_buy} | TP: {c_tp} | SL: {c_sl} | DRWDN: {c_drw}\n")
+        lines.append(f"open: {c_open} | buy: {c_buy} | TP: {c_tp} | SL: {c_sl} | DRWDN: {c_drw}")
+        if callable(get_pnl_rollup):
+            tv = get_pnl_rollup().track(track_index)
+            lines.append(
+                f"PnL: {tv['net']:+.2f} USDT | win rate {tv['win_rate']:.1f}% | "
+                f"avg hold {_fmt_hold(tv['avg_hold_sec'])}"
+            )
+        lines.append("")
 
         if open_entries:
             lines.append("📜 Open:")
@@ -683,7 +852,8 @@ async def show_tracks_status():
         structure = get_trade_structure()
         tracks = structure.get("tracks") or {}
         slots = structure.get("slots") or {}
-        trades = _load_trades_cache()
+        rollup = get_pnl_rollup() if callable(get_pnl_rollup) else None
+        trades = _load_all_trades() if rollup is None else []
 
         def _format_duration(open_ts: Any, close_ts: Any) -> str:
             try:
@@ -736,7 +906,19 @@ async def show_tracks_status():
                     buy_cnt += 1
                     buy_entries.append(f"{sym} — Slot {sid} / buy")
 
-            # من TRADES_FILE (realized)
+            # realized: من الـ rollup (O(1) لكل مسار)؛ التفاصيل في track <n>
+            pnl_line = ""
+            if rollup is not None:
+                tv = rollup.track(track_num)
+                tp_cnt = tv["status"].get("closed", 0)
+                sl_cnt = tv["status"].get("stopped", 0)
+                drw_cnt = tv["status"].get("drwn", 0)
+                pnl_line = (
+                    f"PnL: {tv['net']:+.2f} USDT | win rate {tv['win_rate']:.1f}% | "
+                    f"avg hold {_fmt_hold(tv['avg_hold_sec'])}"
+                )
+
+            # من TRADES_FILE (realized) — فقط بدون rollup
             for tr in trades:
                 if int(tr.get("track_num", 0) or 0) != track_num:
                     continue
@@ -759,6 +941,8 @@ async def show_tracks_status():
             total_cycles = open_cnt + buy_cnt + tp_cnt + sl_cnt + drw_cnt
             lines.append(f"Track {track_num} : base {amount:.2f} USDT / {total_cycles} trades")
             lines.append(f"open: {open_cnt} | buy: {buy_cnt} | TP: {tp_cnt} | SL: {sl_cnt} | DRWDN: {drw_cnt}")
+            if pnl_line:
+                lines.append(pnl_line)
             if open_entries:
                 lines.extend(sorted(open_entries))
             if buy_entries:
@@ -846,66 +1030,465 @@ def _fmt_dt(ts: Optional[float]) -> str:
     except Exception:
         return "—"
 
-async def show_verlauf():
-    trades = _load_trades_cache()
-    if not trades:
+# ===== Verlauf (متدفّق + فلاتر + صفحات) =====
+# verlauf                    → أحدث VERLAUF_PAGE_SIZE صفقة (الأحدث أولاً)، و verlauf next → الأقدم منها
+# verlauf 2026-10            → شهر (أو 2026-10-05 يوم، أو 2026-10-01..2026-10-15 نطاق؛ بتوقيت Berlin)
+# verlauf BTCUSDT / BTC      → رمز؛  verlauf track 3 → مسار؛  verlauf tp|sl|drwn|failed|open|buy → حالة
+# verlauf last 50 [فلاتر]    → آخر N صفقة مطابقة
+# verlauf next               → الصفحة التالية لآخر استعلام
+# verlauf csv [فلاتر]        → كل الصفقات المطابقة كملف CSV مرفق واحد
+# الترتيب زمني دائماً حسب (opened_at, id) — مستقل عن ترتيب مقاطع الأرشيف / الطبقة الساخنة.
+# الصفحات keyset: الـ cursor يحفظ آخر مفتاح (opened_at, id) معروض، والصفحة التالية = أصغر
+# VERLAUF_PAGE_SIZE مفتاح أكبر منه (heapq.nsmallest على الـ generator مع since = opened_at
+# لتخطّي أشهر الأرشيف الأقدم)؛ نقل صفقات للأرشيف بين الصفحات لا يكرّر ولا يُسقط صفوفاً.
+# verlauf بدون فلاتر يمشي بالعكس: cursor بـ "desc" والصفحة التالية = أكبر VERLAUF_PAGE_SIZE
+# مفتاح أصغر من آخر مفتاح معروض (heapq.nlargest).
+# فقط الصفحة المطلوبة تُبنى في الذاكرة.
+VERLAUF_PAGE_SIZE = int(globals().get("VERLAUF_PAGE_SIZE", 20))
+VERLAUF_MAX_LAST = 500
+VERLAUF_USAGE = (
+    "ℹ️ Usage: verlauf [YYYY-MM | YYYY-MM-DD | A..B] [SYMBOL] [track N] "
+    "[tp|sl|drwn|failed|open|buy] [last N] [csv] — or: verlauf next"
+)
+_VERLAUF_DATE_LIKE = re.compile(r"\d{4}-\d{1,2}(-\d{1,2})?")
+_VERLAUF_CURSOR: Dict[str, Any] = {}
+_VERLAUF_STATUS_WORDS = {
+    "tp": "closed", "closed": "closed", "sl": "stopped", "stopped": "stopped",
+    "drwn": "drwn", "drwdn": "drwn", "failed": "failed",
+    "open": "open", "reserved": "reserved", "buy": "buy",
+}
+
+def _verlauf_day_start(day: str) -> float:
+    y, m, d = (int(x) for x in day.split("-"))
+    return datetime(y, m, d, tzinfo=_berlin_tz()).timestamp()
+
+def _verlauf_date_range(token: str) -> Optional[Tuple[float, float]]:
+    """'2026-10' / '2026-10-05' / 'A..B' → (since, until) بتوقيت Berlin، أو None (صيغة/تاريخ غير صالح)."""
+    try:
+        return _verlauf_date_range_or_raise(token)
+    except ValueError:
+        return None
+
+def _looks_like_date(token: str) -> bool:
+    return ".." in token or bool(_VERLAUF_DATE_LIKE.fullmatch(token))
+
+def _verlauf_date_range_or_raise(token: str) -> Optional[Tuple[float, float]]:
+    if ".." in token:
+        a, b = token.split("..", 1)
+        ra, rb = _verlauf_date_range(a), _verlauf_date_range(b)
+        return (ra[0], rb[1]) if ra and rb else None
+    if re.fullmatch(r"\d{4}-\d{2}", token):
+        y, m = (int(x) for x in token.split("-"))
+        ny, nm = (y + 1, 1) if m == 12 else (y, m + 1)
+        return _verlauf_day_start(f"{y}-{m}-1"), _verlauf_day_start(f"{ny}-{nm}-1")
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", token):
+        start = _verlauf_day_start(token)
+        nxt = (datetime.fromtimestamp(start, tz=_berlin_tz()) + timedelta(days=1)).date().isoformat()
+        return start, _verlauf_day_start(nxt)
+    return None
+
+def _parse_verlauf_args(args: str) -> Tuple[Dict[str, Any], Optional[int], List[str]]:
+    """→ (فلاتر iter_all_trades، last N أو None، وصف الفلاتر للعنوان)."""
+    filters: Dict[str, Any] = {}
+    last_n: Optional[int] = None
+    label: List[str] = []
+    tokens = args.split()
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        low = tok.lower()
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if low == "last" and nxt and nxt.isdigit():
+            last_n = max(1, min(VERLAUF_MAX_LAST, int(nxt)))
+            i += 2
+            continue
+        if low == "track" and nxt and nxt.isdigit():
+            filters["track_num"] = int(nxt)
+            label.append(f"track {nxt}")
+            i += 2
+            continue
+        rng = _verlauf_date_range(tok)
+        if rng is not None:
+            filters["since"], filters["until"] = rng
+            label.append(tok)
+        elif _looks_like_date(tok):
+            raise ValueError(f"invalid date or range: {tok}")
+        elif low in _VERLAUF_STATUS_WORDS:
+            filters.setdefault("status", set()).add(_VERLAUF_STATUS_WORDS[low])
+            label.append(low)
+        else:
+            filters["symbol"] = normalize_symbol(tok)
+            label.append(filters["symbol"])
+        i += 1
+    return filters, last_n, label
+
+def _iter_verlauf(filters: Dict[str, Any]):
+    iter_all_trades = globals().get("iter_all_trades")
+    if callable(iter_all_trades):
+        return iter_all_trades(**filters)
+    # بدون Section 2 الحديث: مرور على القائمة مع نفس الفلاتر
+    def _gen():
+        for tr in _load_all_trades():
+            if filters.get("symbol") and normalize_symbol(tr.get("symbol")) not in (
+                filters["symbol"], filters["symbol"] + "USDT"
+            ):
+                continue
+            if filters.get("track_num") is not None and str(tr.get("track_num")) != str(filters["track_num"]):
+                continue
+            if filters.get("status") and (tr.get("status") or "").lower() not in filters["status"]:
+                continue
+            ts = float(tr.get("opened_at", 0) or 0.0)
+            if filters.get("since") is not None and ts < filters["since"]:
+                continue
+            if filters.get("until") is not None and ts >= filters["until"]:
+                continue
+            yield tr
+    return _gen()
+
+def _verlauf_key(tr: Dict[str, Any]) -> Tuple[float, int]:
+    try:
+        ts = float(tr.get("opened_at") or 0.0)
+    except Exception:
+        ts = 0.0
+    try:
+        tid = int(tr.get("id") or 0)
+    except Exception:
+        tid = 0
+    return ts, tid
+
+def _verlauf_after(filters: Dict[str, Any], after: Optional[Tuple[float, int]], limit: int) -> List[Dict[str, Any]]:
+    """أصغر limit صفقة (زمنياً) مفتاحها > after — مرور واحد، ذاكرة O(limit)."""
+    if after is None:
+        return heapq.nsmallest(limit, _iter_verlauf(filters), key=_verlauf_key)
+    scan = dict(filters)
+    scan["since"] = max(float(filters.get("since") or after[0]), after[0])
+    stream = (tr for tr in _iter_verlauf(scan) if _verlauf_key(tr) > after)
+    return heapq.nsmallest(limit, stream, key=_verlauf_key)
+
+def _verlauf_before(filters: Dict[str, Any], before: Optional[Tuple[float, int]], limit: int) -> List[Dict[str, Any]]:
+    """أكبر limit صفقة (الأحدث أولاً) مفتاحها < before — مرور واحد، ذاكرة O(limit)."""
+    stream = _iter_verlauf(filters)
+    if before is not None:
+        stream = (tr for tr in stream if _verlauf_key(tr) < before)
+    return heapq.nlargest(limit, stream, key=_verlauf_key)
+
+def _verlauf_last(filters: Dict[str, Any], n: int) -> List[Dict[str, Any]]:
+    """آخر n صفقة زمنياً (بترتيب تصاعدي) — ذاكرة O(n)."""
+    return list(reversed(heapq.nlargest(n, _iter_verlauf(filters), key=_verlauf_key)))
+
+def _fmt_verlauf_trade(tr: Dict[str, Any]) -> List[str]:
+    lines: List[str] = []
+    sym = normalize_symbol(tr.get("symbol"))
+    track_num = int(tr.get("track_num", 0) or 0)
+    slot_id = str(tr.get("slot_id") or "?")
+    opened_at = tr.get("opened_at")
+    bought_at = tr.get("bought_at")
+    closed_at = tr.get("closed_at")
+    amount = float(tr.get("amount", 0) or 0)
+    bought_price = tr.get("bought_price")
+    sell_price = tr.get("sell_price")
+    qty = tr.get("sell_qty")
+    status = (tr.get("status") or "").lower()
+    pnl_usdt = tr.get("pnl_usdt")
+    pnl_pct = tr.get("pnl_pct")
+
+    lines.append(f"\n— {sym}")
+    lines.append(
+        f"📥 Signal @ {_fmt_dt(opened_at)} → Track {track_num}, Slot {slot_id} | Amount {amount:.2f} USDT"
+    )
+
+    if bought_price is not None:
+        buy_ts_show = bought_at if bought_at is not None else opened_at
+        qty_show = f"{float(qty):.6f}" if qty is not None else "—"
+        usd_spent = (float(bought_price) * float(qty)) if (qty and bought_price) else amount
+        lines.append(
+            f"✅ Buy   @ {_fmt_dt(buy_ts_show)} → price {float(bought_price):.6f} | qty {qty_show} | ~USDT {usd_spent:.4f}"
+        )
+
+    if status in ("closed", "stopped", "drwn", "failed"):
+        ts_sell = closed_at
+        pnl_str = "—"
+        if pnl_usdt is not None:
+            sign = "+" if float(pnl_usdt) >= 0 else "-"
+            pnl_str = f"{sign}{abs(float(pnl_usdt)):.4f} USDT"
+        pct_str = f"{float(pnl_pct):+.2f}%" if pnl_pct is not None else "—"
+        tag = status.upper()
+        lines.append(
+            f"🏁 {tag} @ {_fmt_dt(ts_sell)} → sell {float(sell_price) if sell_price is not None else 0.0:.6f} | "
+            f"PnL {pnl_str} ({pct_str})"
+        )
+
+    return lines
+
+_VERLAUF_CSV_FIELDS = (
+    "id", "symbol", "track_num", "slot_id", "status", "amount",
+    "opened_at", "bought_at", "closed_at", "bought_price", "sell_price", "sell_qty",
+    "pnl_usdt", "pnl_pct",
+)
+
+def _verlauf_csv_time(ts: Any) -> str:
+    try:
+        return datetime.fromtimestamp(float(ts), tz=_berlin_tz()).strftime("%Y-%m-%d %H:%M:%S") if ts else ""
+    except Exception:
+        return ""
+
+async def _send_verlauf_csv(filters: Dict[str, Any], last_n: Optional[int], label: List[str]) -> None:
+    """كل الصفقات المطابقة → CSV في StringIO (كتابة متدفّقة من الـ generator) → ملف مرفق واحد."""
+    if last_n is not None:
+        rows = _verlauf_last(filters, last_n)
+    else:
+        rows = sorted(_iter_verlauf(filters), key=_verlauf_key)  # ملف كامل: كل الصفوف تُكتب على أي حال
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(_VERLAUF_CSV_FIELDS)
+    count = 0
+    for tr in rows:
+        writer.writerow([
+            _verlauf_csv_time(tr.get(k)) if k.endswith("_at") else ("" if tr.get(k) is None else tr.get(k))
+            for k in _VERLAUF_CSV_FIELDS
+        ])
+        count += 1
+    if not count:
         if callable(send_notification):
-            await send_notification("ℹ️ No trades yet.")
+            await send_notification("ℹ️ No trades match.")
         return
+    title = " ".join(label) or "all"
+    if not await _send_report_document(
+        out.getvalue(), _report_filename(f"verlauf {title}", "csv"), caption=f"📜 Verlauf — {title} ({count} trades)"
+    ):
+        if callable(send_notification):
+            await send_notification("⚠️ CSV export failed (document upload not available).")
+
+async def show_verlauf(args: str = ""):
+    global _VERLAUF_CURSOR
+    args = (args or "").strip()
+    tokens = args.split()
+    want_csv = any(t.lower() == "csv" for t in tokens)
+    after: Optional[Tuple[float, int]] = None
+    desc = False
+    shown = 0
+    if args.lower() == "next":
+        if not _VERLAUF_CURSOR:
+            if callable(send_notification):
+                await send_notification("ℹ️ No further verlauf page. Start with: verlauf <filters>")
+            return
+        filters = _VERLAUF_CURSOR["filters"]
+        label = _VERLAUF_CURSOR["label"]
+        after = _VERLAUF_CURSOR["after"]
+        desc = bool(_VERLAUF_CURSOR.get("desc"))
+        shown = int(_VERLAUF_CURSOR["shown"])
+        last_n = None
+    else:
+        try:
+            filters, last_n, label = _parse_verlauf_args(" ".join(t for t in tokens if t.lower() != "csv"))
+        except ValueError as e:
+            if callable(send_notification):
+                await send_notification(f"⚠️ {e}\n{VERLAUF_USAGE}")
+            return
+        if want_csv:
+            await _send_verlauf_csv(filters, last_n, label)
+            return
+        desc = last_n is None and not filters  # verlauf بدون فلاتر → أحدث الصفقات أولاً
+
+    if last_n is not None:
+        page = _verlauf_last(filters, last_n)
+        more = False
+        title = f"last {last_n}" + (f" — {' '.join(label)}" if label else "")
+    else:
+        if desc:
+            page = _verlauf_before(filters, after, VERLAUF_PAGE_SIZE + 1)
+        else:
+            page = _verlauf_after(filters, after, VERLAUF_PAGE_SIZE + 1)
+        more = len(page) > VERLAUF_PAGE_SIZE
+        page = page[:VERLAUF_PAGE_SIZE]
+        title = "latest first" if desc else (" ".join(label) or "all")
 
-    trades = sorted(trades, key=lambda tr: float(tr.get("opened_at", 0) or 0.0))
+    if not page:
+        _VERLAUF_CURSOR = {}
+        if callable(send_notification):
+            await send_notification("ℹ️ No trades match." if (filters or shown) else "ℹ️ No trades yet.")
+        return
 
-    lines: List[str] = ["📜 Verlauf — Full trade history"]
-    for tr in trades:
+    first = shown + 1
+    lines: List[str] = [f"📜 Verlauf — {title} (#{first}–#{first + len(page) - 1})"]
+    for tr in page:
         try:
-            sym = normalize_symbol(tr.get("symbol"))
-            track_num = int(tr.get("track_num", 0) or 0)
-            slot_id = str(tr.get("slot_id") or "?")
-            opened_at = tr.get("opened_at")
-            bought_at = tr.get("bought_at")
-            closed_at = tr.get("closed_at")
-            amount = float(tr.get("amount", 0) or 0)
-            bought_price = tr.get("bought_price")
-            sell_price = tr.get("sell_price")
-            qty = tr.get("sell_qty")
-            status = (tr.get("status") or "").lower()
-            pnl_usdt = tr.get("pnl_usdt")
-            pnl_pct = tr.get("pnl_pct")
-
-            lines.append(f"\n— {sym}")
-            lines.append(
-                f"📥 Signal @ {_fmt_dt(opened_at)} → Track {track_num}, Slot {slot_id} | Amount {amount:.2f} USDT"
-            )
+            lines.extend(_fmt_verlauf_trade(tr))
+        except Exception:
+            continue
 
-            if bought_price is not None:
-                buy_ts_show = bought_at if bought_at is not None else opened_at
-                qty_show = f"{float(qty):.6f}" if qty is not None else "—"
-                usd_spent = (float(bought_price) * float(qty)) if (qty and bought_price) else amount
-                lines.append(
-                    f"✅ Buy   @ {_fmt_dt(buy_ts_show)} → price {float(bought_price):.6f} | qty {qty_show} | ~USDT {usd_spent:.4f}"
-                )
+    if more:
+        _VERLAUF_CURSOR = {
+            "filters": filters, "label": label,
+            "after": _verlauf_key(page[-1]), "desc": desc, "shown": shown + len(page),
+        }
+        lines.append("\n➡️ More: verlauf next")
+    else:
+        _VERLAUF_CURSOR = {}
+    await _send_long_message("\n".join(lines), part_title="verlauf")
 
-            if status in ("closed", "stopped", "drwn", "failed"):
-                ts_sell = closed_at
-                pnl_str = "—"
-                if pnl_usdt is not None:
-                    sign = "+" if float(pnl_usdt) >= 0 else "-"
-                    pnl_str = f"{sign}{abs(float(pnl_usdt)):.4f} USDT"
-                pct_str = f"{float(pnl_pct):+.2f}%" if pnl_pct is not None else "—"
-                tag = status.upper()
-                lines.append(
-                    f"🏁 {tag} @ {_fmt_dt(ts_sell)} → sell {float(sell_price) if sell_price is not None else 0.0:.6f} | "
-                    f"PnL {pnl_str} ({pct_str})"
-                )
+# ===== Stats (تحليلات NumPy على كل التاريخ) =====
+# stats                         → كل الصفقات النهائية
+# stats 30d / 2026-10 / 2026-10-01..2026-10-15 / today   → فترة (على closed_at، بتوقيت Berlin)
+# stats track 3 / stats BTC     → مسار / رمز (تُجمع مع الفترة)
+# تاريخ/فترة غير صالحة (2026-13، 2026-02-30) → ValueError → رسالة Usage بدل استثناء.
+# الأعمدة تُبنى مرة واحدة (TradeColumns في Section 2) وتتحدّث فقط مع صفقات نهائية جديدة.
+STATS_USAGE = "ℹ️ Usage: stats [Nd | today | YYYY-MM | YYYY-MM-DD | A..B] [track N] [SYMBOL]"
+
+def _parse_stats_args(args: str) -> Tuple[Dict[str, Any], List[str]]:
+    filters: Dict[str, Any] = {}
+    label: List[str] = []
+    tokens = args.split()
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        low = tok.lower()
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if low == "track" and nxt and nxt.isdigit():
+            filters["track_num"] = int(nxt)
+            label.append(f"track {nxt}")
+            i += 2
+            continue
+        m = re.fullmatch(r"(\d+)d", low)
+        rng = _verlauf_date_range(datetime.now(_berlin_tz()).date().isoformat() if low == "today" else tok)
+        if m:
+            filters["since"] = time.time() - int(m.group(1)) * 86400.0
+            label.append(low)
+        elif rng is not None:
+            filters["since"], filters["until"] = rng
+            label.append(low)
+        elif _looks_like_date(tok):
+            raise ValueError(f"invalid date or range: {tok}")
+        else:
+            filters["symbol"] = normalize_symbol(tok)
+            label.append(filters["symbol"])
+        i += 1
+    return filters, label
+
+def _fmt_stats(res: Dict[str, Any], title: str) -> str:
+    lines = [f"📈 Stats — {title} ({res['count']} of {res['total_trades']} final trades)"]
+    if not res["count"]:
+        lines.append("— no trades in this selection")
+        return "\n".join(lines)
+    lines.append(f"💰 Net PnL: {res['net']:+.2f} USDT | win rate {res['win_rate']:.1f}%")
+
+    lines.append("\n📊 By status:")
+    for st, v in res["by_status"].items():
+        lines.append(
+            f"• {st.upper()}: {v['count']} ({v['share']:.0f}%) | win {v['win_rate']:.0f}% | {v['net']:+.2f} USDT"
+        )
 
-        except Exception as e:
-            lines.append(f"(parse error on one trade: {e})")
+    lines.append("\n📐 PnL distribution (p5 / p25 / p50 / p75 / p95):")
+    lines.append("• USDT: " + " / ".join(f"{x:+.2f}" for x in res["pnl_usdt_pct"].values()))
+    if res["pnl_pct_pct"]:
+        lines.append("• %: " + " / ".join(f"{x:+.2f}" for x in res["pnl_pct_pct"].values()))
+
+    lines.append("\n⏱️ Timing:")
+    if res["hold_mean"] is not None:
+        lines.append(f"• Hold (buy → close): avg {_fmt_hold(res['hold_mean'])} | median {_fmt_hold(res['hold_median'])}")
+    if res["tp1_count"]:
+        lines.append(
+            f"• Time to TP1: avg {_fmt_hold(res['tp1_mean'])} | median {_fmt_hold(res['tp1_median'])} "
+            f"({res['tp1_count']} trades)"
+        )
 
-    await _send_long_message("\n".join(lines), part_title="verlauf")
+    if res["best_symbols"]:
+        lines.append("\n🏆 Best: " + ", ".join(f"{s} {v:+.2f} ({n})" for s, v, n in res["best_symbols"]))
+    if res["worst_symbols"]:
+        lines.append("🥶 Worst: " + ", ".join(f"{s} {v:+.2f} ({n})" for s, v, n in res["worst_symbols"]))
+
+    lines.append("\n🛤️ Tracks:")
+    for t in res["tracks"]:
+        ret = f" | return {t['return_pct']:+.2f}%" if t["return_pct"] is not None else ""
+        lines.append(f"• Track {t['track']}: {t['count']} trades | {t['net']:+.2f} USDT{ret}")
+    return "\n".join(lines)
+
+async def show_stats(args: str = ""):
+    if not callable(get_trade_columns):
+        if callable(send_notification):
+            await send_notification("⚠️ stats is not available (Section 2 analytics missing).")
+        return
+    try:
+        filters, label = _parse_stats_args((args or "").strip())
+    except ValueError as e:
+        if callable(send_notification):
+            await send_notification(f"⚠️ {e}\n{STATS_USAGE}")
+        return
+    try:
+        # البناء البارد (أول مرة / بعد تصحيح صفقة نهائية) يقرأ الأرشيف → thread حتى لا يوقف الأوامر
+        res = await asyncio.to_thread(get_trade_columns().summary, **filters)
+    except RuntimeError as e:
+        if callable(send_notification):
+            await send_notification(f"⚠️ stats unavailable: {e}")
+        return
+    except Exception as e:
+        _console_echo(f"[STATS] error: {e}")
+        if callable(send_notification):
+            await send_notification(f"⚠️ stats error: {e}")
+        return
+    await _send_long_message(_fmt_stats(res, " ".join(label) or "all time"), part_title="stats")
+
+# --- تعديل خانة واحدة عبر StructureManager (بدل نسخة كاملة + replace) ---
+def _slot_cell(slot_id: str) -> Optional[Dict[str, Any]]:
+    """نسخة من خانة واحدة من البنية الحيّة (fallback: get_trade_structure)."""
+    if callable(get_structure_manager):
+        cell = (get_structure_manager().view().get("slots") or {}).get(str(slot_id))
+        return dict(cell) if cell else None
+    if callable(get_trade_structure):
+        return (get_trade_structure().get("slots") or {}).get(str(slot_id))
+    return None
+
+async def _free_slot(slot_id: str, states: Optional[Tuple[str, ...]] = None) -> bool:
+    """
+    تفريغ الخانة داخل معاملة update() (فحص + كتابة تحت نفس القفل).
+    states: لا تُفرَّغ إلا إذا كانت حالتها الحالية ضمنها (مثلاً المراقب نقلها لـ buy أثناء الانتظار).
+    """
+    def _apply(s: Dict[str, Any]) -> bool:
+        slots = s.setdefault("slots", {})
+        cur = slots.get(str(slot_id))
+        if not cur:
+            return False
+        if states is not None and (cur.get("status") or "").lower() not in states:
+            return False
+        slots[str(slot_id)] = None
+        return True
+
+    if callable(get_structure_manager):
+        async with get_structure_manager().update() as s:
+            return _apply(s)
+    if callable(get_trade_structure) and callable(save_trade_structure):
+        s = get_trade_structure()
+        if _apply(s):
+            save_trade_structure(s)
+            return True
+    return False
+
+async def _cancel_pending_slot(sym_norm: str, track_num: int, slot_id: str) -> bool:
+    """إلغاء خانة open/reserved: تفريغ ذرّي أولاً، ثم failed في TRADES_FILE + إشعار. False = الحالة تغيّرت."""
+    if not await _free_slot(slot_id, states=("open", "reserved")):
+        return False
+    # تحديث TRADES_FILE كـ failed (أحدث صفقة للخانة فقط)
+    tr = _find_latest_trade_for_slot(None, sym_norm, track_num, str(slot_id))
+    if tr:
+        _journal_patch(tr.get("id", 0), {
+            "status": "failed",
+            "closed_at": datetime.now(timezone.utc).timestamp(),
+        }, op="status")
+    if callable(register_trade_outcome):
+        register_trade_outcome(str(track_num), "failed")
+    if callable(send_notification_tc):
+        await send_notification_tc("🚫 Cancelled pending buy.", symbol=sym_norm)
+    return True
 
 # --- helpers للبحث عن Slots حسب الرمز ---
 def _find_active_slots_by_symbol(symbol_norm: str):
     out = []
+    if callable(get_structure_manager):
+        try:
+            # فهرس symbol → الخانات الفعّالة في StructureManager
+            return [(sid, dict(cell)) for sid, cell in get_structure_manager().active_slots(symbol_norm)]
+        except Exception as e:
+            print(f"_find_active_slots_by_symbol error: {e}")
     if not callable(get_trade_structure):
         return out
     try:
@@ -938,7 +1521,7 @@ async def _manual_sell_slot(sym_norm: str, track_num: int, slot_id: str, cell: D
 
     sim_flag = bool(is_simulation()) if callable(is_simulation) else False
 
-    meta = get_symbol_meta(pair) if callable(get_symbol_meta) else None
+    meta = await get_symbol_meta(pair) if callable(get_symbol_meta) else None
     if not meta:
         if callable(send_notification_tc):
             await send_notification_tc("❌ Sell meta fetch failed.", symbol=sym_norm)
@@ -969,21 +1552,19 @@ async def _manual_sell_slot(sym_norm: str, track_num: int, slot_id: str, cell: D
         return
 
     # --- نفّذ أمر البيع Market ---
-    order = place_market_order(
+    order = await place_market_order(
         pair, "sell", size=str(adj_qty),
         symbol_hint=sym_norm,
         sim_override=sim_flag
     ) if callable(place_market_order) else None
 
-    await asyncio.sleep(1)
-
     if order and isinstance(order, dict):
         order_id = order.get("orderId")
     else:
         order_id = None
 
-    if order_id and callable(get_order_deal_size):
-        filled_qty, deal_funds = await get_order_deal_size(order_id, symbol=sym_norm, sim_override=sim_flag)
+    if order_id and callable(wait_order_fill):
+        filled_qty, deal_funds = await wait_order_fill(order_id, symbol=sym_norm, sim_override=sim_flag)
         if filled_qty <= 0.0:
             if callable(send_notification_tc):
                 await send_notification_tc(
@@ -1003,18 +1584,8 @@ async def _manual_sell_slot(sym_norm: str, track_num: int, slot_id: str, cell: D
     pnl_pct = ((sell_price - bought_price) / max(bought_price, 1e-12)) * 100.0
 
     # --- تحديث TRADES_FILE ---
-    trades = _load_trades_cache()
-    changed = False
-    trade_id_for_slot = None
-    for tr in trades:
-        if normalize_symbol(tr.get("symbol")) != sym_norm:
-            continue
-        if int(tr.get("track_num", 0) or 0) != int(track_num):
-            continue
-        if str(tr.get("slot_id")) != str(slot_id):
-            continue
-        # أحدث سجل هو الهدف
-        trade_id_for_slot = int(tr.get("id", 0))
+    latest_tr = _find_latest_trade_for_slot(None, sym_norm, track_num, slot_id)
+    trade_id_for_slot = int(latest_tr.get("id", 0)) if latest_tr else None
     if trade_id_for_slot is not None:
         # استخدم _finalize_trade_record من Section 4 إن وجد
         finalize_fn = globals().get("_finalize_trade_record")
@@ -1024,40 +1595,33 @@ async def _manual_sell_slot(sym_norm: str, track_num: int, slot_id: str, cell: D
             status = (res.get("status") or "drwn").lower()
             finalize_fn(trade_id_for_slot, status, sell_price, sell_qty, pnl_usdt, res.get("pct", pnl_pct))
         else:
-            # fallback: تعديل يدوي
-            for tr in trades:
-                if int(tr.get("id", 0)) == trade_id_for_slot:
-                    res = classify_pnl(bought_price, sell_price) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
-                    status = (res.get("status") or "drwn").lower()
-                    tr["status"] = status
-                    tr["sell_price"] = float(sell_price)
-                    tr["sell_qty"] = float(sell_qty)
-                    tr["pnl_usdt"] = float(pnl_usdt)
-                    tr["pnl_pct"] = float(res.get("pct", pnl_pct))
-                    tr["closed_at"] = datetime.now(timezone.utc).timestamp()
-                    changed = True
-                    break
-            if changed:
-                try:
-                    with open(TRADES_FILE, "w") as f:
-                        json.dump({"trades": trades}, f, indent=2)
-                except Exception:
-                    pass
+            # fallback: حدث finalized مباشرة في الـ journal
+            res = classify_pnl(bought_price, sell_price) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
+            status = (res.get("status") or "drwn").lower()
+            _journal_patch(trade_id_for_slot, {
+                "status": status,
+                "sell_price": float(sell_price),
+                "sell_qty": float(sell_qty),
+                "pnl_usdt": float(pnl_usdt),
+                "pnl_pct": float(res.get("pct", pnl_pct)),
+                "closed_at": datetime.now(timezone.utc).timestamp(),
+            }, op="finalized")
         final_status = res.get("status") or "drwn"
     else:
         # لم نجد trade id → نستخدم fallback بسيط
         res = classify_pnl(bought_price, sell_price) if callable(classify_pnl) else {"status": "drwn", "pct": pnl_pct}
         final_status = res.get("status") or "drwn"
+        # لا يوجد سجل يحمل الـ PnL → نضيفه للـ summary مباشرة
+        try:
+            if callable(accumulate_summary):
+                if pnl_usdt >= 0:
+                    accumulate_summary(profit_delta=float(pnl_usdt), track_num=track_num, symbol=sym_norm)
+                else:
+                    accumulate_summary(loss_delta=float(-pnl_usdt), track_num=track_num, symbol=sym_norm)
+        except Exception:
+            pass
 
-    # --- summary + counters ---
-    try:
-        if pnl_usdt >= 0:
-            accumulate_summary(profit_delta=float(pnl_usdt))
-        else:
-            accumulate_summary(loss_delta=float(-pnl_usdt))
-    except Exception:
-        pass
-
+    # --- counters ---
     try:
         if callable(register_trade_outcome):
             register_trade_outcome(str(track_num), final_status)
@@ -1065,13 +1629,10 @@ async def _manual_sell_slot(sym_norm: str, track_num: int, slot_id: str, cell: D
         pass
 
     # --- تحرير الـ Slot ---
-    if callable(get_trade_structure) and callable(save_trade_structure):
-        s = get_trade_structure()
-        slots = s.get("slots") or {}
-        if str(slot_id) in slots:
-            slots[str(slot_id)] = None
-            s["slots"] = slots
-            save_trade_structure(s)
+    try:
+        await _free_slot(str(slot_id))
+    except Exception as e:
+        print(f"_manual_sell_slot free error: {e}")
 
     # --- إشعار ---
     dur_str = ""
@@ -1332,9 +1893,7 @@ if client is not None and events is not None:
                         )
                     return
 
-                structure = get_trade_structure()
-                slots = structure.get("slots") or {}
-                cell = slots.get(str(slot_id))
+                cell = _slot_cell(str(slot_id))
                 if not cell:
                     if callable(send_notification_tc):
                         await send_notification_tc(
@@ -1345,40 +1904,16 @@ if client is not None and events is not None:
 
                 st = (cell.get("status") or "").lower()
 
-                # إذا كانت open → إلغاء الصفقة
+                # إذا كانت open → إلغاء الصفقة (إن نقلها المراقب لـ buy في الأثناء → بيع)
                 if st in ("open", "reserved"):
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            "🚫 Cancelled pending buy.",
-                            symbol=sym_norm
-                        )
-                    # تحديث TRADES_FILE كـ failed
-                    trades = _load_trades_cache()
-                    changed = False
-                    for tr in trades:
-                        if normalize_symbol(tr.get("symbol")) == sym_norm \
-                           and int(tr.get("track_num", 0) or 0) == int(track_num) \
-                           and str(tr.get("slot_id")) == str(slot_id):
-                            tr["status"] = "failed"
-                            tr["closed_at"] = datetime.now(timezone.utc).timestamp()
-                            changed = True
-                    if changed:
+                    if await _cancel_pending_slot(sym_norm, track_num, str(slot_id)):
                         try:
-                            with open(TRADES_FILE, "w") as f:
-                                json.dump({"trades": trades}, f, indent=2)
+                            _rebuild_status_index_map()
                         except Exception:
                             pass
-                    if callable(register_trade_outcome):
-                        register_trade_outcome(str(track_num), "failed")
-                    # حرّر الـ Slot
-                    slots[str(slot_id)] = None
-                    structure["slots"] = slots
-                    save_trade_structure(structure)
-                    try:
-                        _rebuild_status_index_map()
-                    except Exception:
-                        pass
-                    return
+                        return
+                    cell = _slot_cell(str(slot_id)) or {}
+                    st = (cell.get("status") or "").lower()
 
                 # إذا كانت BUY → بيع يدوي
                 if st == "buy":
@@ -1406,45 +1941,19 @@ if client is not None and events is not None:
                     )
                 return
 
-            structure = get_trade_structure()
-            slots = structure.get("slots") or {}
-
             for sid, cell in active:
                 st = (cell.get("status") or "").lower()
                 track_num = int(cell.get("track_num", 0) or 0)
 
                 if st in ("open", "reserved"):
-                    if callable(send_notification_tc):
-                        await send_notification_tc(
-                            "🚫 Cancelled pending buy.",
-                            symbol=symbol_norm
-                        )
-                    # TRADES_FILE → failed
-                    trades = _load_trades_cache()
-                    changed = False
-                    for tr in trades:
-                        if normalize_symbol(tr.get("symbol")) == symbol_norm \
-                           and int(tr.get("track_num", 0) or 0) == int(track_num) \
-                           and str(tr.get("slot_id")) == str(sid):
-                            tr["status"] = "failed"
-                            tr["closed_at"] = datetime.now(timezone.utc).timestamp()
-                            changed = True
-                    if changed:
-                        try:
-                            with open(TRADES_FILE, "w") as f:
-                                json.dump({"trades": trades}, f, indent=2)
-                        except Exception:
-                            pass
-                    if callable(register_trade_outcome):
-                        register_trade_outcome(str(track_num), "failed")
-                    slots[str(sid)] = None
-                    continue
+                    if await _cancel_pending_slot(symbol_norm, track_num, str(sid)):
+                        continue
+                    cell = _slot_cell(str(sid)) or {}
+                    st = (cell.get("status") or "").lower()
 
                 if st == "buy":
                     await _manual_sell_slot(symbol_norm, track_num, str(sid), cell)
 
-            structure["slots"] = slots
-            save_trade_structure(structure)
             try:
                 _rebuild_status_index_map()
             except Exception:
@@ -1494,8 +2003,12 @@ if client is not None and events is not None:
             await show_trade_summary()
             return
 
-        if cmd == "verlauf":
-            await show_verlauf()
+        if cmd == "stats" or cmd.startswith("stats "):
+            await show_stats(text.split(maxsplit=1)[1] if " " in text.strip() else "")
+            return
+
+        if cmd == "verlauf" or cmd.startswith("verlauf "):
+            await show_verlauf(text.split(maxsplit=1)[1] if " " in text.strip() else "")
             return
 
         # ===== Help =====
@@ -1509,6 +2022,7 @@ if client is not None and events is not None:
                     "• reuse – Resume recommendations\n"
                     "• status – Show bot status (with numbering for SELL)\n"
                     "• summary – Profit/Loss summary\n"
+                    "• stats – Trade analytics (stats 30d / 2026-10 / track 2 / BTC)\n"
                     "• track – Show tracks status (all)\n"
                     "• track <n> – Show only track n details\n"
                     "• cycle slots – Show current max open trades\n"
@@ -1516,7 +2030,7 @@ if client is not None and events is not None:
                     "• slots – Show used/free slots\n"
                     "• sell <index> – Exit/cancel by index from status (e.g., sell 3)\n"
                     "• sell <symbol> – Market-exit or cancel pending by symbol (e.g., sell ALGO)\n"
-                    "• verlauf – Full trade timeline\n"
+                    "• verlauf – Latest trades (verlauf 2026-10 / BTCUSDT / track 2 / tp / last 50 / next / csv)\n"
                     "• debug funds on/off/<N>m – Toggle detailed balance logging\n"
                     "• Add <symbol> / Remove <symbol> / Status List – manage blacklist\n"
                     "• risk ... – Market quality report (if enabled)"
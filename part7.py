@@ -94,6 +94,26 @@ async def main():
     except Exception as e:
         print(f"[MAIN] failed to send start notification: {e}")
 
+    # (اختياري) تحميل سجل الصفقات إلى الذاكرة + تشغيل الـ flush الخلفي
+    try:
+        get_trade_store = globals().get("get_trade_store")
+        if callable(get_trade_store) and hasattr(get_trade_store(), "start"):
+            get_trade_store().start()
+        # تسخين status snapshot (مسح اليوم مرة واحدة هنا بدل أول أمر status)
+        get_status_snapshot = globals().get("get_status_snapshot")
+        if callable(get_status_snapshot):
+            get_status_snapshot().get()
+    except Exception as e:
+        print(f"[MAIN] trade store start failed: {e}")
+
+    # (اختياري) فتح stream التنفيذ الخاص مبكراً (وضع Live فقط)
+    try:
+        get_fill_tracker = globals().get("get_fill_tracker")
+        if callable(get_fill_tracker) and mode_label == "Live":
+            get_fill_tracker().start()
+    except Exception as e:
+        print(f"[MAIN] fill tracker start failed: {e}")
+
     # 6) تشغيل منبّه الحالة (NTP + drawdown 4%) في background
     try:
         if callable(status_notifier):
@@ -115,6 +135,38 @@ async def main():
         print("🛑 Bot stopped manually.")
     except Exception as e:
         print(f"[MAIN] client.run_until_disconnected error: {e}")
+    finally:
+        # 9) إغلاق KuCoin gateway (connection pool + thread pool)
+        try:
+            get_kucoin_gateway = globals().get("get_kucoin_gateway")
+            if callable(get_kucoin_gateway):
+                await get_kucoin_gateway().close()
+        except Exception:
+            pass
+        # 10) إغلاق مخزن الصفقات (compaction للـ journal / checkpoint لـ SQLite)
+        try:
+            get_trade_store = globals().get("get_trade_store") or globals().get("get_trade_journal")
+            if callable(get_trade_store):
+                get_trade_store().close()
+        except Exception as e:
+            print(f"[MAIN] trade store close error: {e}")
+        # 11) كتابة نهائية للبنية (tracks/slots) إن كان هناك حفظ مجمّع معلّق
+        try:
+            get_structure_manager = globals().get("get_structure_manager")
+            if callable(get_structure_manager):
+                get_structure_manager().close()
+        except Exception as e:
+            print(f"[MAIN] structure flush error: {e}")
+        # 12) تفريغ طابور الـ PersistenceWorker (summary / notices / blacklist ...)
+        try:
+            get_terminal_notices = globals().get("get_terminal_notices")
+            if callable(get_terminal_notices):
+                get_terminal_notices().flush()
+            get_persistence_worker = globals().get("get_persistence_worker")
+            if callable(get_persistence_worker):
+                get_persistence_worker().stop()
+        except Exception as e:
+            print(f"[MAIN] persistence flush error: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+# ============================================
+# Fixtures مشتركة: أقسام البوت محمّلة في namespace واحد داخل tmp_path
+#   bot_factory(**env) → namespace جديد (env يُضبط قبل التحميل، مثل TRADES_BACKEND)
+# ============================================
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.sections import load_sections  # noqa: E402
+
+
+@pytest.fixture
+def bot_factory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TRADES_WRITE_BEHIND", "0")
+    loaded = []
+
+    def _load(sections=None, **env):
+        for k, v in env.items():
+            monkeypatch.setenv(k, str(v))
+        ns = load_sections(None, sections=sections) if sections else load_sections(None)
+        loaded.append(ns)
+        return ns
+
+    yield _load
+    for ns in loaded:
+        for name in ("get_trade_store", "get_structure_manager"):
+            fn = ns.get(name)
+            try:
+                if callable(fn) and hasattr(fn(), "close"):
+                    fn().close()
+            except Exception:
+                pass
+
+
+@pytest.fixture
+def bot(bot_factory):
+    return bot_factory()
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bench import batch_ladder  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def section4(tmp_path_factory):
+    import os
+    cwd = os.getcwd()
+    try:
+        ns = batch_ladder.load_sections(str(tmp_path_factory.mktemp("bot")), sections=("Part2.py", "part3.py", "part4.py"))
+    finally:
+        os.chdir(cwd)
+    return ns
+
+
+def _same(a, b):
+    if b is None:
+        return a is None or (isinstance(a, float) and math.isnan(a))
+    return a is not None and not math.isnan(a) and abs(a - b) < 1e-12
+
+
+def test_sell_codes_match_section4(section4):
+    assert (batch_ladder.SELL_NONE, batch_ladder.SELL_FLOOR, batch_ladder.SELL_TRAIL) == (
+        section4["SELL_NONE"], section4["SELL_FLOOR"], section4["SELL_TRAIL"])
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+def test_random_states_match_ladder_step(section4, seed):
+    eps, retrace = section4["EPS"], section4["RETRACE_PERCENT"]
+    rng = np.random.default_rng(seed)
+    states = batch_ladder.random_states(3000, rng)
+    prices = batch_ladder.random_prices(states, rng)
+    ev, rows = batch_ladder.build(states, eps, retrace)
+    out = ev.evaluate(rows, prices)
+    ref = batch_ladder.scalar_decisions(section4["_ladder_step"], eps, states, prices.tolist())
+    assert batch_ladder.mismatches(out, ref) == []
+    for i, r in enumerate(ref):
+        if isinstance(r, tuple):
+            assert _same(float(out["max_after_touch"][i]), r[2])
+            assert _same(float(out["floor"][i]), r[3])
+
+
+def test_price_path_matches_ladder_step(section4):
+    """نفس مسار السعر خطوة بخطوة: الحالة الجديدة من evaluate تُعاد عبر upsert."""
+    eps, retrace, step = section4["EPS"], section4["RETRACE_PERCENT"], section4["_ladder_step"]
+    targets = [1.1, 1.2, 1.3]
+    path = [1.05, 1.1, 1.15, 1.21, 1.25, 1.237, 1.19, 1.31, 1.35, 1.3365]
+    ev = batch_ladder.BatchLadderEvaluator(capacity=1, eps=eps, retrace_percent=retrace)
+    row = np.array([ev.upsert("s", 1.0, True, targets, -1, False, None, None)])
+    hi, armed, mat, floor = -1, False, None, None
+    for p in path:
+        hi, armed, mat, floor, adv, arm_now, sell = step(targets, targets[0], hi, armed, mat, floor, p)
+        out = ev.evaluate(row, np.array([p]))
+        assert int(out["highest_idx"][0]) == hi
+        assert bool(out["armed"][0]) == armed
+        assert bool(out["advanced"][0]) == adv and bool(out["armed_now"][0]) == arm_now
+        assert int(out["sell"][0]) == sell, p
+        assert _same(float(out["max_after_touch"][0]), mat) and _same(float(out["floor"][0]), floor)
+        if sell:
+            break
+        ev.upsert("s", 1.0, True, targets, hi, armed, mat, floor)
+    assert sell == batch_ladder.SELL_TRAIL
+
+
+def test_buy_and_missing_price(section4):
+    ev = batch_ladder.BatchLadderEvaluator(capacity=2, eps=section4["EPS"], retrace_percent=section4["RETRACE_PERCENT"])
+    rows = np.array([ev.upsert("a", 1.0, False, [1.1], -1, False, None, None),
+                     ev.upsert("b", 1.0, False, [1.1], -1, False, None, None)])
+    out = ev.evaluate(rows, np.array([0.99, np.nan]))
+    assert out["buy"].tolist() == [True, False]
+    assert out["event"].tolist() == [True, True]
+    out = ev.evaluate(rows, np.array([1.01, 1.02]))
+    assert out["buy"].tolist() == [False, False] and out["event"].tolist() == [False, False]
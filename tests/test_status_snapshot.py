@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def snapshot_env(bot, tmp_path):
+    """TradeRepository فوق TradeJournal + StructureManager + StatusSnapshot مربوط بالـ patch hook."""
+    journal = bot["TradeJournal"](str(tmp_path / "t.json"), str(tmp_path / "t.journal.jsonl"))
+    repo = bot["TradeRepository"](journal, flush_sec=3600)
+    mgr = bot["StructureManager"](str(tmp_path / "structure.json"), write_delay=3600)
+    snap = bot["StatusSnapshot"](repo, mgr)
+    repo.add_patch_hook(snap.on_change, final_only=False)
+    yield bot, repo, mgr, snap
+    repo.close()
+    mgr.close()
+
+
+def _cold(bot, repo, mgr):
+    ref = bot["StatusSnapshot"](repo, mgr)
+    ref.live = False
+    return ref.get()
+
+
+def _slot(sym, track, status):
+    return {"symbol": sym, "track_num": track, "status": status}
+
+
+def test_open_buy_finalize_events(snapshot_env):
+    bot, repo, mgr, snap = snapshot_env
+    now = time.time()
+    old = repo.open_trade({"symbol": "OLDUSDT", "track_num": 1, "slot_id": "1", "status": "closed",
+                           "opened_at": now - 5 * 86400, "closed_at": now - 4 * 86400})
+    first = snap.get()
+    assert first["today_total"] == 0 and first["open"] == [] and first["buy"] == []
+    assert all(not v for v in first["today_realized"].values())
+
+    # open
+    tid = repo.open_trade({"symbol": "AAAUSDT", "track_num": 2, "slot_id": "2", "status": "open", "opened_at": now})
+    mgr.set_slot("2", _slot("AAAUSDT", 2, "open"))
+    out = snap.get()
+    assert out["today_total"] == 1 and out["today_open"] == 1 and out["today_buy"] == 0
+    assert [r[:3] for r in out["open"]] == [("AAAUSDT", 2, "2")]
+    assert out["index_map"] == {1: ("AAAUSDT", 2, "2")}
+    assert out == _cold(bot, repo, mgr)
+
+    # buy
+    repo.patch(tid, {"status": "buy", "bought_price": 1.25}, op="bought")
+    mgr.set_slot("2", _slot("AAAUSDT", 2, "buy"))
+    out = snap.get()
+    assert out["open"] == [] and out["today_open"] == 0 and out["today_buy"] == 1
+    assert out["buy"] == [("AAAUSDT", 2, "2", pytest.approx(now), 1.25)]
+    assert out == _cold(bot, repo, mgr)
+
+    # finalize
+    repo.patch(tid, {"status": "closed", "closed_at": now, "pnl_usdt": 0.5}, op="finalized")
+    mgr.set_slot("2", None)
+    out = snap.get()
+    assert out["buy"] == [] and out["index_map"] == {}
+    assert out["today_realized"]["closed"] == [("AAAUSDT", 2, "2")]
+    assert out["today_total"] == 1
+    assert out == _cold(bot, repo, mgr)
+
+    # صفقة قديمة تُصحَّح اليوم → تدخل قائمة اليوم المحققة
+    repo.patch(old, {"status": "drwn", "closed_at": now}, op="status")
+    out = snap.get()
+    assert out["today_realized"]["drwn"] == [("OLDUSDT", 1, "1")]
+    assert out["today_realized"]["closed"] == [("AAAUSDT", 2, "2")]
+    assert out == _cold(bot, repo, mgr)
+
+    # الأحداث لا تعيد مسح اليوم
+    assert snap.stats()["day_rebuilds"] == 1
+
+
+def test_slot_changes_without_trade_events_refresh_rows(snapshot_env):
+    bot, repo, mgr, snap = snapshot_env
+    now = time.time()
+    repo.open_trade({"symbol": "BBBUSDT", "track_num": 1, "slot_id": "7", "status": "open", "opened_at": now})
+    mgr.set_slot("7", _slot("BBBUSDT", 1, "open"))
+    assert [r[:3] for r in snap.get()["open"]] == [("BBBUSDT", 1, "7")]
+    before = snap.stats()["slot_rebuilds"]
+    snap.get()
+    assert snap.stats()["slot_rebuilds"] == before          # لا تغيير → لا إعادة بناء
+    mgr.set_slot("7", None)                                   # sell يدوي / تنظيف
+    assert snap.get()["open"] == []
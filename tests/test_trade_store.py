@@ -0,0 +1,73 @@
+import random
+import time
+
+import pytest
+
+from bench.trade_store import random_trades
+
+
+@pytest.fixture
+def stores(bot, tmp_path):
+    """نفس السجلات في TradeJournal (مسح خطّي) و SqliteTradeStore (مفهرس)."""
+    journal = bot["TradeJournal"](str(tmp_path / "t.json"), str(tmp_path / "t.journal.jsonl"))
+    sqlite = bot["SqliteTradeStore"](str(tmp_path / "t.sqlite3"))
+    yield journal, sqlite
+    sqlite.close()
+    journal.close()
+
+
+def _fill(stores, records):
+    for rec in records:
+        for st in stores:
+            st.open_trade(dict(rec))
+
+
+def _id(rec):
+    return (rec or {}).get("id")
+
+
+def test_latest_for_slot_matches_journal_scan(stores):
+    journal, sqlite = stores
+    records = random_trades(3000, seed=5)
+    _fill(stores, records)
+    rng = random.Random(3)
+    keys = [(r["symbol"], r["track_num"], r["slot_id"]) for r in rng.sample(records, 200)]
+    keys += [(f"C{rng.randrange(400)}USDT", rng.randint(1, 10), str(rng.randint(1, 10))) for _ in range(100)]
+    keys += [("NOPEUSDT", 1, "1")]
+    hits = 0
+    for k in keys:
+        ref = journal.latest_for_slot(*k)
+        assert _id(sqlite.latest_for_slot(*k)) == _id(ref), k
+        hits += ref is not None
+    assert hits >= 200
+
+
+def test_latest_for_slot_ties_patches_and_symbol_forms(stores):
+    journal, sqlite = stores
+    t = time.time()
+    _fill(stores, [
+        {"id": 1, "symbol": "AAAUSDT", "track_num": 2, "slot_id": "3", "status": "closed", "opened_at": t - 10},
+        {"id": 2, "symbol": "AAAUSDT", "track_num": 2, "slot_id": "3", "status": "open", "opened_at": t},
+        {"id": 3, "symbol": "AAAUSDT", "track_num": 2, "slot_id": "3", "status": "open", "opened_at": t},
+        {"id": 4, "symbol": "AAAUSDT", "track_num": 2, "slot_id": "4", "status": "open", "opened_at": t + 5},
+    ])
+    for st in stores:
+        assert _id(st.latest_for_slot("AAA-USDT", 2, "3")) == 3   # تعادل opened_at → أعلى id
+        st.patch(3, {"status": "buy", "bought_price": 1.5}, op="bought")
+    for st in stores:
+        rec = st.latest_for_slot("AAAUSDT", 2, 3)
+        assert rec["status"] == "buy" and rec["bought_price"] == 1.5
+        assert st.latest_for_slot("AAAUSDT", 3, "3") is None
+
+
+def test_status_queries_match_journal_scan(stores, bot):
+    journal, sqlite = stores
+    now = time.time()
+    records = random_trades(2000, seed=9, now=now)
+    records[-1].update(status="closed", closed_at=now)
+    _fill(stores, records)
+    today = bot["_utc_day"](now)
+    assert sqlite.status_counts() == journal.status_counts()
+    assert [r["id"] for r in sqlite.by_status("buy")] == [r["id"] for r in journal.by_status("buy")]
+    assert sorted(r["id"] for r in sqlite.closed_on_day(today)) == sorted(r["id"] for r in journal.closed_on_day(today))
+    assert sqlite.closed_on_day(today)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+
+class FakeKucoinWS:
+    """سيرفر WebSocket محلي: يسجّل الرسائل الواردة لكل اتصال ويسمح بدفع رسائل للعميل."""
+
+    def __init__(self):
+        self.conns = []
+        self.received = []      # (conn_index, msg)
+        self._server = None
+
+    async def _handler(self, ws):
+        idx = len(self.conns)
+        self.conns.append(ws)
+        await ws.send(json.dumps({"id": "welcome", "type": "welcome"}))
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                self.received.append((idx, msg))
+                if msg.get("type") == "ping":
+                    await ws.send(json.dumps({"id": msg["id"], "type": "pong"}))
+                elif msg.get("response"):
+                    await ws.send(json.dumps({"id": msg["id"], "type": "ack"}))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handler, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    def of_type(self, kind, conn=None):
+        return [m for i, m in self.received if m.get("type") == kind and (conn is None or i == conn)]
+
+    async def push(self, topic, data, conn=-1):
+        await self.conns[conn].send(json.dumps({"type": "message", "topic": topic, "subject": "x", "data": data}))
+
+
+async def _until(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.02)
+
+
+def test_price_feed_subscribe_chunking_and_ticks(bot):
+    async def main():
+        async with FakeKucoinWS() as srv:
+            feed = bot["KucoinPriceFeed"](ws_url=srv.url)
+            for i in range(250):
+                feed.subscribe(f"C{i}USDT")
+            await _until(lambda: len(srv.of_type("subscribe")) == 3)
+            topics = [m["topic"].split(":", 1)[1].split(",") for m in srv.of_type("subscribe")]
+            assert [len(t) for t in topics] == [100, 100, 50]
+            assert {p for t in topics for p in t} == {f"C{i}-USDT" for i in range(250)}
+
+            seen = []
+            feed.add_listener(lambda sym, price: seen.append((sym, price)))
+            waiter = asyncio.ensure_future(feed.wait_tick("C7USDT", timeout=3.0))
+            await asyncio.sleep(0.05)
+            await srv.push("/market/ticker:C7-USDT", {"price": "1.2345"})
+            assert await waiter == pytest.approx(1.2345)
+            assert feed.latest("C7USDT") == pytest.approx(1.2345)
+            assert seen == [("C7USDT", 1.2345)]
+
+            # رمز جديد بعد الاتصال → subscribe فوري برسالة واحدة
+            feed.subscribe("NEWUSDT")
+            await _until(lambda: len(srv.of_type("subscribe")) == 4)
+            assert srv.of_type("subscribe")[-1]["topic"] == "/market/ticker:NEW-USDT"
+            await feed.stop()
+
+    asyncio.run(main())
+
+
+def test_price_feed_reconnects_when_ping_fails(bot):
+    async def main():
+        async with FakeKucoinWS() as srv:
+            feed = bot["KucoinPriceFeed"](ws_url=srv.url, ping_sec=1.0)
+            feed.subscribe("AUSDT")
+            await _until(lambda: feed.connected and srv.of_type("ping", conn=0))
+
+            ws = feed._ws
+            real_send = ws.send
+
+            async def failing_send(raw, *a, **k):
+                if json.loads(raw).get("type") == "ping":
+                    raise ConnectionError("ping write failed")
+                return await real_send(raw, *a, **k)
+
+            ws.send = failing_send
+            await _until(lambda: feed.reconnects == 1 and len(srv.conns) == 2 and feed.connected, timeout=8.0)
+            # الاتصال الجديد يعيد الاشتراك ويعمل
+            await _until(lambda: srv.of_type("subscribe", conn=1))
+            assert srv.of_type("subscribe", conn=1)[0]["topic"] == "/market/ticker:A-USDT"
+            waiter = asyncio.ensure_future(feed.wait_tick("AUSDT", timeout=3.0))
+            await asyncio.sleep(0.05)
+            await srv.push("/market/ticker:A-USDT", {"price": "2.5"}, conn=1)
+            assert await waiter == pytest.approx(2.5)
+            await feed.stop()
+
+    asyncio.run(main())
+
+
+def test_ws_pump_propagates_ping_failure_and_returns_on_reader_end(bot):
+    pump = bot["_ws_pump"]
+
+    class _Ws:
+        def __init__(self, msgs, fail_send):
+            self.msgs, self.fail_send = msgs, fail_send
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self.msgs:
+                return self.msgs.pop(0)
+            if self.fail_send:
+                await asyncio.sleep(3600)
+            raise StopAsyncIteration
+
+        async def send(self, raw):
+            raise ConnectionError("boom")
+
+    async def main():
+        got = []
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(pump(_Ws(["a"], True), got.append, 0.0), timeout=3.0)
+        await asyncio.wait_for(pump(_Ws(["b", "c"], False), got.append, 60.0), timeout=3.0)
+        assert got == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+class _FakeKucoinClient:
+    def __init__(self, orders):
+        self.orders = orders
+        self.calls = []
+
+    def get_order(self, order_id):
+        self.calls.append(order_id)
+        return self.orders[order_id]
+
+
+def test_fill_tracker_resolves_from_stream(bot):
+    async def main():
+        async with FakeKucoinWS() as srv:
+            tracker = bot["OrderFillTracker"](ws_url=srv.url)
+            tracker.start()
+            await _until(lambda: tracker.connected)
+            assert srv.of_type("subscribe")[0]["topic"] == "/spotMarket/tradeOrdersV2"
+
+            waiter = asyncio.ensure_future(tracker.wait_fill("o1", timeout=3.0))
+            await asyncio.sleep(0.05)
+            topic = "/spotMarket/tradeOrdersV2"
+            await srv.push(topic, {"orderId": "o1", "type": "match", "matchSize": "1", "matchPrice": "2"})
+            await srv.push(topic, {"orderId": "o1", "type": "match", "matchSize": "0.5", "matchPrice": "4"})
+            await srv.push(topic, {"orderId": "o1", "type": "filled", "status": "done", "filledSize": "1.5"})
+            assert await waiter == (1.5, 4.0)
+
+            # رسالة تصل قبل wait_fill تُحفظ في _done
+            await srv.push(topic, {"orderId": "o2", "type": "filled", "status": "done", "filledSize": "3",
+                                   "matchSize": "3", "matchPrice": "1"})
+            await srv.push(topic, {"orderId": "o2x", "type": "received"})
+            await _until(lambda: "o2" in tracker._done)
+            assert tracker.stats()["stream_fills"] == 1
+            await tracker.stop()
+
+    asyncio.run(main())
+
+
+def test_fill_tracker_falls_back_to_polling(bot):
+    fake = _FakeKucoinClient({
+        "o9": {"dealSize": "2", "dealFunds": "7", "isActive": False},
+        "o10": {"dealSize": "1", "dealFunds": "3", "isActive": False},
+    })
+    bot["kucoin"] = fake
+
+    async def main():
+        async with FakeKucoinWS() as srv:
+            tracker = bot["OrderFillTracker"](ws_url=srv.url)
+            tracker.start()
+            await _until(lambda: tracker.connected)
+            # متصل لكن لا رسالة للأمر → polling بعد المهلة
+            assert await tracker.wait_fill("o9", timeout=0.2) == (2.0, 7.0)
+            await tracker.stop()
+
+        # الـ stream غير متاح (لا سيرفر) → polling مباشرة
+        tracker = bot["OrderFillTracker"](ws_url="ws://127.0.0.1:9")
+        assert await tracker.wait_fill("o10", timeout=0.2) == (1.0, 3.0)
+        await tracker.stop()
+        assert fake.calls == ["o9", "o10"]
+        assert tracker.stats()["polled_fills"] == 1
+
+    asyncio.run(main())